@@ -0,0 +1,197 @@
+'''
+parse and decode benchmarks over the synthetic corpus.
+
+    python -m benchmarks.bench --output result.json
+    python -m benchmarks.bench --compare baseline.json result.json
+
+each case reports the median and the minimum wall time, the throughput and
+the tracemalloc peak of a single run. a case that the library does not
+support is reported with its error instead of a time.
+'''
+import argparse
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Any
+import numpy as np
+import pyktx2.parser
+import pyktx2.decode
+from pyktx2.parser import KtxError
+from pyktx2.formats import get_level_extent, get_format_info, get_image_size
+from pyktx2.supercompression import decompress_level
+from . import corpus
+
+# minimum measuring time of a case in seconds
+MIN_TIME = 0.2
+MIN_RUNS = 3
+MAX_RUNS = 1000
+
+
+def measure(func: Callable[[], Any], min_time: float = MIN_TIME) -> Dict[str, Any]:
+    times: List[float] = []
+    start = time.perf_counter()
+    while len(times) < MIN_RUNS or (time.perf_counter() - start < min_time and len(times) < MAX_RUNS):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'runs': len(times),
+        'median_s': statistics.median(times),
+        'min_s': min(times),
+        'peak_bytes': peak,
+    }
+
+
+def _cases(path: pathlib.Path, data: bytes) -> Dict[str, Callable[[], Any]]:
+    header = pyktx2.parser.parse_header(data)
+    level = header.levelIndices[0]
+    width, height, _ = get_level_extent(header.pixelWidth, header.pixelHeight, header.pixelDepth, 0)
+    level_data = data[level.byteOffset:level.byteOffset + level.byteLength]
+
+    def decode():
+        return pyktx2.decode.decode_image(header.vkFormat,
+                                          decompress_level(header.supercompressionScheme,
+                                                           level_data, level),
+                                          width, height)
+
+    def region():
+        with path.open('rb') as f:
+            return pyktx2.decode.decode_region(f, 0, 0, min(width, 256), min(height, 256), header=header)
+
+    cases: Dict[str, Callable[[], Any]] = {
+        'parse_header': lambda: pyktx2.parser.parse_header(data),
+        'parse_metadata': lambda: pyktx2.parser.parse_bytes(data, load_levels=False),
+        'parse_full': lambda: pyktx2.parser.parse_bytes(data),
+        'decode_level0': decode,
+        'decode_region': region,
+    }
+    if header.supercompressionScheme != pyktx2.parser.SupercompressionScheme.NONE:
+        cases['decompress_level0'] = lambda: decompress_level(
+            header.supercompressionScheme, level_data, level)
+    return cases
+
+
+def run_file(path: pathlib.Path, min_time: float = MIN_TIME) -> List[Dict[str, Any]]:
+    data = path.read_bytes()
+    header = pyktx2.parser.parse_header(data)
+    level = header.levelIndices[0]
+    width, height, _ = get_level_extent(header.pixelWidth, header.pixelHeight, header.pixelDepth, 0)
+    results = []
+    for bench, func in _cases(path, data).items():
+        result: Dict[str, Any] = {
+            'file': path.stem,
+            'bench': bench,
+            'vkFormat': header.vkFormat.name,
+            'supercompressionScheme': header.supercompressionScheme.name,
+            'file_bytes': len(data),
+        }
+        try:
+            result.update(measure(func, min_time))
+        except (NotImplementedError, KtxError) as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+            results.append(result)
+            continue
+        if bench == 'decompress_level0':
+            result['bytes_per_s'] = level.uncompressedByteLength / result['min_s']
+        if bench == 'decode_level0':
+            # one layer/face/depth slice is decoded
+            result['bytes_per_s'] = get_image_size(
+                get_format_info(header.vkFormat), width, height) / result['min_s']
+            result['pixels_per_s'] = width * height / result['min_s']
+        results.append(result)
+    return results
+
+
+def get_environment() -> Dict[str, str]:
+    return {
+        'python': sys.version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'numpy': np.__version__,
+    }
+
+
+def run(directory: pathlib.Path, quick: bool = False, min_time: float = MIN_TIME) -> Dict[str, Any]:
+    results = []
+    for spec in corpus.default_specs(quick):
+        try:
+            paths = corpus.generate(directory, [spec])
+        except KtxError as e:
+            # an optional dependency of a supercompression scheme is missing
+            print(f'skip {spec.name}: {e}', file=sys.stderr)
+            continue
+        for path in paths:
+            print(path.name, file=sys.stderr)
+            results.extend(run_file(path, min_time))
+    return {
+        'environment': get_environment(),
+        'results': results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    '''
+    cases whose minimum time grew by more than threshold times.
+    '''
+    def key(r):
+        return r['file'], r['bench']
+    base = {key(r): r for r in baseline['results'] if 'min_s' in r}
+    regressions = []
+    for r in current['results']:
+        b = base.get(key(r))
+        if not b or 'min_s' not in r:
+            continue
+        ratio = r['min_s'] / b['min_s']
+        if ratio > threshold:
+            regressions.append(f'{r["file"]} {r["bench"]}: {b["min_s"]:.6f}s -> {r["min_s"]:.6f}s ({ratio:.2f}x)')
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='pyktx2 benchmarks')
+    parser.add_argument('--corpus', type=pathlib.Path,
+                        help='corpus directory. generated files are kept for later runs')
+    parser.add_argument('--output', type=pathlib.Path, help='write json here instead of stdout')
+    parser.add_argument('--quick', action='store_true', help='small images only')
+    parser.add_argument('--min-time', type=float, default=MIN_TIME)
+    parser.add_argument('--compare', nargs=2, type=pathlib.Path, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two results instead of running')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = (json.loads(p.read_text()) for p in args.compare)
+        regressions = compare(baseline, current, args.threshold)
+        for line in regressions:
+            print(line)
+        return 1 if regressions else 0
+
+    if args.corpus:
+        result = run(args.corpus, args.quick, args.min_time)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run(pathlib.Path(tmp), args.quick, args.min_time)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
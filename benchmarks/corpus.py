@@ -0,0 +1,114 @@
+'''
+synthetic ktx2 corpus for the benchmarks.
+
+every file is generated from a fixed seed with pyktx2.writer,
+so a corpus is reproducible without any sample assets.
+'''
+import pathlib
+from typing import NamedTuple, List, Iterable
+import numpy as np
+import pyktx2.writer
+from pyktx2.parser import VkFormat, SupercompressionScheme
+from pyktx2.formats import get_format_info, get_level_extent, get_image_size
+from pyktx2.supercompression import compress_level
+
+
+class CorpusSpec(NamedTuple):
+    vkFormat: VkFormat
+    width: int
+    height: int
+    depth: int = 0
+    layers: int = 0
+    faces: int = 1
+    levels: int = 1
+    scheme: SupercompressionScheme = SupercompressionScheme.NONE
+
+    @property
+    def name(self) -> str:
+        format_name = self.vkFormat.name[len('VK_FORMAT_'):]
+        return (f'{format_name}_{self.width}x{self.height}x{self.depth}'
+                f'_l{self.layers}_f{self.faces}_m{self.levels}_{self.scheme.name}')
+
+
+FORMATS = [
+    VkFormat.VK_FORMAT_R8G8B8A8_UNORM,
+    VkFormat.VK_FORMAT_R16G16B16A16_SFLOAT,
+    VkFormat.VK_FORMAT_R32G32B32A32_SFLOAT,
+    VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC3_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC4_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC5_UNORM_BLOCK,
+]
+
+SCHEMES = [
+    SupercompressionScheme.NONE,
+    SupercompressionScheme.Zstandard,
+    SupercompressionScheme.ZLIB,
+]
+
+
+def get_level_count(width: int, height: int) -> int:
+    return max(width, height).bit_length()
+
+
+def default_specs(quick: bool = False) -> List[CorpusSpec]:
+    '''
+    every format and scheme at a small and a large size,
+    plus array, cubemap and volume layouts.
+    '''
+    sizes = [(256, 256)] if quick else [(256, 256), (2048, 2048)]
+    specs: List[CorpusSpec] = []
+    for vkFormat in FORMATS:
+        for scheme in SCHEMES:
+            for w, h in sizes:
+                specs.append(CorpusSpec(vkFormat, w, h, levels=get_level_count(w, h), scheme=scheme))
+        specs.append(CorpusSpec(vkFormat, 256, 256, layers=6, levels=get_level_count(256, 256)))
+        specs.append(CorpusSpec(vkFormat, 256, 256, faces=6, levels=get_level_count(256, 256)))
+    for vkFormat in (VkFormat.VK_FORMAT_R8G8B8A8_UNORM, VkFormat.VK_FORMAT_R16G16B16A16_SFLOAT):
+        specs.append(CorpusSpec(vkFormat, 64, 64, depth=64))
+    return specs
+
+
+def _level_data(spec: CorpusSpec, level: int, rng: np.random.Generator) -> bytes:
+    info = get_format_info(spec.vkFormat)
+    width, height, depth = get_level_extent(spec.width, spec.height, spec.depth, level)
+    size = get_image_size(info, width, height, depth) * max(1, spec.layers) * spec.faces
+    if info.dtype and np.dtype(info.dtype).kind == 'f':
+        # finite values, so that statistics and conversions take the usual path
+        return rng.random(size // np.dtype(info.dtype).itemsize, dtype=np.float32).astype(info.dtype).tobytes()
+    return rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def make_ktx2(spec: CorpusSpec, seed: int = 0) -> bytes:
+    info = get_format_info(spec.vkFormat)
+    rng = np.random.default_rng(seed)
+    levels = [_level_data(spec, i, rng) for i in range(spec.levels)]
+    uncompressedByteLengths = None
+    if spec.scheme != SupercompressionScheme.NONE:
+        uncompressedByteLengths = [len(level) for level in levels]
+        levels = [compress_level(spec.scheme, level) for level in levels]
+    dfd = pyktx2.writer.make_dfd(spec.vkFormat)
+    if spec.scheme != SupercompressionScheme.NONE:
+        # bytesPlane0 is 0 in a supercompressed dfd
+        offset = pyktx2.writer.DFD_BYTES_PLANE0_OFFSET
+        dfd = dfd[:offset] + b'\0' + dfd[offset + 1:]
+    typeSize = np.dtype(info.dtype).itemsize if info.dtype else 1
+    return pyktx2.writer.serialize(spec.vkFormat, typeSize,
+                                   spec.width, spec.height, spec.depth,
+                                   spec.layers, spec.faces, dfd,
+                                   {'KTXwriter': b'pyktx2 benchmarks\0'},
+                                   levels, spec.scheme, uncompressedByteLengths)
+
+
+def generate(directory: pathlib.Path, specs: Iterable[CorpusSpec], seed: int = 0) -> List[pathlib.Path]:
+    '''
+    existing files are reused.
+    '''
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for spec in specs:
+        path = directory / f'{spec.name}.ktx2'
+        if not path.exists():
+            path.write_bytes(make_ktx2(spec, seed))
+        paths.append(path)
+    return paths
@@ -0,0 +1,100 @@
+'''
+import time regression check with -X importtime.
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --output importtime.json
+
+every module is imported in a fresh interpreter several times and the
+minimum cumulative time is compared with its threshold.
+modules that must not be imported by a module are checked as well.
+'''
+import argparse
+import json
+import pathlib
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple, Any
+
+# cumulative import time thresholds in milliseconds
+THRESHOLDS: Dict[str, float] = {
+    'pyktx2': 30,
+    'pyktx2.vkformat': 30,
+    'pyktx2.formats': 40,
+    'pyktx2.parser': 50,
+    'pyktx2.viewer': 50,
+}
+
+# module: modules it must not import
+FORBIDDEN: Dict[str, List[str]] = {
+    'pyktx2': ['numpy', 'PySide6', 'zstandard'],
+    'pyktx2.parser': ['numpy', 'PySide6', 'zstandard'],
+    'pyktx2.formats': ['numpy', 'pyktx2.parser'],
+    'pyktx2.viewer': ['PySide6', 'numpy'],
+}
+
+RUNS = 5
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_once(module: str) -> Tuple[float, List[str]]:
+    '''
+    cumulative milliseconds of module and the names of all imported modules.
+    '''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True,
+                            cwd=pathlib.Path(__file__).parent.parent)
+    cumulative = 0.0
+    imported = []
+    for line in result.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        imported.append(m.group(4))
+        if m.group(4) == module:
+            cumulative = int(m.group(2)) / 1000
+    return cumulative, imported
+
+
+def measure(module: str, runs: int = RUNS) -> Dict[str, Any]:
+    times = []
+    imported: List[str] = []
+    for _ in range(runs):
+        ms, imported = import_once(module)
+        times.append(ms)
+    forbidden = [name for name in FORBIDDEN.get(module, [])
+                 if any(i == name or i.startswith(name + '.') for i in imported)]
+    return {
+        'module': module,
+        'min_ms': min(times),
+        'threshold_ms': THRESHOLDS.get(module),
+        'modules': len(imported),
+        'forbidden': forbidden,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='pyktx2 import time')
+    parser.add_argument('modules', nargs='*', default=list(THRESHOLDS))
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--output', type=pathlib.Path, help='write json here')
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.runs) for module in args.modules]
+    failed = 0
+    for r in results:
+        problems = []
+        if r['threshold_ms'] is not None and r['min_ms'] > r['threshold_ms']:
+            problems.append(f'over {r["threshold_ms"]}ms')
+        if r['forbidden']:
+            problems.append(f'imports {", ".join(r["forbidden"])}')
+        if problems:
+            failed += 1
+        print(f'{r["module"]}: {r["min_ms"]:.1f}ms {"; ".join(problems) or "ok"}')
+    if args.output:
+        args.output.write_text(json.dumps({'results': results}, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+'''
+subsystems are imported on first attribute access, so that `import pyktx2`
+does not pay for numpy, zstandard or Qt.
+'''
+import importlib
+from typing import Any, List
+
+_SUBMODULES = frozenset([
+    'bcn',
+    'bcn_encode',
+    'decode',
+    'decode_pool',
+    'dfd',
+    'encode_pool',
+    'formats',
+    'hashing',
+    'imagestats',
+    'instrumentation',
+    'kvd',
+    'parser',
+    'png',
+    'repack',
+    'server',
+    'supercompression',
+    'thumbnail',
+    'validate',
+    'viewer',
+    'vkformat',
+    'writer',
+])
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | _SUBMODULES)
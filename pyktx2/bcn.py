@@ -0,0 +1,168 @@
+'''
+BC1-BC5 block decoder. all blocks of a batch are decoded at once with numpy.
+
+* https://learn.microsoft.com/en-us/windows/win32/direct3d10/d3d10-graphics-programming-guide-resources-block-compression
+'''
+import numpy as np
+from .parser import VkFormat
+
+SUPPORTED_FORMATS = frozenset((
+    VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC1_RGB_SRGB_BLOCK,
+    VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC1_RGBA_SRGB_BLOCK,
+    VkFormat.VK_FORMAT_BC2_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC2_SRGB_BLOCK,
+    VkFormat.VK_FORMAT_BC3_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC3_SRGB_BLOCK,
+    VkFormat.VK_FORMAT_BC4_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC4_SNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC5_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC5_SNORM_BLOCK,
+))
+
+
+def _expand_565(c: np.ndarray) -> np.ndarray:
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1)
+
+
+def _indices(bits: np.ndarray, count: int, width: int) -> np.ndarray:
+    '''
+    bits: (N,) uint64 -> (N, count)
+    '''
+    shifts = np.arange(count, dtype=np.uint64) * np.uint64(width)
+    return ((bits[:, None] >> shifts) & np.uint64((1 << width) - 1)).astype(np.intp)
+
+
+def _decode_color(blocks: np.ndarray, punchthrough: bool) -> np.ndarray:
+    '''
+    blocks: (N, 8) uint8 -> (N, 16, 4) uint8
+    '''
+    blocks = np.ascontiguousarray(blocks)
+    words = blocks.view('<u2')
+    c0 = words[:, 0].astype(np.int32)
+    c1 = words[:, 1].astype(np.int32)
+    p0 = _expand_565(c0)
+    p1 = _expand_565(c1)
+    four = (c0 > c1)[:, None]
+    if not punchthrough:
+        four = np.ones_like(four)
+    palette = np.empty((len(blocks), 4, 4), np.int32)
+    palette[:, 0, :3] = p0
+    palette[:, 1, :3] = p1
+    palette[:, 2, :3] = np.where(four, (2 * p0 + p1 + 1) // 3, (p0 + p1) // 2)
+    palette[:, 3, :3] = np.where(four, (p0 + 2 * p1 + 1) // 3, 0)
+    palette[:, :, 3] = 255
+    palette[:, 3, 3] = np.where(four[:, 0], 255, 0)
+    bits = blocks[:, 4:8].copy().view('<u4')[:, 0].astype(np.uint64)
+    index = _indices(bits, 16, 2)
+    return np.take_along_axis(palette, index[:, :, None], axis=1).astype(np.uint8)
+
+
+def _decode_alpha(blocks: np.ndarray, signed: bool = False) -> np.ndarray:
+    '''
+    BC4 block. blocks: (N, 8) uint8 -> (N, 16) uint8
+    signed values are remapped to unsigned.
+    '''
+    blocks = np.ascontiguousarray(blocks)
+    if signed:
+        a0 = np.maximum(blocks[:, 0].view(np.int8).astype(np.int32), -127)
+        a1 = np.maximum(blocks[:, 1].view(np.int8).astype(np.int32), -127)
+        low, high = -127, 127
+    else:
+        a0 = blocks[:, 0].astype(np.int32)
+        a1 = blocks[:, 1].astype(np.int32)
+        low, high = 0, 255
+    a0 = a0[:, None]
+    a1 = a1[:, None]
+    eight = a0 > a1
+    palette = np.empty((len(blocks), 8), np.int32)
+    palette[:, 0:1] = a0
+    palette[:, 1:2] = a1
+    for i in range(1, 7):
+        interp8 = ((7 - i) * a0 + i * a1 + 3) // 7
+        if i < 5:
+            interp6 = ((5 - i) * a0 + i * a1 + 2) // 5
+        else:
+            interp6 = np.full_like(a0, low if i == 5 else high)
+        palette[:, i + 1:i + 2] = np.where(eight, interp8, interp6)
+    bits = np.zeros((len(blocks), 8), np.uint8)
+    bits[:, :6] = blocks[:, 2:8]
+    index = _indices(bits.view('<u8')[:, 0], 16, 3)
+    values = np.take_along_axis(palette, index, axis=1)
+    if signed:
+        values = (values + 127) * 255 // 254
+    return values.astype(np.uint8)
+
+
+def decode_bc1(blocks: np.ndarray) -> np.ndarray:
+    return _decode_color(blocks, True)
+
+
+def decode_bc2(blocks: np.ndarray) -> np.ndarray:
+    rgba = _decode_color(blocks[:, 8:16], False)
+    nibbles = np.stack([blocks[:, :8] & 15, blocks[:, :8] >> 4],
+                       axis=-1).reshape(-1, 16)
+    rgba[:, :, 3] = nibbles * 17
+    return rgba
+
+
+def decode_bc3(blocks: np.ndarray) -> np.ndarray:
+    rgba = _decode_color(blocks[:, 8:16], False)
+    rgba[:, :, 3] = _decode_alpha(blocks[:, :8])
+    return rgba
+
+
+def decode_bc4(blocks: np.ndarray, signed: bool = False) -> np.ndarray:
+    rgba = np.zeros((len(blocks), 16, 4), np.uint8)
+    rgba[:, :, 0] = _decode_alpha(blocks, signed)
+    rgba[:, :, 3] = 255
+    return rgba
+
+
+def decode_bc5(blocks: np.ndarray, signed: bool = False) -> np.ndarray:
+    rgba = np.zeros((len(blocks), 16, 4), np.uint8)
+    rgba[:, :, 0] = _decode_alpha(blocks[:, :8], signed)
+    rgba[:, :, 1] = _decode_alpha(blocks[:, 8:], signed)
+    rgba[:, :, 3] = 255
+    return rgba
+
+
+def decode_blocks(vkFormat: VkFormat, blocks: np.ndarray) -> np.ndarray:
+    '''
+    blocks: (N, blockBytes) uint8 -> (N, 4, 4, 4) RGBA8 texels in row major order.
+    '''
+    blocks = np.ascontiguousarray(blocks, dtype=np.uint8)
+    match vkFormat:
+        case VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK | VkFormat.VK_FORMAT_BC1_RGB_SRGB_BLOCK:
+            rgba = decode_bc1(blocks)
+            rgba[:, :, 3] = 255
+        case VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK | VkFormat.VK_FORMAT_BC1_RGBA_SRGB_BLOCK:
+            rgba = decode_bc1(blocks)
+        case VkFormat.VK_FORMAT_BC2_UNORM_BLOCK | VkFormat.VK_FORMAT_BC2_SRGB_BLOCK:
+            rgba = decode_bc2(blocks)
+        case VkFormat.VK_FORMAT_BC3_UNORM_BLOCK | VkFormat.VK_FORMAT_BC3_SRGB_BLOCK:
+            rgba = decode_bc3(blocks)
+        case VkFormat.VK_FORMAT_BC4_UNORM_BLOCK:
+            rgba = decode_bc4(blocks)
+        case VkFormat.VK_FORMAT_BC4_SNORM_BLOCK:
+            rgba = decode_bc4(blocks, True)
+        case VkFormat.VK_FORMAT_BC5_UNORM_BLOCK:
+            rgba = decode_bc5(blocks)
+        case VkFormat.VK_FORMAT_BC5_SNORM_BLOCK:
+            rgba = decode_bc5(blocks, True)
+        case _:
+            raise NotImplementedError(f'{vkFormat}')
+    return rgba.reshape(-1, 4, 4, 4)
+
+
+def blocks_to_image(texels: np.ndarray, blocks_wide: int, blocks_high: int) -> np.ndarray:
+    '''
+    (N, 4, 4, 4) -> (blocks_high * 4, blocks_wide * 4, 4)
+    '''
+    return (texels.reshape(blocks_high, blocks_wide, 4, 4, 4)
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(blocks_high * 4, blocks_wide * 4, 4))
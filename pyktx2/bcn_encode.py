@@ -0,0 +1,440 @@
+'''
+BC1, BC3 and BC7 block encoder. endpoints and indices of a batch of blocks are
+searched at once with numpy.
+
+* endpoints are the bounding box (fast) or the principal axis of the block
+  colors, optionally refined by least squares over the chosen indices.
+* BC7 blocks are written in mode 6 (one subset, RGBA 7777 + p-bits, 4 bit indices).
+
+* https://learn.microsoft.com/en-us/windows/win32/direct3d11/bc7-format-mode-reference
+'''
+from typing import Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+from .parser import VkFormat
+from .formats import get_format_info
+from .bcn import _expand_565
+
+if TYPE_CHECKING:
+    from .encode_pool import EncodeExecutor
+
+
+class Preset(NamedTuple):
+    # principal axis endpoints instead of the bounding box
+    pca: bool
+    # least squares refinement passes
+    refine: int
+
+
+PRESETS: Dict[str, Preset] = {
+    'fast': Preset(False, 0),
+    'normal': Preset(True, 1),
+    'high': Preset(True, 4),
+}
+
+SUPPORTED_FORMATS = frozenset((
+    VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC1_RGB_SRGB_BLOCK,
+    VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC1_RGBA_SRGB_BLOCK,
+    VkFormat.VK_FORMAT_BC3_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC3_SRGB_BLOCK,
+    VkFormat.VK_FORMAT_BC7_UNORM_BLOCK,
+    VkFormat.VK_FORMAT_BC7_SRGB_BLOCK,
+))
+
+# blocks encoded at once. bounds the temporary distance arrays
+BATCH_BLOCKS = 4096
+
+# palette weights of the second endpoint
+_BC1_WEIGHTS4 = np.array([0, 1, 1 / 3, 2 / 3], np.float32)
+_BC1_WEIGHTS3 = np.array([0, 1, 1 / 2, 0], np.float32)
+_BC4_WEIGHTS = np.array([0, 1] + [i / 7 for i in range(1, 7)], np.float32)
+_BC7_WEIGHTS4 = np.array([0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64], np.int32)
+
+
+def get_preset(preset) -> Preset:
+    return preset if isinstance(preset, Preset) else PRESETS[preset]
+
+
+def image_to_blocks(rgba: np.ndarray) -> Tuple[np.ndarray, int, int]:
+    '''
+    (height, width, 4) -> (N, 16, 4) texels, blocks_wide, blocks_high.
+    partial blocks are padded by repeating the edge texels.
+    '''
+    height, width = rgba.shape[:2]
+    blocks_wide = (width + 3) // 4
+    blocks_high = (height + 3) // 4
+    padded = np.pad(rgba, ((0, blocks_high * 4 - height), (0, blocks_wide * 4 - width), (0, 0)), mode='edge')
+    blocks = (padded.reshape(blocks_high, 4, blocks_wide, 4, 4)
+              .transpose(0, 2, 1, 3, 4)
+              .reshape(-1, 16, 4))
+    return blocks, blocks_wide, blocks_high
+
+
+def _masked_sum(x: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    return np.einsum('nk,nkc->nc', mask, x)
+
+
+def _endpoints(x: np.ndarray, mask: np.ndarray, pca: bool) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    x: (N, 16, C) float32, mask: (N, 16) float32 of the texels to fit.
+    '''
+    inside = mask[:, :, None] > 0
+    lo = np.where(inside, x, np.inf).min(axis=1)
+    hi = np.where(inside, x, -np.inf).max(axis=1)
+    empty = ~np.isfinite(lo[:, 0])
+    lo[empty] = 0
+    hi[empty] = 0
+    if not pca:
+        return hi, lo
+
+    mean = _masked_sum(x, mask) / np.maximum(mask.sum(axis=1), 1)[:, None]
+    d = (x - mean[:, None, :]) * mask[:, :, None]
+    cov = np.einsum('nki,nkj->nij', d, d)
+    # power iteration from the bounding box diagonal
+    axis = hi - lo
+    for _ in range(4):
+        axis = np.einsum('nij,nj->ni', cov, axis)
+        axis /= np.maximum(np.linalg.norm(axis, axis=1), 1e-12)[:, None]
+    t = np.einsum('nkc,nc->nk', x - mean[:, None, :], axis)
+    tmin = np.where(mask > 0, t, np.inf).min(axis=1)
+    tmax = np.where(mask > 0, t, -np.inf).max(axis=1)
+    tmin[empty] = 0
+    tmax[empty] = 0
+    e0 = np.clip(mean + axis * tmax[:, None], 0, 255)
+    e1 = np.clip(mean + axis * tmin[:, None], 0, 255)
+    return e0, e1
+
+
+def _least_squares(x: np.ndarray, mask: np.ndarray, w: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    endpoints minimizing sum |(1 - w) e0 + w e1 - x|^2 for fixed palette weights w (N, 16).
+    ok is False where the system is singular (all texels on one weight).
+    '''
+    v = 1 - w
+    a = (mask * v * v).sum(axis=1)
+    b = (mask * v * w).sum(axis=1)
+    c = (mask * w * w).sum(axis=1)
+    x0 = _masked_sum(x, mask * v)
+    x1 = _masked_sum(x, mask * w)
+    det = a * c - b * b
+    ok = det > 1e-3
+    det = np.where(ok, det, 1)[:, None]
+    e0 = np.clip((c[:, None] * x0 - b[:, None] * x1) / det, 0, 255)
+    e1 = np.clip((a[:, None] * x1 - b[:, None] * x0) / det, 0, 255)
+    return e0, e1, ok
+
+
+def _search(x: np.ndarray, palette: np.ndarray, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    x: (N, 16, C), palette: (N, P, C) -> nearest index (N, 16) and its squared error (N, 16)
+    '''
+    dist = np.square(x[:, :, None, :] - palette[:, None, :, :]).sum(axis=-1)
+    if allowed is not None:
+        dist = np.where(allowed, dist, np.inf)
+    index = dist.argmin(axis=-1)
+    return index, np.take_along_axis(dist, index[:, :, None], axis=-1)[:, :, 0]
+
+
+def _select(better: np.ndarray, new: tuple, old: tuple) -> tuple:
+    return tuple(np.where(better.reshape((-1,) + (1,) * (n.ndim - 1)), n, o) for n, o in zip(new, old))
+
+
+#
+# BC1 color
+#
+def _quantize_565(e: np.ndarray) -> np.ndarray:
+    r = np.rint(e[:, 0] * (31 / 255)).astype(np.int32)
+    g = np.rint(e[:, 1] * (63 / 255)).astype(np.int32)
+    b = np.rint(e[:, 2] * (31 / 255)).astype(np.int32)
+    return (r << 11) | (g << 5) | b
+
+
+def _fit_color(x: np.ndarray, opaque: np.ndarray, three: np.ndarray, always_four: bool,
+               e0: np.ndarray, e1: np.ndarray) -> tuple:
+    c0 = _quantize_565(e0)
+    c1 = _quantize_565(e1)
+    if not always_four:
+        # c0 > c1 selects 4 colors, c0 <= c1 3 colors and transparent
+        swap = np.where(three, c0 > c1, c0 < c1)
+        c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+        four = c0 > c1
+    else:
+        four = np.ones(len(c0), bool)
+    p0 = _expand_565(c0)
+    p1 = _expand_565(c1)
+    palette = np.empty((len(c0), 4, 3), np.int32)
+    palette[:, 0] = p0
+    palette[:, 1] = p1
+    palette[:, 2] = np.where(four[:, None], (2 * p0 + p1 + 1) // 3, (p0 + p1) // 2)
+    palette[:, 3] = np.where(four[:, None], (p0 + 2 * p1 + 1) // 3, 0)
+    # index 3 of a 3 color block is black or transparent. only transparent texels use it
+    allowed = np.ones((len(c0), 16, 4), bool)
+    allowed[:, :, 3] = four[:, None]
+    index, error = _search(x, palette.astype(np.float32), allowed)
+    index = np.where(opaque > 0, index, 3)
+    return c0, c1, index, (error * opaque).sum(axis=1), four
+
+
+def encode_color(texels: np.ndarray, preset: Preset, punchthrough: bool = False, always_four: bool = False) -> np.ndarray:
+    '''
+    BC1 color block. texels: (N, 16, 4) uint8 -> (N, 8) uint8
+    punchthrough encodes alpha < 128 as transparent (BC1_RGBA).
+    always_four is the color block of BC2/BC3, that always has 4 colors.
+    '''
+    x = texels[:, :, :3].astype(np.float32)
+    if punchthrough:
+        opaque = (texels[:, :, 3] >= 128).astype(np.float32)
+    else:
+        opaque = np.ones(texels.shape[:2], np.float32)
+    three = (opaque == 0).any(axis=1)
+
+    best = _fit_color(x, opaque, three, always_four, *_endpoints(x, opaque, preset.pca))
+    for _ in range(preset.refine):
+        c0, c1, index, _, four = best
+        w = np.where(four[:, None], _BC1_WEIGHTS4[index], _BC1_WEIGHTS3[index])
+        e0, e1, ok = _least_squares(x, opaque, w)
+        candidate = _fit_color(x, opaque, three, always_four, e0, e1)
+        best = _select(ok & (candidate[3] < best[3]), candidate, best)
+
+    c0, c1, index, _, _ = best
+    out = np.empty((len(texels), 2), '<u4')
+    out[:, 0] = c0 | (c1 << 16)
+    out[:, 1] = (index.astype(np.uint32) << (np.arange(16, dtype=np.uint32) * 2)).sum(axis=1, dtype=np.uint32)
+    return out.view(np.uint8)
+
+
+#
+# BC4 alpha
+#
+def _fit_alpha(x: np.ndarray, a0: np.ndarray, a1: np.ndarray) -> tuple:
+    a0 = np.rint(a0).astype(np.int32)
+    a1 = np.rint(a1).astype(np.int32)
+    # a0 > a1 selects 8 values
+    a0, a1 = np.maximum(a0, a1), np.minimum(a0, a1)
+    palette = np.empty((len(a0), 8), np.int32)
+    palette[:, 0] = a0
+    palette[:, 1] = a1
+    for i in range(1, 7):
+        palette[:, i + 1] = ((7 - i) * a0 + i * a1 + 3) // 7
+    index, error = _search(x[:, :, None], palette[:, :, None].astype(np.float32))
+    # a0 == a1 is the 6 value mode. index 0 is exact
+    index = np.where((a0 > a1)[:, None], index, 0)
+    return a0, a1, index, error.sum(axis=1)
+
+
+def encode_alpha(values: np.ndarray, preset: Preset) -> np.ndarray:
+    '''
+    BC4 block. values: (N, 16) uint8 -> (N, 8) uint8
+    '''
+    x = values.astype(np.float32)
+    mask = np.ones(values.shape, np.float32)
+    best = _fit_alpha(x, x.max(axis=1), x.min(axis=1))
+    for _ in range(preset.refine):
+        a0, a1, index, _ = best
+        e0, e1, ok = _least_squares(x[:, :, None], mask, _BC4_WEIGHTS[index])
+        candidate = _fit_alpha(x, e0[:, 0], e1[:, 0])
+        best = _select(ok & (candidate[3] < best[3]), candidate, best)
+
+    a0, a1, index, _ = best
+    out = np.empty((len(values), 8), np.uint8)
+    bits = (index.astype(np.uint64) << (np.arange(16, dtype=np.uint64) * np.uint64(3))).sum(axis=1, dtype=np.uint64)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    out[:, 2:] = bits.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :6]
+    return out
+
+
+#
+# BC7 mode 6
+#
+def _quantize_pbit(e: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    8 bit endpoint (N, 4) -> 7 bit components and the shared p-bit with the smaller error
+    '''
+    candidates = []
+    for p in (0, 1):
+        q = np.clip(np.rint((e - p) / 2), 0, 127).astype(np.int32)
+        candidates.append((q, np.square(q * 2 + p - e).sum(axis=1)))
+    (q0, err0), (q1, err1) = candidates
+    p = err1 < err0
+    return np.where(p[:, None], q1, q0), p.astype(np.int32)
+
+
+def _fit_mode6(x: np.ndarray, e0: np.ndarray, e1: np.ndarray) -> tuple:
+    q0, p0 = _quantize_pbit(e0)
+    q1, p1 = _quantize_pbit(e1)
+    v0 = (q0 * 2 + p0[:, None])[:, None, :]
+    v1 = (q1 * 2 + p1[:, None])[:, None, :]
+    w = _BC7_WEIGHTS4[None, :, None]
+    palette = ((64 - w) * v0 + w * v1 + 32) >> 6
+    index, error = _search(x, palette.astype(np.float32))
+    return q0, p0, q1, p1, index, error.sum(axis=1)
+
+
+class _Bits:
+    '''
+    128 bit little endian blocks written lsb first.
+    '''
+
+    def __init__(self, n: int) -> None:
+        self.lo = np.zeros(n, np.uint64)
+        self.hi = np.zeros(n, np.uint64)
+        self.pos = 0
+
+    def put(self, value: np.ndarray, bits: int) -> None:
+        value = np.asarray(value).astype(np.uint64) & np.uint64((1 << bits) - 1)
+        pos = self.pos
+        if pos >= 64:
+            self.hi |= value << np.uint64(pos - 64)
+        else:
+            self.lo |= value << np.uint64(pos)
+            if pos + bits > 64:
+                self.hi |= value >> np.uint64(64 - pos)
+        self.pos += bits
+
+    def to_bytes(self) -> np.ndarray:
+        assert self.pos == 128
+        return np.stack([self.lo, self.hi], axis=1).astype('<u8').view(np.uint8)
+
+
+def encode_bc7(texels: np.ndarray, preset: Preset) -> np.ndarray:
+    '''
+    BC7 mode 6 block. texels: (N, 16, 4) uint8 -> (N, 16) uint8
+    '''
+    x = texels.astype(np.float32)
+    mask = np.ones(texels.shape[:2], np.float32)
+    best = _fit_mode6(x, *_endpoints(x, mask, preset.pca))
+    for _ in range(preset.refine):
+        index = best[4]
+        e0, e1, ok = _least_squares(x, mask, _BC7_WEIGHTS4[index] / np.float32(64))
+        candidate = _fit_mode6(x, e0, e1)
+        best = _select(ok & (candidate[5] < best[5]), candidate, best)
+
+    q0, p0, q1, p1, index, _ = best
+    # the msb of the anchor index (texel 0) is implicitly 0. swap the endpoints when it is set
+    swap = index[:, 0] >= 8
+    q0, q1 = np.where(swap[:, None], q1, q0), np.where(swap[:, None], q0, q1)
+    p0, p1 = np.where(swap, p1, p0), np.where(swap, p0, p1)
+    index = np.where(swap[:, None], 15 - index, index)
+
+    bits = _Bits(len(texels))
+    bits.put(np.full(len(texels), 1 << 6), 7)
+    for c in range(4):
+        bits.put(q0[:, c], 7)
+        bits.put(q1[:, c], 7)
+    bits.put(p0, 1)
+    bits.put(p1, 1)
+    bits.put(index[:, 0], 3)
+    for i in range(1, 16):
+        bits.put(index[:, i], 4)
+    return bits.to_bytes()
+
+
+def encode_blocks(vkFormat: VkFormat, texels: np.ndarray, preset='normal') -> np.ndarray:
+    '''
+    texels: (N, 16, 4) RGBA8 in row major order -> (N, blockBytes) uint8
+    '''
+    preset = get_preset(preset)
+    match vkFormat:
+        case VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK | VkFormat.VK_FORMAT_BC1_RGB_SRGB_BLOCK:
+            def encode(t):
+                return encode_color(t, preset)
+        case VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK | VkFormat.VK_FORMAT_BC1_RGBA_SRGB_BLOCK:
+            def encode(t):
+                return encode_color(t, preset, punchthrough=True)
+        case VkFormat.VK_FORMAT_BC3_UNORM_BLOCK | VkFormat.VK_FORMAT_BC3_SRGB_BLOCK:
+            def encode(t):
+                return np.concatenate([encode_alpha(t[:, :, 3], preset),
+                                       encode_color(t, preset, always_four=True)], axis=1)
+        case VkFormat.VK_FORMAT_BC7_UNORM_BLOCK | VkFormat.VK_FORMAT_BC7_SRGB_BLOCK:
+            def encode(t):
+                return encode_bc7(t, preset)
+        case _:
+            raise NotImplementedError(f'{vkFormat}')
+    info = get_format_info(vkFormat)
+    out = np.empty((len(texels), info.blockBytes), np.uint8)
+    for begin in range(0, len(texels), BATCH_BLOCKS):
+        out[begin:begin + BATCH_BLOCKS] = encode(texels[begin:begin + BATCH_BLOCKS])
+    return out
+
+
+def _check_rgba(rgba: np.ndarray) -> None:
+    if rgba.ndim != 3 or rgba.shape[2] != 4:
+        raise ValueError(f'RGBA (height, width, 4) is required, not {rgba.shape}')
+    # a float or uint16 image would silently wrap
+    if rgba.dtype != np.uint8:
+        raise ValueError(f'uint8 RGBA is required, not {rgba.dtype}')
+
+
+def encode_image(vkFormat: VkFormat, rgba: np.ndarray, preset='normal') -> bytes:
+    '''
+    (height, width, 4) RGBA8 -> level data of one image.
+    '''
+    _check_rgba(rgba)
+    blocks, _, _ = image_to_blocks(rgba)
+    return encode_blocks(vkFormat, blocks, preset).tobytes()
+
+
+#
+# mip chain
+#
+def _to_linear(srgb: np.ndarray) -> np.ndarray:
+    c = srgb / np.float32(255)
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def _to_srgb(linear: np.ndarray) -> np.ndarray:
+    c = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * np.maximum(linear, 0) ** (1 / 2.4) - 0.055)
+    return c * 255
+
+
+def _half(image: np.ndarray) -> np.ndarray:
+    '''
+    2x2 box filter. an odd last row/column is dropped.
+    '''
+    height, width = image.shape[:2]
+    if height > 1:
+        h = height // 2 * 2
+        image = (image[0:h:2] + image[1:h:2]) / 2
+    if width > 1:
+        w = width // 2 * 2
+        image = (image[:, 0:w:2] + image[:, 1:w:2]) / 2
+    return image
+
+
+def make_mipmaps(rgba: np.ndarray, srgb: bool = False) -> List[np.ndarray]:
+    '''
+    the full chain down to 1x1. levels[0] is rgba.
+    sRGB color is averaged in linear space. alpha is always linear.
+    '''
+    levels = [rgba]
+    image = rgba.astype(np.float32)
+    if srgb:
+        image[:, :, :3] = _to_linear(image[:, :, :3])
+    while image.shape[0] > 1 or image.shape[1] > 1:
+        image = _half(image)
+        level = image.copy()
+        if srgb:
+            level[:, :, :3] = _to_srgb(level[:, :, :3])
+        levels.append(np.clip(np.rint(level), 0, 255).astype(np.uint8))
+    return levels
+
+
+def encode_ktx2(vkFormat: VkFormat, rgba: np.ndarray, mipmaps: bool = True, preset='normal',
+                executor: Optional['EncodeExecutor'] = None, kv: Optional[Dict[str, bytes]] = None) -> bytes:
+    '''
+    a 2D texture from (height, width, 4) RGBA8.
+    levels are encoded by the executor when given, otherwise in this process.
+    '''
+    from .writer import serialize, make_dfd
+    if vkFormat not in SUPPORTED_FORMATS:
+        raise NotImplementedError(f'{vkFormat}')
+    images = make_mipmaps(rgba, '_SRGB_' in vkFormat.name) if mipmaps else [rgba]
+    if executor:
+        futures = [executor.submit(vkFormat, image, preset) for image in images]
+        levels = [f.result() for f in futures]
+    else:
+        levels = [encode_image(vkFormat, image, preset) for image in images]
+    height, width = rgba.shape[:2]
+    return serialize(vkFormat, 1, width, height, 0, 0, 1, make_dfd(vkFormat), kv or {}, levels)
@@ -0,0 +1,179 @@
+'''
+decode a level image or a region of it.
+
+uncompressed formats decode to a (height, width, components) array of the component dtype.
+block compressed formats decode to RGBA8.
+'''
+import io
+import os
+import pathlib
+from typing import BinaryIO, Optional
+import numpy as np
+from .parser import VkFormat, SupercompressionScheme, Ktx2Header, KtxError, read_header
+from .instrumentation import ParseStats, NULL_STATS
+from .formats import FormatInfo, get_format_info, get_level_extent, get_block_count, get_image_size
+from .supercompression import decompress_level
+from . import bcn
+
+
+def read_at(f: BinaryIO, offset: int, size: int, stats: ParseStats = NULL_STATS) -> bytes:
+    '''
+    positioned read. falls back to seek + read for in memory files.
+    '''
+    try:
+        fd = f.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        fd = None
+    with stats.stage('read'):
+        if fd is not None and hasattr(os, 'pread'):
+            data = os.pread(fd, size, offset)
+        else:
+            f.seek(offset)
+            data = f.read(size)
+    stats.read(len(data))
+    if len(data) != size:
+        raise KtxError(f'unexpected end of file at {offset + len(data)}')
+    return data
+
+
+def _decode_blocks(vkFormat: VkFormat, info: FormatInfo, data: bytes, blocks_wide: int, blocks_high: int) -> np.ndarray:
+    if not info.is_compressed:
+        components = max(1, len(info.channels))
+        return np.frombuffer(data, info.dtype).reshape(blocks_high, blocks_wide, components)
+    if vkFormat not in bcn.SUPPORTED_FORMATS:
+        raise NotImplementedError(f'{vkFormat}')
+    texels = bcn.decode_blocks(vkFormat,
+                               np.frombuffer(data, np.uint8).reshape(-1, info.blockBytes))
+    return bcn.blocks_to_image(texels, blocks_wide, blocks_high)
+
+
+def decode_image(vkFormat: VkFormat, data: bytes, width: int, height: int,
+                 stats: ParseStats = NULL_STATS) -> np.ndarray:
+    '''
+    data is one image (a single layer/face/depth slice) of a level.
+    '''
+    info = get_format_info(vkFormat)
+    blocks_wide, blocks_high, _ = get_block_count(info, width, height)
+    size = blocks_wide * blocks_high * info.blockBytes
+    with stats.stage('decode'):
+        image = _decode_blocks(vkFormat, info, memoryview(data)[:size], blocks_wide, blocks_high)
+    stats.image()
+    return image[:height, :width]
+
+
+def get_image_offset(header: Ktx2Header, level: int, layer: int = 0, face: int = 0, depth: int = 0) -> int:
+    '''
+    byte offset of a 2D slice in the uncompressed level data.
+    '''
+    info = get_format_info(header.vkFormat)
+    width, height, depth_count = get_level_extent(
+        header.pixelWidth, header.pixelHeight, header.pixelDepth, level)
+    if not (0 <= layer < max(1, header.layerCount) and 0 <= face < header.faceCount and 0 <= depth < depth_count):
+        raise ValueError(f'no layer {layer}, face {face}, depth {depth}')
+    slice_size = get_image_size(info, width, height)
+    return ((layer * header.faceCount + face) * depth_count + depth) * slice_size
+
+
+def read_level(f: BinaryIO, header: Ktx2Header, level: int,
+               stats: ParseStats = NULL_STATS) -> bytes:
+    '''
+    the whole level, decompressed.
+    '''
+    level_index = header.levelIndices[level]
+    data = read_at(f, level_index.byteOffset, level_index.byteLength, stats)
+    if header.supercompressionScheme == SupercompressionScheme.NONE:
+        return data
+    with stats.stage('decompress'):
+        return decompress_level(header.supercompressionScheme, data, level_index)
+
+
+def decode_region(f: BinaryIO, x: int, y: int, w: int, h: int,
+                  level: int = 0, layer: int = 0, face: int = 0, depth: int = 0,
+                  header: Optional[Ktx2Header] = None,
+                  stats: ParseStats = NULL_STATS,
+                  level_data: Optional[bytes] = None) -> np.ndarray:
+    '''
+    decode the rectangle (x, y, w, h) of a level.
+
+    only the texel blocks that cover the rectangle are read and decoded.
+    a supercompressed level has to be decompressed as a whole.
+    level_data is the already decompressed level, to decode many rectangles of it.
+    '''
+    if header is None:
+        header = read_header(f, stats)
+    if not 0 <= level < len(header.levelIndices):
+        raise ValueError(f'no level {level}')
+    info = get_format_info(header.vkFormat)
+    width, height, _ = get_level_extent(
+        header.pixelWidth, header.pixelHeight, header.pixelDepth, level)
+    if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > width or y + h > height:
+        raise ValueError(
+            f'({x}, {y}, {w}, {h}) is out of {width}x{height}')
+
+    # texel blocks that cover the region
+    bx0 = x // info.blockWidth
+    by0 = y // info.blockHeight
+    bx1 = (x + w + info.blockWidth - 1) // info.blockWidth
+    by1 = (y + h + info.blockHeight - 1) // info.blockHeight
+    pitch = get_block_count(info, width, height)[0] * info.blockBytes
+    offset = get_image_offset(header, level, layer, face, depth)
+    span = (bx1 - bx0) * info.blockBytes
+
+    level_index = header.levelIndices[level]
+    if level_data is None:
+        match header.supercompressionScheme:
+            case SupercompressionScheme.NONE:
+                base = level_index.byteOffset + offset
+                data = b''.join(read_at(f, base + row * pitch + bx0 * info.blockBytes, span, stats)
+                                for row in range(by0, by1))
+                stats.copy(len(data))
+            case SupercompressionScheme.Zstandard | SupercompressionScheme.ZLIB:
+                level_data = read_level(f, header, level, stats)
+            case _:
+                raise NotImplementedError(f'{header.supercompressionScheme}')
+    if level_data is not None:
+        view = memoryview(level_data)
+        data = b''.join(view[offset + row * pitch + bx0 * info.blockBytes:
+                             offset + row * pitch + bx0 * info.blockBytes + span]
+                        for row in range(by0, by1))
+        stats.copy(len(data))
+
+    with stats.stage('decode'):
+        image = _decode_blocks(header.vkFormat, info, data, bx1 - bx0, by1 - by0)
+    stats.image()
+    ox = x - bx0 * info.blockWidth
+    oy = y - by0 * info.blockHeight
+    return image[oy:oy + h, ox:ox + w]
+
+
+def decode_region_path(path: pathlib.Path, x: int, y: int, w: int, h: int,
+                       level: int = 0, layer: int = 0, face: int = 0, depth: int = 0,
+                       stats: ParseStats = NULL_STATS) -> np.ndarray:
+    with path.open('rb') as f:
+        return decode_region(f, x, y, w, h, level, layer, face, depth, stats=stats)
+
+
+def to_rgba8(image: np.ndarray, vkFormat: VkFormat) -> np.ndarray:
+    '''
+    convert a decoded image to (height, width, 4) uint8 for display.
+    float components are clipped to [0, 1]. integer components are normalized to their range.
+    '''
+    info = get_format_info(vkFormat)
+    if info.is_compressed:
+        return image
+    if not info.channels:
+        raise NotImplementedError(f'{vkFormat}')
+    dtype = np.dtype(info.dtype)
+    if dtype == np.uint8:
+        values = image
+    elif dtype.kind == 'f':
+        values = np.nan_to_num(np.clip(image.astype(np.float32), 0, 1)) * 255 + 0.5
+    else:
+        iinfo = np.iinfo(dtype)
+        values = (image.astype(np.float32) - iinfo.min) * \
+            (255 / (iinfo.max - iinfo.min)) + 0.5
+    rgba = np.zeros(image.shape[:2] + (4,), np.uint8)
+    rgba[:, :, 3] = 255
+    for i, channel in enumerate(info.channels):
+        rgba[:, :, 'RGBA'.index(channel)] = values[:, :, i]
+    return rgba
@@ -0,0 +1,177 @@
+'''
+multiprocess decoder for large block compressed levels.
+
+a level is copied once into shared memory. worker processes decode ranges of
+block rows and write RGBA8 texels straight into a shared output buffer,
+so neither the input nor the decoded image is pickled.
+'''
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, CancelledError, wait
+from multiprocessing import shared_memory
+from typing import Optional, List, Iterator, Iterable, Tuple
+import numpy as np
+from .parser import VkFormat
+from .formats import get_format_info, get_block_count
+from . import bcn
+
+
+class SharedImage:
+    '''
+    decoded RGBA8 image backed by shared memory. call release() when done.
+    '''
+
+    def __init__(self, shm: shared_memory.SharedMemory, width: int, height: int, shape: Tuple[int, int, int]) -> None:
+        self._shm = shm
+        self.width = width
+        self.height = height
+        self._full: Optional[np.ndarray] = np.ndarray(
+            shape, np.uint8, buffer=shm.buf)
+
+    @property
+    def array(self) -> np.ndarray:
+        '''
+        (height, width, 4) view. must not outlive release().
+        '''
+        if self._full is None:
+            raise ValueError('released')
+        return self._full[:self.height, :self.width]
+
+    def release(self) -> None:
+        if self._full is None:
+            return
+        self._full = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> 'SharedImage':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+def _decode_rows(src_name: str, dst_name: str, vkFormat: int,
+                 blocks_wide: int, blocks_high: int, row_begin: int, row_end: int) -> None:
+    src = shared_memory.SharedMemory(src_name)
+    dst = shared_memory.SharedMemory(dst_name)
+    try:
+        info = get_format_info(VkFormat(vkFormat))
+        blocks = np.ndarray((blocks_high, blocks_wide, info.blockBytes),
+                            np.uint8, buffer=src.buf)
+        image = np.ndarray((blocks_high * 4, blocks_wide * 4, 4),
+                           np.uint8, buffer=dst.buf)
+        rows = row_end - row_begin
+        texels = bcn.decode_blocks(VkFormat(vkFormat),
+                                   blocks[row_begin:row_end].reshape(-1, info.blockBytes))
+        image[row_begin * 4:row_end * 4] = bcn.blocks_to_image(
+            texels, blocks_wide, rows)
+        del blocks
+        del image
+    finally:
+        src.close()
+        dst.close()
+
+
+class DecodeExecutor:
+    '''
+    concurrent.futures style executor. reuse one instance across calls.
+
+    with DecodeExecutor() as executor:
+        future = executor.submit(vkFormat, level_bytes, width, height)
+        with future.result() as image:
+            image.array
+    '''
+
+    def __init__(self, max_workers: Optional[int] = None, tasks_per_worker: int = 4, mp_context=None) -> None:
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._tasks_per_worker = tasks_per_worker
+        self._pool = ProcessPoolExecutor(self._max_workers, mp_context)
+
+    def submit(self, vkFormat: VkFormat, data, width: int, height: int) -> 'Future[SharedImage]':
+        '''
+        data is one image (a single layer/face/depth slice) of a level.
+        '''
+        if vkFormat not in bcn.SUPPORTED_FORMATS:
+            raise NotImplementedError(f'{vkFormat}')
+        info = get_format_info(vkFormat)
+        blocks_wide, blocks_high, _ = get_block_count(info, width, height)
+        size = blocks_wide * blocks_high * info.blockBytes
+        if len(data) < size:
+            raise ValueError(f'{len(data)} < {size} bytes')
+
+        src = shared_memory.SharedMemory(create=True, size=size)
+        src.buf[:size] = memoryview(data).cast('B')[:size]
+        shape = (blocks_high * 4, blocks_wide * 4, 4)
+        try:
+            dst = shared_memory.SharedMemory(
+                create=True, size=shape[0] * shape[1] * shape[2])
+        except BaseException:
+            src.close()
+            src.unlink()
+            raise
+
+        def release_all():
+            src.close()
+            src.unlink()
+            dst.close()
+            dst.unlink()
+
+        tasks = self._max_workers * self._tasks_per_worker
+        rows_per_task = max(1, (blocks_high + tasks - 1) // tasks)
+        futures: List[Future] = []
+        try:
+            for row in range(0, blocks_high, rows_per_task):
+                futures.append(self._pool.submit(
+                    _decode_rows, src.name, dst.name, vkFormat.value,
+                    blocks_wide, blocks_high, row, min(blocks_high, row + rows_per_task)))
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            wait(futures)
+            release_all()
+            raise
+
+        result: 'Future[SharedImage]' = Future()
+        result.set_running_or_notify_cancel()
+        lock = threading.Lock()
+        remaining = [len(futures)]
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            error: Optional[BaseException] = None
+            for f in futures:
+                if f.cancelled():
+                    error = CancelledError()
+                    break
+                if f.exception():
+                    error = f.exception()
+                    break
+            if error:
+                release_all()
+                result.set_exception(error)
+            else:
+                src.close()
+                src.unlink()
+                result.set_result(SharedImage(dst, width, height, shape))
+
+        for f in futures:
+            f.add_done_callback(on_done)
+        return result
+
+    def map(self, items: Iterable[Tuple[VkFormat, bytes, int, int]]) -> Iterator[SharedImage]:
+        futures = [self.submit(*item) for item in items]
+        for f in futures:
+            yield f.result()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._pool.shutdown(wait, cancel_futures=cancel_futures)
+
+    def __enter__(self) -> 'DecodeExecutor':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
@@ -0,0 +1,141 @@
+'''
+data format descriptor.
+
+every descriptor block is walked. the samples of the basic descriptor block
+are decoded into a structured array with a single frombuffer.
+parsed descriptors are interned by their raw bytes, so identical dfds are parsed once.
+
+* https://www.khronos.org/registry/DataFormat/specs/1.3/dataformat.1.3.html
+'''
+import functools
+import struct
+from typing import Iterator, NamedTuple, Optional, Tuple, Any
+import numpy as np
+from .parser import ColorModel, ColorPrimaries, TransferFunction, DFDBasicFlags, KtxError
+
+KHR_DF_VENDORID_KHRONOS = 0
+KHR_DF_KHR_DESCRIPTORTYPE_BASICFORMAT = 0
+BASIC_HEADER_SIZE = 24
+
+# channelType upper 4 bits
+KHR_DF_SAMPLE_DATATYPE_LINEAR = 0x10
+KHR_DF_SAMPLE_DATATYPE_EXPONENT = 0x20
+KHR_DF_SAMPLE_DATATYPE_SIGNED = 0x40
+KHR_DF_SAMPLE_DATATYPE_FLOAT = 0x80
+
+# bitLength and samplePosition are stored as value - 1 and in 1/256 texel units
+SAMPLE_DTYPE = np.dtype([
+    ('bitOffset', '<u2'),
+    ('bitLength', 'u1'),
+    ('channelType', 'u1'),
+    ('samplePosition', 'u1', (4,)),
+    ('sampleLower', '<u4'),
+    ('sampleUpper', '<u4'),
+])
+assert SAMPLE_DTYPE.itemsize == 16
+
+INTERN_SIZE = 1024
+
+
+class DescriptorBlock(NamedTuple):
+    vendorId: int
+    descriptorType: int
+    versionNumber: int
+    # the whole block including its 8 byte header
+    data: bytes
+
+
+class DataFormatDescriptor:
+    '''
+    iterates and indexes as (basic, samples) like the former parse_dfd tuple.
+    basic is None when the first block is not the khronos basic descriptor block.
+    samples is a read only array of SAMPLE_DTYPE. it is shared by interned descriptors.
+    '''
+
+    def __init__(self, totalSize: int, blocks: Tuple[DescriptorBlock, ...],
+                 basic: Optional[DFDBasicFlags], samples: np.ndarray) -> None:
+        self.totalSize = totalSize
+        self.blocks = blocks
+        self.basic = basic
+        self.samples = samples
+
+    def __iter__(self) -> Iterator[Any]:
+        yield self.basic
+        yield self.samples
+
+    def __getitem__(self, index):
+        return (self.basic, self.samples)[index]
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return f'DataFormatDescriptor({self.basic}, {len(self.samples)} samples, {len(self.blocks)} blocks)'
+
+    @property
+    def channel_ids(self) -> np.ndarray:
+        return self.samples['channelType'] & 0x0F
+
+    @property
+    def qualifiers(self) -> np.ndarray:
+        return self.samples['channelType'] & 0xF0
+
+    @property
+    def bit_lengths(self) -> np.ndarray:
+        '''
+        actual bit lengths. the stored field is bitLength - 1.
+        '''
+        return self.samples['bitLength'].astype(np.uint32) + 1
+
+
+def _parse_basic(block: bytes) -> Tuple[DFDBasicFlags, np.ndarray]:
+    if len(block) < BASIC_HEADER_SIZE or (len(block) - BASIC_HEADER_SIZE) % SAMPLE_DTYPE.itemsize:
+        raise KtxError(f'basic descriptorBlockSize {len(block)} is not 24 + 16 * samples')
+    flags = block[8:24]
+    try:
+        basic = DFDBasicFlags(ColorModel(flags[0]),
+                              ColorPrimaries(flags[1]),
+                              TransferFunction(flags[2]),
+                              *flags[3:])
+    except ValueError as e:
+        raise KtxError(f'basic descriptor: {e}') from e
+    samples = np.frombuffer(block, SAMPLE_DTYPE, offset=BASIC_HEADER_SIZE)
+    return basic, samples
+
+
+@functools.lru_cache(maxsize=INTERN_SIZE)
+def _parse(data: bytes) -> DataFormatDescriptor:
+    if len(data) < 4:
+        raise KtxError('truncated dfdTotalSize')
+    totalSize = struct.unpack_from('<I', data)[0]
+    if totalSize > len(data):
+        raise KtxError(f'dfdTotalSize {totalSize} exceeds {len(data)} bytes')
+
+    blocks = []
+    pos = 4
+    while pos < totalSize:
+        if pos + 8 > totalSize:
+            raise KtxError(f'truncated descriptor block at {pos}')
+        vendorId_descriptorType, versionNumber, descriptorBlockSize = struct.unpack_from(
+            '<IHH', data, pos)
+        if descriptorBlockSize < 8 or pos + descriptorBlockSize > totalSize:
+            raise KtxError(f'descriptorBlockSize {descriptorBlockSize} at {pos} is out of the dfd')
+        blocks.append(DescriptorBlock(vendorId_descriptorType & 0x1FFFF,
+                                      vendorId_descriptorType >> 17,
+                                      versionNumber,
+                                      data[pos:pos + descriptorBlockSize]))
+        pos += descriptorBlockSize
+
+    basic = None
+    samples = np.empty(0, SAMPLE_DTYPE)
+    if blocks and blocks[0].vendorId == KHR_DF_VENDORID_KHRONOS \
+            and blocks[0].descriptorType == KHR_DF_KHR_DESCRIPTORTYPE_BASICFORMAT:
+        basic, samples = _parse_basic(blocks[0].data)
+    return DataFormatDescriptor(totalSize, tuple(blocks), basic, samples)
+
+
+def parse_dfd(data: bytes) -> DataFormatDescriptor:
+    '''
+    data is the dfd from dfdTotalSize. bytes after dfdTotalSize are ignored.
+    '''
+    return _parse(bytes(data))
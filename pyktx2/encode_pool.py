@@ -0,0 +1,153 @@
+'''
+multiprocess BC encoder.
+
+a small image is one task, so that thousands of small textures share the
+worker processes instead of paying a process spawn each.
+a large image is copied once into shared memory. worker processes encode
+ranges of block rows and write the blocks straight into a shared output buffer.
+'''
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, CancelledError, wait
+from multiprocessing import shared_memory, resource_tracker
+from typing import Optional, List, Iterator, Iterable, Tuple
+import numpy as np
+from .parser import VkFormat
+from .formats import get_format_info
+from . import bcn_encode
+
+# images of at most this many blocks are encoded by a single task
+SMALL_IMAGE_BLOCKS = 4096
+
+
+def _encode_small(vkFormat: int, rgba: np.ndarray, preset: bcn_encode.Preset) -> bytes:
+    return bcn_encode.encode_image(VkFormat(vkFormat), rgba, preset)
+
+
+def _encode_rows(src_name: str, dst_name: str, vkFormat: int, width: int, height: int,
+                 row_begin: int, row_end: int, preset: bcn_encode.Preset) -> None:
+    src = shared_memory.SharedMemory(src_name)
+    dst = shared_memory.SharedMemory(dst_name)
+    try:
+        info = get_format_info(VkFormat(vkFormat))
+        blocks_wide = (width + 3) // 4
+        blocks_high = (height + 3) // 4
+        image = np.ndarray((height, width, 4), np.uint8, buffer=src.buf)
+        out = np.ndarray((blocks_high, blocks_wide, info.blockBytes), np.uint8, buffer=dst.buf)
+        texels, _, _ = bcn_encode.image_to_blocks(image[row_begin * 4:min(height, row_end * 4)])
+        out[row_begin:row_end] = bcn_encode.encode_blocks(VkFormat(vkFormat), texels, preset).reshape(
+            row_end - row_begin, blocks_wide, info.blockBytes)
+        del image
+        del out
+    finally:
+        src.close()
+        dst.close()
+
+
+class EncodeExecutor:
+    '''
+    concurrent.futures style executor. reuse one instance across calls.
+
+    with EncodeExecutor() as executor:
+        level_bytes = executor.submit(vkFormat, rgba, 'normal').result()
+    '''
+
+    def __init__(self, max_workers: Optional[int] = None, tasks_per_worker: int = 4, mp_context=None) -> None:
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._tasks_per_worker = tasks_per_worker
+        if os.name == 'posix':
+            # workers forked before the first shared memory would start their own trackers
+            # and report the parent's segments as leaked
+            resource_tracker.ensure_running()
+        self._pool = ProcessPoolExecutor(self._max_workers, mp_context)
+
+    def submit(self, vkFormat: VkFormat, rgba: np.ndarray, preset='normal') -> 'Future[bytes]':
+        '''
+        rgba is one (height, width, 4) RGBA8 image. the result is its level data.
+        '''
+        if vkFormat not in bcn_encode.SUPPORTED_FORMATS:
+            raise NotImplementedError(f'{vkFormat}')
+        bcn_encode._check_rgba(rgba)
+        preset = bcn_encode.get_preset(preset)
+        rgba = np.ascontiguousarray(rgba)
+        height, width = rgba.shape[:2]
+        info = get_format_info(vkFormat)
+        blocks_wide = (width + 3) // 4
+        blocks_high = (height + 3) // 4
+        if blocks_wide * blocks_high <= SMALL_IMAGE_BLOCKS:
+            return self._pool.submit(_encode_small, vkFormat.value, rgba, preset)
+
+        size = blocks_wide * blocks_high * info.blockBytes
+        src = shared_memory.SharedMemory(create=True, size=rgba.nbytes)
+        src.buf[:rgba.nbytes] = rgba.reshape(-1)
+        try:
+            dst = shared_memory.SharedMemory(create=True, size=size)
+        except BaseException:
+            src.close()
+            src.unlink()
+            raise
+
+        def release_all():
+            src.close()
+            src.unlink()
+            dst.close()
+            dst.unlink()
+
+        tasks = self._max_workers * self._tasks_per_worker
+        rows_per_task = max(1, (blocks_high + tasks - 1) // tasks)
+        futures: List[Future] = []
+        try:
+            for row in range(0, blocks_high, rows_per_task):
+                futures.append(self._pool.submit(
+                    _encode_rows, src.name, dst.name, vkFormat.value, width, height,
+                    row, min(blocks_high, row + rows_per_task), preset))
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            wait(futures)
+            release_all()
+            raise
+
+        result: 'Future[bytes]' = Future()
+        result.set_running_or_notify_cancel()
+        lock = threading.Lock()
+        remaining = [len(futures)]
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            error: Optional[BaseException] = None
+            for f in futures:
+                if f.cancelled():
+                    error = CancelledError()
+                    break
+                if f.exception():
+                    error = f.exception()
+                    break
+            if error:
+                release_all()
+                result.set_exception(error)
+            else:
+                data = bytes(dst.buf[:size])
+                release_all()
+                result.set_result(data)
+
+        for f in futures:
+            f.add_done_callback(on_done)
+        return result
+
+    def map(self, items: Iterable[Tuple[VkFormat, np.ndarray, str]]) -> Iterator[bytes]:
+        futures = [self.submit(*item) for item in items]
+        for f in futures:
+            yield f.result()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._pool.shutdown(wait, cancel_futures=cancel_futures)
+
+    def __enter__(self) -> 'EncodeExecutor':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
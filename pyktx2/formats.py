@@ -0,0 +1,115 @@
+'''
+texel block layout of VkFormat and mip level geometry.
+'''
+import re
+import functools
+from typing import NamedTuple, Optional, Dict, Tuple, Union
+from .vkformat import VkFormat, VK_FORMAT_NAMES
+
+
+class FormatInfo(NamedTuple):
+    blockWidth: int
+    blockHeight: int
+    blockDepth: int
+    blockBytes: int
+    # numpy dtype of a component. None for block compressed formats
+    dtype: Optional[str]
+    # components in memory order. '' for packed and block compressed formats
+    channels: str
+
+    @property
+    def is_compressed(self) -> bool:
+        return self.dtype is None
+
+
+_PLAIN = re.compile(
+    r'^VK_FORMAT_((?:[RGBA]\d+)+)_(UNORM|SNORM|USCALED|SSCALED|UINT|SINT|SRGB|SFLOAT)$')
+_PACKED = re.compile(r'^VK_FORMAT_\w+_PACK(8|16|32)$')
+_COMPONENT = re.compile(r'([RGBA])(\d+)')
+_ASTC = re.compile(r'^VK_FORMAT_ASTC_(\d+)x(\d+)_')
+_KIND = {
+    'UNORM': 'u', 'USCALED': 'u', 'UINT': 'u', 'SRGB': 'u',
+    'SNORM': 'i', 'SSCALED': 'i', 'SINT': 'i',
+    'SFLOAT': 'f',
+}
+
+
+def _parse_name(name: str) -> Optional[FormatInfo]:
+    m = _PLAIN.match(name)
+    if m:
+        components = _COMPONENT.findall(m.group(1))
+        bits = {int(b) for _, b in components}
+        if len(bits) != 1:
+            return None
+        size = bits.pop() // 8
+        channels = ''.join(c for c, _ in components)
+        return FormatInfo(1, 1, 1, size * len(channels),
+                          f'<{_KIND[m.group(2)]}{size}', channels)
+    m = _PACKED.match(name)
+    if m and 'PLANE' not in name and '422' not in name:
+        size = int(m.group(1)) // 8
+        return FormatInfo(1, 1, 1, size, f'<u{size}', '')
+    if name.startswith('VK_FORMAT_BC1_') or name.startswith('VK_FORMAT_BC4_'):
+        return FormatInfo(4, 4, 1, 8, None, '')
+    if name.startswith('VK_FORMAT_BC'):
+        return FormatInfo(4, 4, 1, 16, None, '')
+    if name.startswith('VK_FORMAT_ETC2_R8G8B8A8_') or name.startswith('VK_FORMAT_EAC_R11G11_'):
+        return FormatInfo(4, 4, 1, 16, None, '')
+    if name.startswith('VK_FORMAT_ETC2_') or name.startswith('VK_FORMAT_EAC_'):
+        return FormatInfo(4, 4, 1, 8, None, '')
+    m = _ASTC.match(name)
+    if m:
+        return FormatInfo(int(m.group(1)), int(m.group(2)), 1, 16, None, '')
+    if name.startswith('VK_FORMAT_PVRTC'):
+        return FormatInfo(8 if '_2BPP_' in name else 4, 4, 1, 8, None, '')
+    return None
+
+
+@functools.cache
+def _format_table() -> Dict[int, FormatInfo]:
+    '''
+    keyed by the VkFormat value. no VkFormat member is created.
+    '''
+    table = {}
+    for value, name in VK_FORMAT_NAMES.items():
+        info = _parse_name(name)
+        if info:
+            table[value] = info
+    return table
+
+
+def get_format_info(vkFormat: Union[VkFormat, int]) -> FormatInfo:
+    info = _format_table().get(vkFormat if isinstance(vkFormat, int) else vkFormat.value)
+    if not info:
+        raise NotImplementedError(f'{vkFormat}')
+    return info
+
+
+def get_level_extent(pixelWidth: int, pixelHeight: int, pixelDepth: int, level: int) -> Tuple[int, int, int]:
+    '''
+    pixelHeight and pixelDepth may be 0 in the header. the extent is at least 1.
+    '''
+    return (max(1, pixelWidth >> level),
+            max(1, max(1, pixelHeight) >> level),
+            max(1, max(1, pixelDepth) >> level))
+
+
+def get_block_count(info: FormatInfo, width: int, height: int, depth: int = 1) -> Tuple[int, int, int]:
+    return ((width + info.blockWidth - 1) // info.blockWidth,
+            (height + info.blockHeight - 1) // info.blockHeight,
+            (depth + info.blockDepth - 1) // info.blockDepth)
+
+
+def get_row_pitch(info: FormatInfo, width: int) -> int:
+    '''
+    bytes of one row of texel blocks.
+    '''
+    return get_block_count(info, width, 1)[0] * info.blockBytes
+
+
+def get_image_size(info: FormatInfo, width: int, height: int, depth: int = 1) -> int:
+    '''
+    bytes of one layer/face of a level. depth slices are included.
+    '''
+    bw, bh, bd = get_block_count(info, width, height, depth)
+    return bw * bh * bd * info.blockBytes
@@ -0,0 +1,373 @@
+'''
+content hashes of mip levels and subresources, and duplicates across a directory tree.
+
+level data is hashed straight from the byte ranges of the level index
+through mmap (or positioned reads). images are never decoded.
+
+    ktx2_hash textures/ --jobs 8
+'''
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import threading
+from collections import defaultdict
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from .parser import Ktx2Header, SupercompressionScheme, KtxError, read_header
+from .formats import get_format_info, get_level_extent, get_image_size
+from .decode import read_at
+
+DIGEST_SIZE = 16
+CHUNK_SIZE = 1 << 20
+# bump when the digests change
+CACHE_VERSION = 1
+
+
+class LevelHash(NamedTuple):
+    level: int
+    byteLength: int
+    digest: str
+    # one for each layer/face in layer major order. depth slices are included.
+    # empty for a supercompressed level
+    subresources: List[str]
+
+
+class FileHash(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    # header, dfd and every level. the kvd is excluded
+    digest: str
+    levels: List[LevelHash]
+    # chains[i] covers the levels i..levelCount-1
+    chains: List[str]
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def _level_prefix(header: Ktx2Header, level: int) -> bytes:
+    '''
+    levels of the same bytes in different formats or extents must not match.
+    '''
+    width, height, depth = get_level_extent(header.pixelWidth, header.pixelHeight, header.pixelDepth, level)
+    return struct.pack('<8I', header.vkFormat.value, header.supercompressionScheme.value,
+                       width, height, depth, max(1, header.layerCount), header.faceCount, 0)
+
+
+def _subresource_size(header: Ktx2Header, level: int, byteLength: int) -> Optional[int]:
+    if header.supercompressionScheme != SupercompressionScheme.NONE:
+        return None
+    try:
+        info = get_format_info(header.vkFormat)
+    except NotImplementedError:
+        return None
+    width, height, depth = get_level_extent(header.pixelWidth, header.pixelHeight, header.pixelDepth, level)
+    size = get_image_size(info, width, height, depth)
+    if size * max(1, header.layerCount) * header.faceCount != byteLength:
+        return None
+    return size
+
+
+class _Source:
+    '''
+    chunks of a byte range from mmap. falls back to positioned reads.
+    '''
+
+    def __init__(self, f: BinaryIO) -> None:
+        self.f = f
+        self.mm: Optional[mmap.mmap] = None
+        self.view: Optional[memoryview] = None
+        try:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.mm)
+        except (AttributeError, OSError, ValueError):
+            pass
+
+    def close(self) -> None:
+        if self.view is not None:
+            self.view.release()
+        if self.mm is not None:
+            self.mm.close()
+
+    def chunks(self, offset: int, size: int) -> Iterator[memoryview]:
+        '''
+        the caller releases each chunk.
+        '''
+        if self.view is not None and offset + size > len(self.view):
+            raise KtxError(f'unexpected end of file at {len(self.view)}')
+        end = offset + size
+        while offset < end:
+            n = min(CHUNK_SIZE, end - offset)
+            if self.view is not None:
+                yield self.view[offset:offset + n]
+            else:
+                yield memoryview(read_at(self.f, offset, n))
+            offset += n
+
+
+def _hash_level(source: _Source, header: Ktx2Header, level: int) -> LevelHash:
+    index = header.levelIndices[level]
+    prefix = _level_prefix(header, level)
+    level_hash = _new_hash()
+    level_hash.update(prefix)
+    subresource_size = _subresource_size(header, level, index.byteLength)
+
+    subresources: List[str] = []
+    sub = None
+    remaining = 0
+    for chunk in source.chunks(index.byteOffset, index.byteLength):
+        level_hash.update(chunk)
+        if subresource_size is None:
+            chunk.release()
+            continue
+        pos = 0
+        while pos < len(chunk):
+            if sub is None:
+                sub = _new_hash()
+                sub.update(prefix)
+                remaining = subresource_size
+            n = min(remaining, len(chunk) - pos)
+            sub.update(chunk[pos:pos + n])
+            pos += n
+            remaining -= n
+            if remaining == 0:
+                subresources.append(sub.hexdigest())
+                sub = None
+        chunk.release()
+    return LevelHash(level, index.byteLength, level_hash.hexdigest(), subresources)
+
+
+def hash_file(f: BinaryIO, path: str = '', size: int = 0, mtime_ns: int = 0) -> FileHash:
+    header = read_header(f)
+    dfd = read_at(f, header.dfdByteOffset, header.dfdByteLength)
+    source = _Source(f)
+    try:
+        levels = [_hash_level(source, header, i) for i in range(len(header.levelIndices))]
+    finally:
+        source.close()
+
+    chains: List[str] = [''] * len(levels)
+    chain = ''
+    for level in reversed(levels):
+        chain = hashlib.blake2b((level.digest + chain).encode('ascii'), digest_size=DIGEST_SIZE).hexdigest()
+        chains[level.level] = chain
+
+    file_hash = _new_hash()
+    file_hash.update(struct.pack('<9I', header.vkFormat.value, header.typeSize,
+                                 header.pixelWidth, header.pixelHeight, header.pixelDepth,
+                                 header.layerCount, header.faceCount, header.levelCount,
+                                 header.supercompressionScheme.value))
+    file_hash.update(dfd)
+    file_hash.update(chains[0].encode('ascii') if chains else b'')
+    return FileHash(path, size, mtime_ns, file_hash.hexdigest(), levels, chains)
+
+
+def hash_path(path: pathlib.Path) -> FileHash:
+    with path.open('rb') as f:
+        st = os.fstat(f.fileno())
+        return hash_file(f, str(path), st.st_size, st.st_mtime_ns)
+
+
+def get_cache_path() -> pathlib.Path:
+    base = os.environ.get('XDG_CACHE_HOME')
+    return (pathlib.Path(base) if base else pathlib.Path.home() / '.cache') / 'pyktx2' / 'hashes.json'
+
+
+class HashCache:
+    '''
+    FileHash by resolved path. an entry is valid while size and mtime are unchanged.
+    save() rewrites the whole store, only when an entry was added or dropped.
+    '''
+
+    def __init__(self, path: Optional[pathlib.Path] = None) -> None:
+        self.path = path or get_cache_path()
+        self.entries: Dict[str, FileHash] = {}
+        self.dirty = False
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        if data.get('version') != CACHE_VERSION:
+            return
+        for key, e in data['entries'].items():
+            levels = [LevelHash(*level) for level in e['levels']]
+            self.entries[key] = FileHash(e['path'], e['size'], e['mtime_ns'], e['digest'], levels, e['chains'])
+
+    def get(self, path: pathlib.Path) -> Optional[FileHash]:
+        key = str(path.resolve())
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            # removed since it was cached
+            del self.entries[key]
+            self.dirty = True
+            return None
+        if (entry.size, entry.mtime_ns) != (st.st_size, st.st_mtime_ns):
+            return None
+        return entry._replace(path=str(path))
+
+    def put(self, path: pathlib.Path, file_hash: FileHash) -> None:
+        self.entries[str(path.resolve())] = file_hash
+        self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        entries = {key: {'path': e.path, 'size': e.size, 'mtime_ns': e.mtime_ns, 'digest': e.digest,
+                         'levels': [list(level) for level in e.levels], 'chains': e.chains}
+                   for key, e in self.entries.items()}
+        # write then rename, so that a concurrent reader never sees a partial file
+        tmp = self.path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            tmp.write_text(json.dumps({'version': CACHE_VERSION, 'entries': entries}))
+            os.replace(tmp, self.path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        self.dirty = False
+
+
+def _hash(path: pathlib.Path) -> Tuple[pathlib.Path, Optional[FileHash], str]:
+    try:
+        return path, hash_path(path), ''
+    except (OSError, KtxError, ValueError) as e:
+        return path, None, str(e)
+
+
+def hash_paths(paths: Iterable[pathlib.Path], cache: Optional[HashCache] = None,
+               max_workers: Optional[int] = None) -> Iterator[Tuple[pathlib.Path, Optional[FileHash], str]]:
+    '''
+    yields (path, FileHash or None, error). cached entries come first.
+    files that miss the cache are hashed on a process pool.
+    '''
+    misses = []
+    for path in paths:
+        hit = cache.get(path) if cache else None
+        if hit:
+            yield path, hit, ''
+        else:
+            misses.append(path)
+    if not misses:
+        return
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(misses) == 1:
+        results: Iterable = map(_hash, misses)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+        results = executor.map(_hash, misses, chunksize=max(1, min(64, len(misses) // (workers * 4))))
+    try:
+        for path, file_hash, error in results:
+            if file_hash and cache:
+                cache.put(path, file_hash)
+            yield path, file_hash, error
+    finally:
+        if executor:
+            executor.shutdown()
+
+
+class SharedChain(NamedTuple):
+    digest: str
+    # (path, first level of the chain)
+    files: List[Tuple[str, int]]
+    byteLength: int
+
+
+def find_duplicates(hashes: Iterable[FileHash]) -> List[List[FileHash]]:
+    '''
+    groups of files with the same digest.
+    '''
+    groups: Dict[str, List[FileHash]] = defaultdict(list)
+    for h in hashes:
+        groups[h.digest].append(h)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_shared_chains(hashes: Iterable[FileHash], min_bytes: int = 0) -> List[SharedChain]:
+    '''
+    mip chains (level i to the smallest level) shared by textures that are not duplicates.
+    only the longest shared chain of each group of files is reported.
+    chains smaller than min_bytes, such as a common 1x1 level, are ignored.
+    '''
+    unique: Dict[str, FileHash] = {}
+    for h in hashes:
+        unique.setdefault(h.digest, h)
+    groups: Dict[str, List[Tuple[FileHash, int]]] = defaultdict(list)
+    for h in unique.values():
+        for i, chain in enumerate(h.chains):
+            groups[chain].append((h, i))
+
+    shared = []
+    for digest, members in groups.items():
+        if len(members) < 2:
+            continue
+        # skip when every member shares the next longer chain as well
+        longer = {h.chains[i - 1] if i > 0 else None for h, i in members}
+        if len(longer) == 1 and None not in longer and len(groups[longer.pop()]) == len(members):  # type: ignore
+            continue
+        h, i = members[0]
+        byteLength = sum(level.byteLength for level in h.levels[i:])
+        if byteLength < min_bytes:
+            continue
+        shared.append(SharedChain(digest, [(h.path, i) for h, i in members], byteLength))
+    return shared
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='content hashes and duplicates of ktx2 files')
+    parser.add_argument('paths', nargs='+', type=pathlib.Path, help='files or directories')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--cache', type=pathlib.Path, help=f'default: {get_cache_path()}')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--json', action='store_true', help='print every hash as json lines')
+    parser.add_argument('--min-chain-bytes', type=int, default=4096,
+                        help='ignore shared mip chains smaller than this')
+    args = parser.parse_args(argv)
+
+    from .validate import iter_paths
+    cache = None if args.no_cache else HashCache(args.cache)
+    hashes = []
+    errors = 0
+    for path, file_hash, error in hash_paths(iter_paths(args.paths), cache, args.jobs):
+        if not file_hash:
+            errors += 1
+            print(f'{path}: {error}', file=sys.stderr)
+            continue
+        hashes.append(file_hash)
+        if args.json:
+            print(json.dumps(file_hash._asdict()))
+    if cache:
+        cache.save()
+
+    duplicated = 0
+    for group in find_duplicates(hashes):
+        duplicated += sum(h.size for h in group[1:])
+        if not args.json:
+            print(f'duplicate {group[0].digest}:')
+            for h in group:
+                print(f'  {h.path}')
+    shared = 0
+    for chain in find_shared_chains(hashes, args.min_chain_bytes):
+        shared += chain.byteLength * (len(chain.files) - 1)
+        if not args.json:
+            print(f'shared mip chain {chain.digest} ({chain.byteLength} bytes):')
+            for path, level in chain.files:
+                print(f'  {path} from level {level}')
+    print(f'{len(hashes)} files, {duplicated} bytes in duplicates, '
+          f'{shared} bytes in shared mip chains, {errors} errors', file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
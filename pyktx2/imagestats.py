@@ -0,0 +1,209 @@
+'''
+per level, layer and face pixel statistics for uncompressed (HDR) formats.
+
+level data is streamed in fixed size chunks, decompressed on the fly when
+supercompressed, and reduced with numpy. memory is bounded by the chunk size.
+'''
+import pathlib
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from .parser import VkFormat, Ktx2Header, KtxError, read_header
+from .formats import FormatInfo, get_format_info, get_level_extent, get_image_size
+from .supercompression import iter_decompress_level
+from .decode import read_at
+
+# texels reduced at once
+CHUNK_TEXELS = 1 << 18
+HISTOGRAM_BINS = 64
+# log2 luminance range of the histogram. values outside are counted in the first or last bin
+LOG2_RANGE = (-16.0, 16.0)
+# Rec.709
+LUMINANCE_WEIGHTS = {'R': 0.2126, 'G': 0.7152, 'B': 0.0722}
+
+
+class ChannelStats(NamedTuple):
+    channel: str
+    # over the finite values. nan when there is none
+    min: float
+    max: float
+    mean: float
+    nanCount: int
+    infCount: int
+
+
+class ImageStats(NamedTuple):
+    level: int
+    layer: int
+    face: int
+    width: int
+    height: int
+    depth: int
+    channels: List[ChannelStats]
+    # counts of log2(luminance) in HISTOGRAM_BINS bins over LOG2_RANGE
+    histogram: np.ndarray
+    # texels whose luminance is 0 or negative. they are not in the histogram
+    nonPositiveCount: int
+
+
+def _decode_b10g11r11(packed: np.ndarray) -> np.ndarray:
+    def unsigned_float(bits: np.ndarray, mantissa_bits: int) -> np.ndarray:
+        mantissa = (bits & ((1 << mantissa_bits) - 1)).astype(np.float32)
+        exponent = (bits >> mantissa_bits).astype(np.int32)
+        normal = np.ldexp(1 + mantissa / (1 << mantissa_bits), exponent - 15)
+        denormal = np.ldexp(mantissa / (1 << mantissa_bits), -14)
+        special = np.where(mantissa == 0, np.float32(np.inf), np.float32(np.nan))
+        return np.where(exponent == 0, denormal, np.where(exponent == 31, special, normal)).astype(np.float32)
+    return np.stack([unsigned_float(packed & 0x7FF, 6),
+                     unsigned_float((packed >> 11) & 0x7FF, 6),
+                     unsigned_float((packed >> 22) & 0x3FF, 5)], axis=-1)
+
+
+def _decode_e5b9g9r9(packed: np.ndarray) -> np.ndarray:
+    exponent = (packed >> 27).astype(np.int32) - 15 - 9
+    return np.stack([np.ldexp(((packed >> shift) & 0x1FF).astype(np.float32), exponent)
+                     for shift in (0, 9, 18)], axis=-1).astype(np.float32)
+
+
+_PACKED_FLOAT = {
+    VkFormat.VK_FORMAT_B10G11R11_UFLOAT_PACK32.value: _decode_b10g11r11,
+    VkFormat.VK_FORMAT_E5B9G9R9_UFLOAT_PACK32.value: _decode_e5b9g9r9,
+}
+
+
+def get_channels(vkFormat: VkFormat, info: FormatInfo) -> str:
+    if vkFormat.value in _PACKED_FLOAT:
+        return 'RGB'
+    if info.is_compressed or not info.channels:
+        raise NotImplementedError(f'{vkFormat}')
+    return info.channels
+
+
+def texels_to_float(vkFormat: VkFormat, info: FormatInfo, data: bytes) -> np.ndarray:
+    '''
+    (texels, channels) float32
+    '''
+    decode = _PACKED_FLOAT.get(vkFormat.value)
+    if decode:
+        return decode(np.frombuffer(data, '<u4'))
+    assert info.dtype
+    return np.frombuffer(data, info.dtype).reshape(-1, len(info.channels)).astype(np.float32)
+
+
+class _Accumulator:
+    def __init__(self, channels: str, bins: int, log2_range: Tuple[float, float]) -> None:
+        self.channels = channels
+        n = len(channels)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.sum = np.zeros(n)
+        self.finite = np.zeros(n, np.int64)
+        self.nan = np.zeros(n, np.int64)
+        self.inf = np.zeros(n, np.int64)
+        self.histogram = np.zeros(bins, np.int64)
+        self.non_positive = 0
+        self.log2_range = log2_range
+        self.weights = np.array([LUMINANCE_WEIGHTS.get(c, 0.0) for c in channels], np.float32)
+        if not self.weights.any():
+            # no color channel. use the first one as luminance
+            self.weights[0] = 1
+
+    def update(self, texels: np.ndarray) -> None:
+        finite = np.isfinite(texels)
+        nan = np.isnan(texels)
+        self.nan += nan.sum(axis=0)
+        self.inf += (~finite & ~nan).sum(axis=0)
+        self.finite += finite.sum(axis=0)
+        self.min = np.minimum(self.min, np.where(finite, texels, np.inf).min(axis=0))
+        self.max = np.maximum(self.max, np.where(finite, texels, -np.inf).max(axis=0))
+        self.sum += np.where(finite, texels, 0).sum(axis=0, dtype=np.float64)
+
+        luminance = texels @ self.weights
+        luminance = luminance[np.isfinite(luminance)]
+        positive = luminance[luminance > 0]
+        self.non_positive += len(luminance) - len(positive)
+        lo, hi = self.log2_range
+        bins = len(self.histogram)
+        index = ((np.log2(positive) - lo) * (bins / (hi - lo))).astype(np.int64)
+        self.histogram += np.bincount(np.clip(index, 0, bins - 1), minlength=bins)
+
+    def result(self) -> Tuple[List[ChannelStats], np.ndarray, int]:
+        channels = []
+        for i, c in enumerate(self.channels):
+            if self.finite[i]:
+                channels.append(ChannelStats(c, float(self.min[i]), float(self.max[i]),
+                                             float(self.sum[i] / self.finite[i]),
+                                             int(self.nan[i]), int(self.inf[i])))
+            else:
+                channels.append(ChannelStats(c, float('nan'), float('nan'), float('nan'),
+                                             int(self.nan[i]), int(self.inf[i])))
+        return channels, self.histogram, self.non_positive
+
+
+def _iter_level(f: BinaryIO, header: Ktx2Header, level: int, chunk_size: int) -> Iterator[bytes]:
+    index = header.levelIndices[level]
+
+    def compressed() -> Iterator[bytes]:
+        for offset in range(0, index.byteLength, chunk_size):
+            yield read_at(f, index.byteOffset + offset, min(chunk_size, index.byteLength - offset))
+    return iter_decompress_level(header.supercompressionScheme, compressed(), chunk_size)
+
+
+def _rechunk(chunks: Iterator[bytes], sizes: Sequence[int]) -> Iterator[Tuple[int, bytes]]:
+    '''
+    split a byte stream at the boundaries given by sizes. yields (index of the size, bytes).
+    every piece is a whole number of texels as long as the stream chunks and sizes are.
+    '''
+    buffer = b''
+    for i, size in enumerate(sizes):
+        while size > 0:
+            if not buffer:
+                buffer = next(chunks, b'')
+                if not buffer:
+                    raise KtxError('level data is shorter than expected')
+            n = min(size, len(buffer))
+            yield i, buffer[:n]
+            buffer = buffer[n:]
+            size -= n
+
+
+def compute_stats(f: BinaryIO, header: Optional[Ktx2Header] = None, levels: Optional[Sequence[int]] = None,
+                  chunk_texels: int = CHUNK_TEXELS, bins: int = HISTOGRAM_BINS,
+                  log2_range: Tuple[float, float] = LOG2_RANGE) -> List[ImageStats]:
+    '''
+    statistics of each layer/face (all depth slices together) of the levels.
+    '''
+    if header is None:
+        header = read_header(f)
+    info = get_format_info(header.vkFormat)
+    channels = get_channels(header.vkFormat, info)
+    chunk_size = chunk_texels * info.blockBytes
+    layer_count = max(1, header.layerCount)
+
+    results = []
+    for level in (range(len(header.levelIndices)) if levels is None else levels):
+        width, height, depth = get_level_extent(header.pixelWidth, header.pixelHeight, header.pixelDepth, level)
+        image_size = get_image_size(info, width, height, depth)
+        accumulators = [_Accumulator(channels, bins, log2_range)
+                        for _ in range(layer_count * header.faceCount)]
+        pending = b''
+        current = 0
+        for i, data in _rechunk(_iter_level(f, header, level, chunk_size),
+                                [image_size] * len(accumulators)):
+            if i != current:
+                current = i
+                pending = b''
+            data = pending + data
+            whole = len(data) - len(data) % info.blockBytes
+            pending = data[whole:]
+            if whole:
+                accumulators[i].update(texels_to_float(header.vkFormat, info, data[:whole]))
+        for i, accumulator in enumerate(accumulators):
+            channel_stats, histogram, non_positive = accumulator.result()
+            results.append(ImageStats(level, i // header.faceCount, i % header.faceCount,
+                                      width, height, depth, channel_stats, histogram, non_positive))
+    return results
+
+
+def compute_stats_path(path: pathlib.Path, levels: Optional[Sequence[int]] = None, **kw) -> List[ImageStats]:
+    with path.open('rb') as f:
+        return compute_stats(f, levels=levels, **kw)
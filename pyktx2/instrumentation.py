@@ -0,0 +1,94 @@
+'''
+opt-in stage timings and counters for parse and decode.
+
+pass a ParseStats as stats= to parse_bytes, parse_path, parse_metadata,
+read_header, read_at, decode_image or decode_region.
+use one ParseStats per file (or merge them). it is not locked.
+'''
+import contextlib
+import time
+from typing import Callable, Dict, Optional, Iterator, Any
+
+# callback(stage, seconds) is called when a stage ends
+StageCallback = Callable[[str, float], None]
+
+
+class ParseStats:
+    '''
+    stages: header, dfd, kvd, sgd, levels, read, decompress, decode
+
+    bytes_read: bytes read from a file
+    bytes_copied: bytes copied out of a buffer that was already in memory
+    images: Image or ndarray objects materialized
+    '''
+
+    def __init__(self, callback: Optional[StageCallback] = None) -> None:
+        self.callback = callback
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.bytes_read = 0
+        self.bytes_copied = 0
+        self.images = 0
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.callback:
+                self.callback(name, seconds)
+
+    def read(self, size: int) -> None:
+        self.bytes_read += size
+
+    def copy(self, size: int) -> None:
+        self.bytes_copied += size
+
+    def image(self, count: int = 1) -> None:
+        self.images += count
+
+    def merge(self, other: 'ParseStats') -> None:
+        for name, seconds in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        for name, calls in other.calls.items():
+            self.calls[name] = self.calls.get(name, 0) + calls
+        self.bytes_read += other.bytes_read
+        self.bytes_copied += other.bytes_copied
+        self.images += other.images
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'seconds': dict(self.seconds),
+            'calls': dict(self.calls),
+            'bytes_read': self.bytes_read,
+            'bytes_copied': self.bytes_copied,
+            'images': self.images,
+        }
+
+    def __repr__(self) -> str:
+        return f'ParseStats({self.as_dict()})'
+
+
+class _NullStats(ParseStats):
+    '''
+    the default. records nothing.
+    '''
+
+    def stage(self, name: str):  # type: ignore
+        return contextlib.nullcontext()
+
+    def read(self, size: int) -> None:
+        pass
+
+    def copy(self, size: int) -> None:
+        pass
+
+    def image(self, count: int = 1) -> None:
+        pass
+
+
+NULL_STATS = _NullStats()
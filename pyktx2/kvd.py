@@ -0,0 +1,161 @@
+'''
+lazy key/value data.
+
+the kvd is indexed in one pass. values stay in the file buffer and are
+copied or decoded only when they are accessed.
+
+* https://github.khronos.org/KTX-Specification/#_keyvalue_data
+'''
+import mmap
+import struct
+from typing import Dict, Iterator, Mapping, NamedTuple, Optional, Tuple, Union
+from .parser import KtxError
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def _find_nul(data: Buffer, start: int, stop: int) -> int:
+    if not isinstance(data, memoryview):
+        return data.find(b'\0', start, stop)
+    # keys are short. search in small chunks instead of copying the value
+    pos = start
+    while pos < stop:
+        chunk = bytes(data[pos:min(stop, pos + 256)])
+        i = chunk.find(0)
+        if i >= 0:
+            return pos + i
+        pos += len(chunk)
+    return -1
+
+
+class GlFormat(NamedTuple):
+    glInternalformat: int
+    glFormat: int
+    glType: int
+
+
+class AnimData(NamedTuple):
+    duration: int
+    timescale: int
+    loopCount: int
+
+
+class KeyValueData(Mapping[str, bytes]):
+    '''
+    Mapping of key to value bytes. a value does not include the padding.
+    '''
+
+    def __init__(self, data: Buffer = b'', offset: int = 0, length: Optional[int] = None) -> None:
+        self._data = data
+        end = len(data) if length is None else offset + length
+        if end > len(data):
+            raise KtxError(f'kvd [{offset}, {end}) exceeds {len(data)} bytes')
+        self._index: Dict[str, Tuple[int, int]] = {}
+        pos = offset
+        while pos + 4 <= end:
+            keyAndValueByteLength = struct.unpack_from('<I', data, pos)[0]
+            start = pos + 4
+            stop = start + keyAndValueByteLength
+            if stop > end:
+                raise KtxError(f'key/value at {pos} exceeds the kvd')
+            if keyAndValueByteLength >= 2:
+                nul = _find_nul(data, start, stop)
+                if nul < 0:
+                    raise KtxError(f'key/value at {pos} has no NUL terminated key')
+                try:
+                    key = bytes(data[start:nul]).decode('utf-8')
+                except UnicodeDecodeError as e:
+                    raise KtxError(f'key at {pos} is not utf-8: {e}') from None
+                self._index[key] = (nul + 1, stop)
+            # padding
+            pos = stop + (-stop % 4)
+
+    def __getitem__(self, key: str) -> bytes:
+        start, stop = self._index[key]
+        return bytes(self._data[start:stop])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __repr__(self) -> str:
+        return f'KeyValueData({list(self._index)})'
+
+    def view(self, key: str) -> memoryview:
+        '''
+        the value without copying.
+        '''
+        start, stop = self._index[key]
+        return memoryview(self._data)[start:stop]
+
+    def _string(self, key: str) -> Optional[str]:
+        if key not in self._index:
+            return None
+        value = self.view(key)
+        if not value or value[-1] != 0:
+            raise KtxError(f'{key} is not NUL terminated')
+        try:
+            return bytes(value[:-1]).decode('utf-8')
+        except UnicodeDecodeError as e:
+            raise KtxError(f'{key} is not utf-8: {e}') from None
+
+    def _uint32s(self, key: str, count: int) -> Optional[Tuple[int, ...]]:
+        if key not in self._index:
+            return None
+        value = self.view(key)
+        if len(value) != 4 * count:
+            raise KtxError(f'{key} must be {4 * count} bytes, not {len(value)}')
+        return struct.unpack(f'<{count}I', value)
+
+    @property
+    def orientation(self) -> Optional[str]:
+        '''
+        KTXorientation. 'rd' is x to the right and y down.
+        '''
+        value = self._string('KTXorientation')
+        if value is not None and not 1 <= len(value) <= 3:
+            raise KtxError(f'KTXorientation {value!r}')
+        return value
+
+    @property
+    def swizzle(self) -> Optional[str]:
+        '''
+        KTXswizzle. 4 of r, g, b, a, 0 and 1.
+        '''
+        value = self._string('KTXswizzle')
+        if value is not None and (len(value) != 4 or set(value) - set('rgba01')):
+            raise KtxError(f'KTXswizzle {value!r}')
+        return value
+
+    @property
+    def writer(self) -> Optional[str]:
+        return self._string('KTXwriter')
+
+    @property
+    def writer_sc_params(self) -> Optional[str]:
+        return self._string('KTXwriterScParams')
+
+    @property
+    def gl_format(self) -> Optional[GlFormat]:
+        value = self._uint32s('KTXglFormat', 3)
+        return GlFormat(*value) if value else None
+
+    @property
+    def dxgi_format(self) -> Optional[int]:
+        value = self._uint32s('KTXdxgiFormat__', 1)
+        return value[0] if value else None
+
+    @property
+    def metal_pixel_format(self) -> Optional[int]:
+        value = self._uint32s('KTXmetalPixelFormat', 1)
+        return value[0] if value else None
+
+    @property
+    def anim_data(self) -> Optional[AnimData]:
+        value = self._uint32s('KTXanimData', 3)
+        return AnimData(*value) if value else None
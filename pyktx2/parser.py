@@ -5,391 +5,10 @@ https://github.khronos.org/KTX-Specification/
 '''
 import pathlib
 import struct
-from typing import NamedTuple, List, Dict, Any
+from typing import NamedTuple, List, Any, BinaryIO, Mapping
 from enum import Enum
-
-
-class VkFormat(Enum):
-    '''
-    https://www.khronos.org/registry/vulkan/specs/1.2-extensions/man/html/VkFormat.html
-    '''
-    VK_FORMAT_UNDEFINED = 0
-    VK_FORMAT_R4G4_UNORM_PACK8 = 1
-    VK_FORMAT_R4G4B4A4_UNORM_PACK16 = 2
-    VK_FORMAT_B4G4R4A4_UNORM_PACK16 = 3
-    VK_FORMAT_R5G6B5_UNORM_PACK16 = 4
-    VK_FORMAT_B5G6R5_UNORM_PACK16 = 5
-    VK_FORMAT_R5G5B5A1_UNORM_PACK16 = 6
-    VK_FORMAT_B5G5R5A1_UNORM_PACK16 = 7
-    VK_FORMAT_A1R5G5B5_UNORM_PACK16 = 8
-    VK_FORMAT_R8_UNORM = 9
-    VK_FORMAT_R8_SNORM = 10
-    VK_FORMAT_R8_USCALED = 11
-    VK_FORMAT_R8_SSCALED = 12
-    VK_FORMAT_R8_UINT = 13
-    VK_FORMAT_R8_SINT = 14
-    VK_FORMAT_R8_SRGB = 15
-    VK_FORMAT_R8G8_UNORM = 16
-    VK_FORMAT_R8G8_SNORM = 17
-    VK_FORMAT_R8G8_USCALED = 18
-    VK_FORMAT_R8G8_SSCALED = 19
-    VK_FORMAT_R8G8_UINT = 20
-    VK_FORMAT_R8G8_SINT = 21
-    VK_FORMAT_R8G8_SRGB = 22
-    VK_FORMAT_R8G8B8_UNORM = 23
-    VK_FORMAT_R8G8B8_SNORM = 24
-    VK_FORMAT_R8G8B8_USCALED = 25
-    VK_FORMAT_R8G8B8_SSCALED = 26
-    VK_FORMAT_R8G8B8_UINT = 27
-    VK_FORMAT_R8G8B8_SINT = 28
-    VK_FORMAT_R8G8B8_SRGB = 29
-    VK_FORMAT_B8G8R8_UNORM = 30
-    VK_FORMAT_B8G8R8_SNORM = 31
-    VK_FORMAT_B8G8R8_USCALED = 32
-    VK_FORMAT_B8G8R8_SSCALED = 33
-    VK_FORMAT_B8G8R8_UINT = 34
-    VK_FORMAT_B8G8R8_SINT = 35
-    VK_FORMAT_B8G8R8_SRGB = 36
-    VK_FORMAT_R8G8B8A8_UNORM = 37
-    VK_FORMAT_R8G8B8A8_SNORM = 38
-    VK_FORMAT_R8G8B8A8_USCALED = 39
-    VK_FORMAT_R8G8B8A8_SSCALED = 40
-    VK_FORMAT_R8G8B8A8_UINT = 41
-    VK_FORMAT_R8G8B8A8_SINT = 42
-    VK_FORMAT_R8G8B8A8_SRGB = 43
-    VK_FORMAT_B8G8R8A8_UNORM = 44
-    VK_FORMAT_B8G8R8A8_SNORM = 45
-    VK_FORMAT_B8G8R8A8_USCALED = 46
-    VK_FORMAT_B8G8R8A8_SSCALED = 47
-    VK_FORMAT_B8G8R8A8_UINT = 48
-    VK_FORMAT_B8G8R8A8_SINT = 49
-    VK_FORMAT_B8G8R8A8_SRGB = 50
-    VK_FORMAT_A8B8G8R8_UNORM_PACK32 = 51
-    VK_FORMAT_A8B8G8R8_SNORM_PACK32 = 52
-    VK_FORMAT_A8B8G8R8_USCALED_PACK32 = 53
-    VK_FORMAT_A8B8G8R8_SSCALED_PACK32 = 54
-    VK_FORMAT_A8B8G8R8_UINT_PACK32 = 55
-    VK_FORMAT_A8B8G8R8_SINT_PACK32 = 56
-    VK_FORMAT_A8B8G8R8_SRGB_PACK32 = 57
-    VK_FORMAT_A2R10G10B10_UNORM_PACK32 = 58
-    VK_FORMAT_A2R10G10B10_SNORM_PACK32 = 59
-    VK_FORMAT_A2R10G10B10_USCALED_PACK32 = 60
-    VK_FORMAT_A2R10G10B10_SSCALED_PACK32 = 61
-    VK_FORMAT_A2R10G10B10_UINT_PACK32 = 62
-    VK_FORMAT_A2R10G10B10_SINT_PACK32 = 63
-    VK_FORMAT_A2B10G10R10_UNORM_PACK32 = 64
-    VK_FORMAT_A2B10G10R10_SNORM_PACK32 = 65
-    VK_FORMAT_A2B10G10R10_USCALED_PACK32 = 66
-    VK_FORMAT_A2B10G10R10_SSCALED_PACK32 = 67
-    VK_FORMAT_A2B10G10R10_UINT_PACK32 = 68
-    VK_FORMAT_A2B10G10R10_SINT_PACK32 = 69
-    VK_FORMAT_R16_UNORM = 70
-    VK_FORMAT_R16_SNORM = 71
-    VK_FORMAT_R16_USCALED = 72
-    VK_FORMAT_R16_SSCALED = 73
-    VK_FORMAT_R16_UINT = 74
-    VK_FORMAT_R16_SINT = 75
-    VK_FORMAT_R16_SFLOAT = 76
-    VK_FORMAT_R16G16_UNORM = 77
-    VK_FORMAT_R16G16_SNORM = 78
-    VK_FORMAT_R16G16_USCALED = 79
-    VK_FORMAT_R16G16_SSCALED = 80
-    VK_FORMAT_R16G16_UINT = 81
-    VK_FORMAT_R16G16_SINT = 82
-    VK_FORMAT_R16G16_SFLOAT = 83
-    VK_FORMAT_R16G16B16_UNORM = 84
-    VK_FORMAT_R16G16B16_SNORM = 85
-    VK_FORMAT_R16G16B16_USCALED = 86
-    VK_FORMAT_R16G16B16_SSCALED = 87
-    VK_FORMAT_R16G16B16_UINT = 88
-    VK_FORMAT_R16G16B16_SINT = 89
-    VK_FORMAT_R16G16B16_SFLOAT = 90
-    VK_FORMAT_R16G16B16A16_UNORM = 91
-    VK_FORMAT_R16G16B16A16_SNORM = 92
-    VK_FORMAT_R16G16B16A16_USCALED = 93
-    VK_FORMAT_R16G16B16A16_SSCALED = 94
-    VK_FORMAT_R16G16B16A16_UINT = 95
-    VK_FORMAT_R16G16B16A16_SINT = 96
-    VK_FORMAT_R16G16B16A16_SFLOAT = 97
-    VK_FORMAT_R32_UINT = 98
-    VK_FORMAT_R32_SINT = 99
-    VK_FORMAT_R32_SFLOAT = 100
-    VK_FORMAT_R32G32_UINT = 101
-    VK_FORMAT_R32G32_SINT = 102
-    VK_FORMAT_R32G32_SFLOAT = 103
-    VK_FORMAT_R32G32B32_UINT = 104
-    VK_FORMAT_R32G32B32_SINT = 105
-    VK_FORMAT_R32G32B32_SFLOAT = 106
-    VK_FORMAT_R32G32B32A32_UINT = 107
-    VK_FORMAT_R32G32B32A32_SINT = 108
-    VK_FORMAT_R32G32B32A32_SFLOAT = 109
-    VK_FORMAT_R64_UINT = 110
-    VK_FORMAT_R64_SINT = 111
-    VK_FORMAT_R64_SFLOAT = 112
-    VK_FORMAT_R64G64_UINT = 113
-    VK_FORMAT_R64G64_SINT = 114
-    VK_FORMAT_R64G64_SFLOAT = 115
-    VK_FORMAT_R64G64B64_UINT = 116
-    VK_FORMAT_R64G64B64_SINT = 117
-    VK_FORMAT_R64G64B64_SFLOAT = 118
-    VK_FORMAT_R64G64B64A64_UINT = 119
-    VK_FORMAT_R64G64B64A64_SINT = 120
-    VK_FORMAT_R64G64B64A64_SFLOAT = 121
-    VK_FORMAT_B10G11R11_UFLOAT_PACK32 = 122
-    VK_FORMAT_E5B9G9R9_UFLOAT_PACK32 = 123
-    VK_FORMAT_D16_UNORM = 124
-    VK_FORMAT_X8_D24_UNORM_PACK32 = 125
-    VK_FORMAT_D32_SFLOAT = 126
-    VK_FORMAT_S8_UINT = 127
-    VK_FORMAT_D16_UNORM_S8_UINT = 128
-    VK_FORMAT_D24_UNORM_S8_UINT = 129
-    VK_FORMAT_D32_SFLOAT_S8_UINT = 130
-    VK_FORMAT_BC1_RGB_UNORM_BLOCK = 131
-    VK_FORMAT_BC1_RGB_SRGB_BLOCK = 132
-    VK_FORMAT_BC1_RGBA_UNORM_BLOCK = 133
-    VK_FORMAT_BC1_RGBA_SRGB_BLOCK = 134
-    VK_FORMAT_BC2_UNORM_BLOCK = 135
-    VK_FORMAT_BC2_SRGB_BLOCK = 136
-    VK_FORMAT_BC3_UNORM_BLOCK = 137
-    VK_FORMAT_BC3_SRGB_BLOCK = 138
-    VK_FORMAT_BC4_UNORM_BLOCK = 139
-    VK_FORMAT_BC4_SNORM_BLOCK = 140
-    VK_FORMAT_BC5_UNORM_BLOCK = 141
-    VK_FORMAT_BC5_SNORM_BLOCK = 142
-    VK_FORMAT_BC6H_UFLOAT_BLOCK = 143
-    VK_FORMAT_BC6H_SFLOAT_BLOCK = 144
-    VK_FORMAT_BC7_UNORM_BLOCK = 145
-    VK_FORMAT_BC7_SRGB_BLOCK = 146
-    VK_FORMAT_ETC2_R8G8B8_UNORM_BLOCK = 147
-    VK_FORMAT_ETC2_R8G8B8_SRGB_BLOCK = 148
-    VK_FORMAT_ETC2_R8G8B8A1_UNORM_BLOCK = 149
-    VK_FORMAT_ETC2_R8G8B8A1_SRGB_BLOCK = 150
-    VK_FORMAT_ETC2_R8G8B8A8_UNORM_BLOCK = 151
-    VK_FORMAT_ETC2_R8G8B8A8_SRGB_BLOCK = 152
-    VK_FORMAT_EAC_R11_UNORM_BLOCK = 153
-    VK_FORMAT_EAC_R11_SNORM_BLOCK = 154
-    VK_FORMAT_EAC_R11G11_UNORM_BLOCK = 155
-    VK_FORMAT_EAC_R11G11_SNORM_BLOCK = 156
-    VK_FORMAT_ASTC_4x4_UNORM_BLOCK = 157
-    VK_FORMAT_ASTC_4x4_SRGB_BLOCK = 158
-    VK_FORMAT_ASTC_5x4_UNORM_BLOCK = 159
-    VK_FORMAT_ASTC_5x4_SRGB_BLOCK = 160
-    VK_FORMAT_ASTC_5x5_UNORM_BLOCK = 161
-    VK_FORMAT_ASTC_5x5_SRGB_BLOCK = 162
-    VK_FORMAT_ASTC_6x5_UNORM_BLOCK = 163
-    VK_FORMAT_ASTC_6x5_SRGB_BLOCK = 164
-    VK_FORMAT_ASTC_6x6_UNORM_BLOCK = 165
-    VK_FORMAT_ASTC_6x6_SRGB_BLOCK = 166
-    VK_FORMAT_ASTC_8x5_UNORM_BLOCK = 167
-    VK_FORMAT_ASTC_8x5_SRGB_BLOCK = 168
-    VK_FORMAT_ASTC_8x6_UNORM_BLOCK = 169
-    VK_FORMAT_ASTC_8x6_SRGB_BLOCK = 170
-    VK_FORMAT_ASTC_8x8_UNORM_BLOCK = 171
-    VK_FORMAT_ASTC_8x8_SRGB_BLOCK = 172
-    VK_FORMAT_ASTC_10x5_UNORM_BLOCK = 173
-    VK_FORMAT_ASTC_10x5_SRGB_BLOCK = 174
-    VK_FORMAT_ASTC_10x6_UNORM_BLOCK = 175
-    VK_FORMAT_ASTC_10x6_SRGB_BLOCK = 176
-    VK_FORMAT_ASTC_10x8_UNORM_BLOCK = 177
-    VK_FORMAT_ASTC_10x8_SRGB_BLOCK = 178
-    VK_FORMAT_ASTC_10x10_UNORM_BLOCK = 179
-    VK_FORMAT_ASTC_10x10_SRGB_BLOCK = 180
-    VK_FORMAT_ASTC_12x10_UNORM_BLOCK = 181
-    VK_FORMAT_ASTC_12x10_SRGB_BLOCK = 182
-    VK_FORMAT_ASTC_12x12_UNORM_BLOCK = 183
-    VK_FORMAT_ASTC_12x12_SRGB_BLOCK = 184
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G8B8G8R8_422_UNORM = 1000156000
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_B8G8R8G8_422_UNORM = 1000156001
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G8_B8_R8_3PLANE_420_UNORM = 1000156002
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G8_B8R8_2PLANE_420_UNORM = 1000156003
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G8_B8_R8_3PLANE_422_UNORM = 1000156004
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G8_B8R8_2PLANE_422_UNORM = 1000156005
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G8_B8_R8_3PLANE_444_UNORM = 1000156006
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_R10X6_UNORM_PACK16 = 1000156007
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_R10X6G10X6_UNORM_2PACK16 = 1000156008
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_R10X6G10X6B10X6A10X6_UNORM_4PACK16 = 1000156009
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G10X6B10X6G10X6R10X6_422_UNORM_4PACK16 = 1000156010
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_B10X6G10X6R10X6G10X6_422_UNORM_4PACK16 = 1000156011
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_420_UNORM_3PACK16 = 1000156012
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G10X6_B10X6R10X6_2PLANE_420_UNORM_3PACK16 = 1000156013
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_422_UNORM_3PACK16 = 1000156014
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G10X6_B10X6R10X6_2PLANE_422_UNORM_3PACK16 = 1000156015
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_444_UNORM_3PACK16 = 1000156016
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_R12X4_UNORM_PACK16 = 1000156017
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_R12X4G12X4_UNORM_2PACK16 = 1000156018
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_R12X4G12X4B12X4A12X4_UNORM_4PACK16 = 1000156019
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G12X4B12X4G12X4R12X4_422_UNORM_4PACK16 = 1000156020
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_B12X4G12X4R12X4G12X4_422_UNORM_4PACK16 = 1000156021
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_420_UNORM_3PACK16 = 1000156022
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G12X4_B12X4R12X4_2PLANE_420_UNORM_3PACK16 = 1000156023
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_422_UNORM_3PACK16 = 1000156024
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G12X4_B12X4R12X4_2PLANE_422_UNORM_3PACK16 = 1000156025
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_444_UNORM_3PACK16 = 1000156026
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G16B16G16R16_422_UNORM = 1000156027
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_B16G16R16G16_422_UNORM = 1000156028
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G16_B16_R16_3PLANE_420_UNORM = 1000156029
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G16_B16R16_2PLANE_420_UNORM = 1000156030
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G16_B16_R16_3PLANE_422_UNORM = 1000156031
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G16_B16R16_2PLANE_422_UNORM = 1000156032
-    # Provided by VK_VERSION_1_1
-    VK_FORMAT_G16_B16_R16_3PLANE_444_UNORM = 1000156033
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC1_2BPP_UNORM_BLOCK_IMG = 1000054000
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC1_4BPP_UNORM_BLOCK_IMG = 1000054001
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC2_2BPP_UNORM_BLOCK_IMG = 1000054002
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC2_4BPP_UNORM_BLOCK_IMG = 1000054003
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC1_2BPP_SRGB_BLOCK_IMG = 1000054004
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC1_4BPP_SRGB_BLOCK_IMG = 1000054005
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC2_2BPP_SRGB_BLOCK_IMG = 1000054006
-    # Provided by VK_IMG_format_pvrtc
-    VK_FORMAT_PVRTC2_4BPP_SRGB_BLOCK_IMG = 1000054007
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_4x4_SFLOAT_BLOCK_EXT = 1000066000
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_5x4_SFLOAT_BLOCK_EXT = 1000066001
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_5x5_SFLOAT_BLOCK_EXT = 1000066002
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_6x5_SFLOAT_BLOCK_EXT = 1000066003
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_6x6_SFLOAT_BLOCK_EXT = 1000066004
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_8x5_SFLOAT_BLOCK_EXT = 1000066005
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_8x6_SFLOAT_BLOCK_EXT = 1000066006
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_8x8_SFLOAT_BLOCK_EXT = 1000066007
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_10x5_SFLOAT_BLOCK_EXT = 1000066008
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_10x6_SFLOAT_BLOCK_EXT = 1000066009
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_10x8_SFLOAT_BLOCK_EXT = 1000066010
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_10x10_SFLOAT_BLOCK_EXT = 1000066011
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_12x10_SFLOAT_BLOCK_EXT = 1000066012
-    # Provided by VK_EXT_texture_compression_astc_hdr
-    VK_FORMAT_ASTC_12x12_SFLOAT_BLOCK_EXT = 1000066013
-    # Provided by VK_EXT_ycbcr_2plane_444_formats
-    VK_FORMAT_G8_B8R8_2PLANE_444_UNORM_EXT = 1000330000
-    # Provided by VK_EXT_ycbcr_2plane_444_formats
-    VK_FORMAT_G10X6_B10X6R10X6_2PLANE_444_UNORM_3PACK16_EXT = 1000330001
-    # Provided by VK_EXT_ycbcr_2plane_444_formats
-    VK_FORMAT_G12X4_B12X4R12X4_2PLANE_444_UNORM_3PACK16_EXT = 1000330002
-    # Provided by VK_EXT_ycbcr_2plane_444_formats
-    VK_FORMAT_G16_B16R16_2PLANE_444_UNORM_EXT = 1000330003
-    # Provided by VK_EXT_4444_formats
-    VK_FORMAT_A4R4G4B4_UNORM_PACK16_EXT = 1000340000
-    # Provided by VK_EXT_4444_formats
-    VK_FORMAT_A4B4G4R4_UNORM_PACK16_EXT = 1000340001
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G8B8G8R8_422_UNORM_KHR = VK_FORMAT_G8B8G8R8_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_B8G8R8G8_422_UNORM_KHR = VK_FORMAT_B8G8R8G8_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G8_B8_R8_3PLANE_420_UNORM_KHR = VK_FORMAT_G8_B8_R8_3PLANE_420_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G8_B8R8_2PLANE_420_UNORM_KHR = VK_FORMAT_G8_B8R8_2PLANE_420_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G8_B8_R8_3PLANE_422_UNORM_KHR = VK_FORMAT_G8_B8_R8_3PLANE_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G8_B8R8_2PLANE_422_UNORM_KHR = VK_FORMAT_G8_B8R8_2PLANE_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G8_B8_R8_3PLANE_444_UNORM_KHR = VK_FORMAT_G8_B8_R8_3PLANE_444_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_R10X6_UNORM_PACK16_KHR = VK_FORMAT_R10X6_UNORM_PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_R10X6G10X6_UNORM_2PACK16_KHR = VK_FORMAT_R10X6G10X6_UNORM_2PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_R10X6G10X6B10X6A10X6_UNORM_4PACK16_KHR = VK_FORMAT_R10X6G10X6B10X6A10X6_UNORM_4PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G10X6B10X6G10X6R10X6_422_UNORM_4PACK16_KHR = VK_FORMAT_G10X6B10X6G10X6R10X6_422_UNORM_4PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_B10X6G10X6R10X6G10X6_422_UNORM_4PACK16_KHR = VK_FORMAT_B10X6G10X6R10X6G10X6_422_UNORM_4PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_420_UNORM_3PACK16_KHR = VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_420_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G10X6_B10X6R10X6_2PLANE_420_UNORM_3PACK16_KHR = VK_FORMAT_G10X6_B10X6R10X6_2PLANE_420_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_422_UNORM_3PACK16_KHR = VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_422_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G10X6_B10X6R10X6_2PLANE_422_UNORM_3PACK16_KHR = VK_FORMAT_G10X6_B10X6R10X6_2PLANE_422_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_444_UNORM_3PACK16_KHR = VK_FORMAT_G10X6_B10X6_R10X6_3PLANE_444_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_R12X4_UNORM_PACK16_KHR = VK_FORMAT_R12X4_UNORM_PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_R12X4G12X4_UNORM_2PACK16_KHR = VK_FORMAT_R12X4G12X4_UNORM_2PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_R12X4G12X4B12X4A12X4_UNORM_4PACK16_KHR = VK_FORMAT_R12X4G12X4B12X4A12X4_UNORM_4PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G12X4B12X4G12X4R12X4_422_UNORM_4PACK16_KHR = VK_FORMAT_G12X4B12X4G12X4R12X4_422_UNORM_4PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_B12X4G12X4R12X4G12X4_422_UNORM_4PACK16_KHR = VK_FORMAT_B12X4G12X4R12X4G12X4_422_UNORM_4PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_420_UNORM_3PACK16_KHR = VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_420_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G12X4_B12X4R12X4_2PLANE_420_UNORM_3PACK16_KHR = VK_FORMAT_G12X4_B12X4R12X4_2PLANE_420_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_422_UNORM_3PACK16_KHR = VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_422_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G12X4_B12X4R12X4_2PLANE_422_UNORM_3PACK16_KHR = VK_FORMAT_G12X4_B12X4R12X4_2PLANE_422_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_444_UNORM_3PACK16_KHR = VK_FORMAT_G12X4_B12X4_R12X4_3PLANE_444_UNORM_3PACK16
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G16B16G16R16_422_UNORM_KHR = VK_FORMAT_G16B16G16R16_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_B16G16R16G16_422_UNORM_KHR = VK_FORMAT_B16G16R16G16_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G16_B16_R16_3PLANE_420_UNORM_KHR = VK_FORMAT_G16_B16_R16_3PLANE_420_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G16_B16R16_2PLANE_420_UNORM_KHR = VK_FORMAT_G16_B16R16_2PLANE_420_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G16_B16_R16_3PLANE_422_UNORM_KHR = VK_FORMAT_G16_B16_R16_3PLANE_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G16_B16R16_2PLANE_422_UNORM_KHR = VK_FORMAT_G16_B16R16_2PLANE_422_UNORM
-    # Provided by VK_KHR_sampler_ycbcr_conversion
-    VK_FORMAT_G16_B16_R16_3PLANE_444_UNORM_KHR = VK_FORMAT_G16_B16_R16_3PLANE_444_UNORM
+from .instrumentation import ParseStats, NULL_STATS
+from .vkformat import VkFormat
 
 
 class SupercompressionScheme(Enum):
@@ -399,6 +18,10 @@ class SupercompressionScheme(Enum):
     ZLIB = 3
 
 
+HEADER_SIZE = 80
+LEVEL_INDEX_SIZE = 24
+
+
 class Const:
     # IDENTIFIER = bytes((0xAB,0x4B,0x54,0x58,0x20,0x32,0x30,0xBB,0x0D,0x0A,0x1A,0x0A))
     IDENTIFIER = b'\xABKTX 20\xBB\r\n\x1A\n'
@@ -419,7 +42,7 @@ class BytesReader:
         return self.pos >= len(self.data)
 
     def get_padding_size(self, alignment: int) -> int:
-        mod = self.pos % 8
+        mod = self.pos % alignment
         if mod == 0:
             return 0
         return alignment-mod
@@ -428,7 +51,7 @@ class BytesReader:
         if size == 0:
             return b''
         if self.pos+size > len(self.data):
-            raise IOError()
+            raise KtxError(f'truncated at {len(self.data)}: {size} bytes at {self.pos} are required')
         data = self.data[self.pos:self.pos+size]
         self.pos += size
         return data
@@ -456,6 +79,27 @@ class LevelIndex(NamedTuple):
     uncompressedByteLength: int
 
 
+class Ktx2Header(NamedTuple):
+    vkFormat: VkFormat
+    typeSize: int
+    pixelWidth: int
+    pixelHeight: int
+    pixelDepth: int
+    layerCount: int
+    faceCount: int
+    levelCount: int
+    supercompressionScheme: SupercompressionScheme
+
+    dfdByteOffset: int
+    dfdByteLength: int
+    kvdByteOffset: int
+    kvdByteLength: int
+    sgdByteOffset: int
+    sgdByteLength: int
+
+    levelIndices: List[LevelIndex]
+
+
 class Ktx2(NamedTuple):
     vkFormat: VkFormat
     typeSize: int
@@ -476,9 +120,11 @@ class Ktx2(NamedTuple):
 
     levelIndices: List[LevelIndex]
 
+    # pyktx2.dfd.DataFormatDescriptor
     dfd: Any
 
-    kv: Dict[str, bytes]
+    # pyktx2.kvd.KeyValueData. it refers to the buffer given to parse_bytes
+    kv: Mapping[str, bytes]
 
     supercompressionGlobalData: bytes
 
@@ -487,7 +133,34 @@ class Ktx2(NamedTuple):
 
 class ColorModel(Enum):
     NONE = 0
+    KHR_DF_MODEL_RGBSDA = 1
+    KHR_DF_MODEL_YUVSDA = 2
+    KHR_DF_MODEL_YIQSDA = 3
+    KHR_DF_MODEL_LABSDA = 4
+    KHR_DF_MODEL_CMYKA = 5
+    KHR_DF_MODEL_XYZW = 6
+    KHR_DF_MODEL_HSVA_ANG = 7
+    KHR_DF_MODEL_HSLA_ANG = 8
+    KHR_DF_MODEL_HSVA_HEX = 9
+    KHR_DF_MODEL_HSLA_HEX = 10
+    KHR_DF_MODEL_YCGCOA = 11
+    KHR_DF_MODEL_YCCBCCRC = 12
+    KHR_DF_MODEL_ICTCP = 13
+    KHR_DF_MODEL_CIEXYZ = 14
+    KHR_DF_MODEL_CIEXYY = 15
+    KHR_DF_MODEL_BC1A = 128
+    KHR_DF_MODEL_BC2 = 129
+    KHR_DF_MODEL_BC3 = 130
+    KHR_DF_MODEL_BC4 = 131
+    KHR_DF_MODEL_BC5 = 132
+    KHR_DF_MODEL_BC6H = 133
+    KHR_DF_MODEL_BC7 = 134
+    KHR_DF_MODEL_ETC1 = 160
+    KHR_DF_MODEL_ETC2 = 161
+    KHR_DF_MODEL_ASTC = 162
     KHR_DF_MODEL_ETC1S = 163
+    KHR_DF_MODEL_PVRTC = 164
+    KHR_DF_MODEL_PVRTC2 = 165
     KHR_DF_MODEL_UASTC = 166
 
 
@@ -548,28 +221,12 @@ class DFDBasicFlags(NamedTuple):
 
 
 def parse_dfd(data: bytes):
-    r = BytesReader(data)
-    dfdTotalSize = r.read_uint32()
-    descriptorType_vendorId = r.read_uint32()
-    if descriptorType_vendorId != 0:
-        raise NotImplementedError()
-    versionNumber = r.read_uint16()
-    descriptorBlockSize = r.read_uint16()
-    match descriptorType_vendorId:
-        case 0:
-            # Basic
-            flags = [b for b in r.read(16)]
-            dfd = DFDBasicFlags(
-                ColorModel(flags[0]),
-                ColorPrimaries(flags[1]),
-                TransferFunction(flags[2]),
-                *flags[3:])
-            sample_count = (descriptorBlockSize - 24)//16
-            samples = [r.read(16) for _ in range(sample_count)]
-            return dfd, samples
-
-        case _:
-            raise NotImplementedError()
+    '''
+    pyktx2.dfd.DataFormatDescriptor. it unpacks to (DFDBasicFlags, samples).
+    '''
+    # avoid circular imports
+    from .dfd import parse_dfd
+    return parse_dfd(data)
 
 
 class Image(NamedTuple):
@@ -586,7 +243,11 @@ def get_stride(format: VkFormat) -> int:
             raise NotImplementedError()
 
 
-def parse_bytes(data: bytes) -> Ktx2:
+def parse_header(data: bytes) -> Ktx2Header:
+    '''
+    parse the fixed header and the level index.
+    data must hold at least HEADER_SIZE + LEVEL_INDEX_SIZE * max(1, levelCount) bytes.
+    '''
     r = BytesReader(data)
     match r.read(12):
         case Const.IDENTIFIER:
@@ -594,7 +255,11 @@ def parse_bytes(data: bytes) -> Ktx2:
         case _:
             raise KtxError('invalid identifier')
 
-    vkFormat = VkFormat(r.read_uint32())
+    value = r.read_uint32()
+    try:
+        vkFormat = VkFormat(value)
+    except ValueError:
+        raise KtxError(f'unknown vkFormat {value}') from None
     typeSize = r.read_uint32()
     pixelWidth = r.read_uint32()
     pixelHeight = r.read_uint32()
@@ -602,7 +267,11 @@ def parse_bytes(data: bytes) -> Ktx2:
     layerCount = r.read_uint32()
     faceCount = r.read_uint32()
     levelCount = r.read_uint32()
-    supercompressionScheme = SupercompressionScheme(r.read_uint32())
+    value = r.read_uint32()
+    try:
+        supercompressionScheme = SupercompressionScheme(value)
+    except ValueError:
+        raise KtxError(f'unknown supercompressionScheme {value:#x}') from None
 
     # Index
     dfdByteOffset = r.read_uint32()
@@ -614,76 +283,118 @@ def parse_bytes(data: bytes) -> Ktx2:
 
     # Level Index
     levelIndices = [LevelIndex(r.read_uint64(), r.read_uint64(), r.read_uint64())
-                    for _ in range(levelCount)]
-
-    # Data Format Descriptor
-    dfd, samples = parse_dfd(r.read(dfdByteLength))
-
-    # Key/Value Data
-    assert r.pos == kvdByteOffset
-    # skip
-    # r.read(kvdByteLength)
-    kvdEnd = kvdByteOffset + kvdByteLength
-    kv: Dict[str, bytes] = {}
-    while r.pos < kvdEnd:
-        keyAndValueByteLength = r.read_uint32()
-        if keyAndValueByteLength >= 2:
-            keyAndValue = r.read(keyAndValueByteLength)
-            pos = keyAndValue.find(0)
-            key = keyAndValue[:pos].decode('utf-8')
-            kv[key] = keyAndValue[pos+1:]
-        # skip padding
-        padding = r.get_padding_size(4)
-        _ = r.read(padding)
-
-    if (sgdByteLength > 0):
-        # skip padding
-        padding = r.get_padding_size(8)
-        _ = r.read(padding)
-
-    # Supercompression Global Data
-    supercompressionGlobalData = r.read(sgdByteLength)
+                    for _ in range(max(1, levelCount))]
 
-    # Mip Level Array
-    levelImages = []
-    for i, level in enumerate(levelIndices):
-        # level
-        level_data = data[level.byteOffset:level.byteOffset +
-                          level.byteLength]
-        level_reader = BytesReader(level_data)
-
-        match supercompressionScheme:
-            case SupercompressionScheme.NONE:
-
-                stride = get_stride(vkFormat)
-
-                factor = pow(2, i)
-
-                level_width = pixelWidth//factor
-                level_height = pixelHeight//factor
-                image_size = level_width * level_height * stride
+    return Ktx2Header(
+        vkFormat,
+        typeSize,
+        pixelWidth,
+        pixelHeight,
+        pixelDepth,
+        layerCount,
+        faceCount,
+        levelCount,
+        supercompressionScheme,
+        dfdByteOffset,
+        dfdByteLength,
+        kvdByteOffset,
+        kvdByteLength,
+        sgdByteOffset,
+        sgdByteLength,
+        levelIndices)
 
-                assert image_size * max(1, layerCount) * faceCount * \
-                    max(1, pixelDepth) == len(level_data)
 
-                for layer in range(max(1, layerCount)):
-                    for face in range(faceCount):
-                        for depth in range(max(1, pixelDepth)):
-                            image = Image(level_reader.read(image_size),
-                                          level_width, level_height)
-                            levelImages.append(image)
+def read_header(f: BinaryIO, stats: ParseStats = NULL_STATS) -> Ktx2Header:
+    '''
+    read only the header and the level index from a seekable binary file.
+    '''
+    with stats.stage('header'):
+        f.seek(0)
+        data = f.read(HEADER_SIZE)
+        if len(data) < HEADER_SIZE:
+            raise KtxError('truncated header')
+        levelCount = struct.unpack_from('<I', data, 40)[0]
+        data += f.read(LEVEL_INDEX_SIZE * max(1, levelCount))
+        stats.read(len(data))
+        return parse_header(data)
+
+
+def _load_level_images(data: bytes, header: Ktx2Header, stats: ParseStats) -> List[Image]:
+    '''
+    one Image for each level, layer, face and depth slice in this order.
+    '''
+    # avoid circular imports. both modules depend on this one
+    from .formats import get_format_info, get_level_extent, get_image_size
+    from .supercompression import decompress_level
 
-            case SupercompressionScheme.BasisLZ:
-                pass
+    if header.supercompressionScheme == SupercompressionScheme.BasisLZ:
+        # transcoding is not supported
+        return []
 
-            case SupercompressionScheme.Zstandard:
-                pass
+    info = get_format_info(header.vkFormat)
+    view = memoryview(data)
+    levelImages = []
+    for i, level in enumerate(header.levelIndices):
+        level_data = view[level.byteOffset:level.byteOffset + level.byteLength]
+        if header.supercompressionScheme != SupercompressionScheme.NONE:
+            with stats.stage('decompress'):
+                level_data = memoryview(decompress_level(
+                    header.supercompressionScheme, level_data, level))
+
+        with stats.stage('levels'):
+            width, height, depth = get_level_extent(
+                header.pixelWidth, header.pixelHeight, header.pixelDepth, i)
+            image_size = get_image_size(info, width, height)
+            count = max(1, header.layerCount) * header.faceCount * depth
+            if image_size * count != len(level_data):
+                raise KtxError(
+                    f'level {i}: {len(level_data)} bytes for {count} images of {image_size} bytes')
+            for j in range(count):
+                levelImages.append(Image(bytes(level_data[j * image_size:(j + 1) * image_size]),
+                                         width, height))
+            stats.copy(image_size * count)
+            stats.image(count)
+    return levelImages
+
+
+def parse_bytes(data: bytes, load_levels: bool = True, stats: ParseStats = NULL_STATS) -> Ktx2:
+    '''
+    load_levels=False skips the mip level array. levelImages is empty.
+    supercompressed levels are decompressed. BasisLZ levels are skipped.
+    '''
+    with stats.stage('header'):
+        header = parse_header(data)
+    (vkFormat, typeSize, pixelWidth, pixelHeight, pixelDepth, layerCount, faceCount, levelCount, supercompressionScheme,
+     dfdByteOffset, dfdByteLength, kvdByteOffset, kvdByteLength, sgdByteOffset, sgdByteLength,
+     levelIndices) = header
+    r = BytesReader(data)
+    r.pos = HEADER_SIZE + LEVEL_INDEX_SIZE * len(levelIndices)
 
-            case SupercompressionScheme.ZLIB:
-                pass
+    # Data Format Descriptor
+    with stats.stage('dfd'):
+        dfd = parse_dfd(r.read(dfdByteLength))
+        stats.copy(dfdByteLength)
+
+    # Key/Value Data. values are not copied
+    with stats.stage('kvd'):
+        from .kvd import KeyValueData
+        if kvdByteLength > 0 and r.pos != kvdByteOffset:
+            raise KtxError(f'kvdByteOffset {kvdByteOffset} does not follow the dfd at {r.pos}')
+        kv = KeyValueData(data, kvdByteOffset, kvdByteLength) if kvdByteLength else KeyValueData()
+        r.pos += kvdByteLength
+
+    with stats.stage('sgd'):
+        if (sgdByteLength > 0):
+            # skip padding
+            padding = r.get_padding_size(8)
+            _ = r.read(padding)
+
+        # Supercompression Global Data
+        supercompressionGlobalData = r.read(sgdByteLength)
+        stats.copy(sgdByteLength)
 
-            case _:
-                raise NotImplementedError()
+    # Mip Level Array
+    levelImages = _load_level_images(data, header, stats) if load_levels else []
 
     return Ktx2(
         vkFormat,
@@ -702,11 +413,30 @@ def parse_bytes(data: bytes) -> Ktx2:
         sgdByteOffset,
         sgdByteLength,
         levelIndices,
-        (dfd, samples),
+        dfd,
         kv,
         supercompressionGlobalData,
         levelImages)
 
 
-def parse_path(path: pathlib.Path) -> Ktx2:
-    return parse_bytes(path.read_bytes())
+def parse_path(path: pathlib.Path, stats: ParseStats = NULL_STATS) -> Ktx2:
+    with stats.stage('read'):
+        data = path.read_bytes()
+        stats.read(len(data))
+    return parse_bytes(data, stats=stats)
+
+
+def parse_metadata(f: BinaryIO, stats: ParseStats = NULL_STATS) -> Ktx2:
+    '''
+    read header, dfd, kvd and sgd. the mip level array is not read.
+    '''
+    header = read_header(f, stats)
+    end = max(HEADER_SIZE + LEVEL_INDEX_SIZE * len(header.levelIndices),
+              header.dfdByteOffset + header.dfdByteLength,
+              header.kvdByteOffset + header.kvdByteLength,
+              header.sgdByteOffset + header.sgdByteLength)
+    with stats.stage('read'):
+        f.seek(0)
+        data = f.read(end)
+        stats.read(len(data))
+    return parse_bytes(data, load_levels=False, stats=stats)
@@ -0,0 +1,28 @@
+'''
+minimal RGBA8 png encoder.
+
+* https://www.w3.org/TR/png/
+'''
+import struct
+import zlib
+import numpy as np
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def encode_png(rgba: np.ndarray, compression_level: int = 6) -> bytes:
+    '''
+    rgba: (height, width, 4) uint8
+    '''
+    height, width, components = rgba.shape
+    if components != 4 or rgba.dtype != np.uint8:
+        raise ValueError(f'RGBA8 is required: {rgba.shape} {rgba.dtype}')
+    # filter type 0 for every scanline
+    raw = np.zeros((height, 1 + width * 4), np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+    return (b'\x89PNG\r\n\x1a\n'
+            + _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + _chunk(b'IDAT', zlib.compress(raw.tobytes(), compression_level))
+            + _chunk(b'IEND', b''))
@@ -0,0 +1,208 @@
+'''
+convert a ktx2 file between supercompression schemes level by level.
+
+read, (de)compress and write run in their own threads connected by bounded queues,
+so only a few levels are held in memory at any time.
+'''
+import pathlib
+import queue
+import threading
+from typing import BinaryIO, Optional, Callable, Any, List
+from .parser import (SupercompressionScheme, KtxError, Ktx2Header, LevelIndex,
+                     read_header, HEADER_SIZE, LEVEL_INDEX_SIZE)
+from .supercompression import decompress_level, compress_level
+from .writer import pack_header, get_padding, get_level_alignment, DFD_BYTES_PLANE0_OFFSET
+
+SCHEMES = {
+    'none': SupercompressionScheme.NONE,
+    'zstd': SupercompressionScheme.Zstandard,
+    'zlib': SupercompressionScheme.ZLIB,
+}
+
+
+def _texel_block_size(header: Ktx2Header, dfd: bytes) -> int:
+    '''
+    bytesPlane0 is 0 in a supercompressed dfd. restore it from the base level size.
+    '''
+    bw, bh, bd = (dfd[16] + 1, dfd[17] + 1, dfd[18] + 1)
+    blocks = (((header.pixelWidth + bw - 1) // bw)
+              * ((max(1, header.pixelHeight) + bh - 1) // bh)
+              * ((max(1, header.pixelDepth) + bd - 1) // bd)
+              * max(1, header.layerCount) * header.faceCount)
+    return header.levelIndices[0].uncompressedByteLength // blocks
+
+
+class _Failure:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+_DONE = object()
+
+
+def _run_stage(func: Callable[[Any], Any], inbox: queue.Queue, outbox: queue.Queue, cancel: threading.Event):
+    while True:
+        item = _get(inbox, cancel)
+        if item is None:
+            return
+        if item is _DONE or isinstance(item, _Failure):
+            _put(outbox, item, cancel)
+            return
+        try:
+            result = func(item)
+        except BaseException as e:
+            _put(outbox, _Failure(e), cancel)
+            return
+        if not _put(outbox, result, cancel):
+            return
+
+
+def _get(q: queue.Queue, cancel: threading.Event) -> Any:
+    while not cancel.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
+
+
+def _put(q: queue.Queue, item: Any, cancel: threading.Event) -> bool:
+    while not cancel.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def repack_file(src: BinaryIO, dst: BinaryIO, scheme: SupercompressionScheme,
+                compression_level: Optional[int] = None) -> None:
+    '''
+    src and dst must be seekable. the level index is patched after the levels are written.
+    '''
+    header = read_header(src)
+    if header.supercompressionScheme not in SCHEMES.values():
+        raise KtxError(f'{header.supercompressionScheme} is not supported')
+    if scheme not in SCHEMES.values():
+        raise KtxError(f'{scheme} is not supported')
+
+    src.seek(header.dfdByteOffset)
+    dfd = bytearray(src.read(header.dfdByteLength))
+    src.seek(header.kvdByteOffset)
+    kvd = src.read(header.kvdByteLength)
+    if len(dfd) != header.dfdByteLength or len(kvd) != header.kvdByteLength:
+        raise KtxError('truncated dfd or kvd')
+
+    if scheme != SupercompressionScheme.NONE:
+        dfd[DFD_BYTES_PLANE0_OFFSET] = 0
+    elif dfd[DFD_BYTES_PLANE0_OFFSET] == 0:
+        dfd[DFD_BYTES_PLANE0_OFFSET] = _texel_block_size(header, dfd)
+
+    levelCount = len(header.levelIndices)
+    dfdByteOffset = HEADER_SIZE + LEVEL_INDEX_SIZE * levelCount
+    kvdByteOffset = dfdByteOffset + len(dfd) if kvd else 0
+    pos = dfdByteOffset + len(dfd) + len(kvd)
+
+    dst.seek(0)
+    dst.write(b'\0' * dfdByteOffset)
+    dst.write(dfd)
+    dst.write(kvd)
+
+    # the smallest level comes first
+    order = list(reversed(range(levelCount)))
+
+    def read(i: int):
+        level = header.levelIndices[i]
+        src.seek(level.byteOffset)
+        data = src.read(level.byteLength)
+        if len(data) != level.byteLength:
+            raise KtxError(f'level {i} is truncated')
+        return i, data
+
+    def convert(item):
+        i, data = item
+        if header.supercompressionScheme == scheme:
+            return i, data, header.levelIndices[i].uncompressedByteLength
+        raw = decompress_level(header.supercompressionScheme,
+                               data, header.levelIndices[i])
+        del data
+        return i, compress_level(scheme, raw, compression_level), len(raw)
+
+    indices = queue.Queue()
+    read_queue = queue.Queue(maxsize=1)
+    convert_queue = queue.Queue(maxsize=1)
+    cancel = threading.Event()
+    for i in order:
+        indices.put(i)
+    indices.put(_DONE)
+    threads = [
+        threading.Thread(target=_run_stage, args=(
+            read, indices, read_queue, cancel), daemon=True),
+        threading.Thread(target=_run_stage, args=(
+            convert, read_queue, convert_queue, cancel), daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    alignment = get_level_alignment(scheme, bytes(dfd))
+    levelIndices: List[LevelIndex] = [LevelIndex(0, 0, 0)] * levelCount
+    try:
+        while True:
+            item = convert_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            i, data, uncompressedByteLength = item
+            padding = get_padding(pos, alignment)
+            dst.write(b'\0' * padding)
+            pos += padding
+            levelIndices[i] = LevelIndex(
+                pos, len(data), uncompressedByteLength)
+            dst.write(data)
+            pos += len(data)
+    finally:
+        cancel.set()
+        for t in threads:
+            t.join()
+
+    dst.seek(0)
+    dst.write(pack_header(header._replace(
+        supercompressionScheme=scheme,
+        dfdByteOffset=dfdByteOffset,
+        dfdByteLength=len(dfd),
+        kvdByteOffset=kvdByteOffset,
+        kvdByteLength=len(kvd),
+        sgdByteOffset=0,
+        sgdByteLength=0,
+        levelIndices=levelIndices)))
+    dst.seek(pos)
+    dst.truncate()
+
+
+def repack(src: pathlib.Path, dst: pathlib.Path, scheme: SupercompressionScheme,
+           compression_level: Optional[int] = None) -> None:
+    if src.resolve() == dst.resolve():
+        raise KtxError('src and dst must be different files')
+    with src.open('rb') as r, dst.open('wb') as w:
+        repack_file(r, w, scheme, compression_level)
+
+
+def main(argv: Optional[List[str]] = None):
+    from argparse import ArgumentParser
+    arg_parser = ArgumentParser(
+        description='convert ktx2 supercompression level by level')
+    arg_parser.add_argument('src', type=str, help='input ktx2')
+    arg_parser.add_argument('dst', type=str, help='output ktx2')
+    arg_parser.add_argument('--scheme', choices=list(SCHEMES.keys()), default='zstd',
+                            help='output supercompression scheme')
+    arg_parser.add_argument('--level', type=int, default=None,
+                            help='zstd or zlib compression level')
+    args = arg_parser.parse_args(argv)
+    repack(pathlib.Path(args.src), pathlib.Path(args.dst),
+           SCHEMES[args.scheme], args.level)
+
+
+if __name__ == '__main__':
+    main()
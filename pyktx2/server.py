@@ -0,0 +1,563 @@
+'''
+serve the ktx2 files of a directory over http.
+
+    GET /                                           file list
+    GET /info/<path>                                header, levels, dfd and key/value data
+    GET /level/<path>?level=0                       uncompressed level data
+    GET /level/<path>?level=0&layer=0&face=0        one layer/face. depth=N for one slice
+    GET /level/<path>?level=0&raw=1                 level data as stored (supercompressed)
+    GET /preview/<path>?level=0&layer=0&face=0      png. size=N to fit N pixels
+
+every response has an ETag of the file version and supports a single byte Range.
+only the requested bytes of an uncompressed level are read. headers, decompressed
+levels and previews are kept in a hot cache bounded in bytes.
+'''
+import argparse
+import asyncio
+import base64
+import collections
+import json
+import logging
+import os
+import pathlib
+import stat
+import urllib.parse
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+from .parser import Ktx2, Ktx2Header, SupercompressionScheme, KtxError, read_header, parse_metadata
+from .formats import get_format_info, get_level_extent, get_image_size
+from .decode import read_at, get_image_offset
+logger = logging.getLogger()
+
+CACHE_BYTES = 256 << 20
+# request line and headers
+MAX_HEADER_BYTES = 64 << 10
+# file ranges are sent in chunks of this size
+CHUNK_SIZE = 1 << 20
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str = '') -> None:
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    version: str
+
+
+class FileRange(NamedTuple):
+    '''
+    a body read from the file while it is sent.
+    '''
+    path: pathlib.Path
+    offset: int
+    length: int
+
+
+Body = Union[bytes, memoryview, FileRange]
+
+
+class Response(NamedTuple):
+    status: int
+    headers: List[Tuple[str, str]]
+    body: Body = b''
+
+
+def _body_length(body: Body) -> int:
+    return body.length if isinstance(body, FileRange) else len(body)
+
+
+def _slice(body: Body, start: int, stop: int) -> Body:
+    if isinstance(body, FileRange):
+        return FileRange(body.path, body.offset + start, stop - start)
+    return memoryview(body)[start:stop]
+
+
+def _error(status: int, message: str = '', headers: Optional[List[Tuple[str, str]]] = None) -> Response:
+    body = (message or HTTPStatus(status).phrase).encode('utf-8') + b'\n'
+    return Response(status, [('Content-Type', 'text/plain; charset=utf-8')] + (headers or []), body)
+
+
+class HotCache:
+    '''
+    least recently used values bounded by the sum of their sizes in bytes.
+    a value larger than the budget is not kept.
+    '''
+
+    def __init__(self, budget: int = CACHE_BYTES) -> None:
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: 'collections.OrderedDict[Hashable, Tuple[Any, int]]' = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Any:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        old = self._items.pop(key, None)
+        if old:
+            self.size -= old[1]
+        if size > self.budget:
+            return
+        self._items[key] = (value, size)
+        self.size += size
+        while self.size > self.budget:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self.size -= evicted
+
+
+def parse_range(value: str, length: int) -> Optional[Tuple[int, int]]:
+    '''
+    a single byte range -> (start, stop). None when the header is ignored and
+    the whole body is sent. multiple ranges are ignored.
+    raises HttpError(416) when the range is out of the body.
+    '''
+    unit, _, spec = value.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise HttpError(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            return max(0, length - suffix), length
+        start = int(first)
+        stop = int(last) + 1 if last else length
+    except ValueError:
+        return None
+    if start < 0 or (last and stop <= start):
+        return None
+    if start >= length:
+        raise HttpError(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+    return start, min(stop, length)
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    '''
+    None when the client closed the connection between requests.
+    '''
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'incomplete request')
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f'bad request line {lines[0]!r}')
+    if not version.startswith('HTTP/1.'):
+        raise HttpError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f'bad header {line!r}')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'transfer-encoding' in headers:
+        raise HttpError(HTTPStatus.NOT_IMPLEMENTED, 'request bodies are not supported')
+    try:
+        content_length = int(headers.get('content-length', '0'))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'bad content-length')
+    if content_length > MAX_HEADER_BYTES:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    if content_length:
+        # not used
+        await reader.readexactly(content_length)
+
+    split = urllib.parse.urlsplit(target)
+    return Request(method, urllib.parse.unquote(split.path),
+                   dict(urllib.parse.parse_qsl(split.query)), headers, version)
+
+
+def _keep_alive(request: Request) -> bool:
+    connection = request.headers.get('connection', '').lower()
+    if request.version == 'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
+
+
+def _int(query: Dict[str, str], key: str, default: int = 0) -> int:
+    try:
+        return int(query.get(key, default))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f'{key} must be an integer')
+
+
+def _info(path: str, st: os.stat_result, ktx2: Ktx2) -> Dict[str, Any]:
+    levels = []
+    for i, index in enumerate(ktx2.levelIndices):
+        width, height, depth = get_level_extent(ktx2.pixelWidth, ktx2.pixelHeight, ktx2.pixelDepth, i)
+        levels.append({'level': i, 'width': width, 'height': height, 'depth': depth,
+                       'byteOffset': index.byteOffset, 'byteLength': index.byteLength,
+                       'uncompressedByteLength': index.uncompressedByteLength})
+    dfd = None
+    if ktx2.dfd.basic:
+        basic = ktx2.dfd.basic
+        dfd = {'colorModel': basic.colorModel.name, 'colorPrimaries': basic.colorPrimaries.name,
+               'transferFunction': basic.transferFunction.name, 'flags': basic.flags,
+               'samples': len(ktx2.dfd.samples)}
+    kv: Dict[str, Any] = {}
+    for key in ktx2.kv:
+        value = ktx2.kv[key]
+        try:
+            if value.endswith(b'\0'):
+                kv[key] = value[:-1].decode('utf-8')
+                continue
+        except UnicodeDecodeError:
+            pass
+        kv[key] = {'base64': base64.b64encode(value).decode('ascii')}
+    return {
+        'path': path,
+        'size': st.st_size,
+        'vkFormat': ktx2.vkFormat.name,
+        'typeSize': ktx2.typeSize,
+        'pixelWidth': ktx2.pixelWidth,
+        'pixelHeight': ktx2.pixelHeight,
+        'pixelDepth': ktx2.pixelDepth,
+        'layerCount': ktx2.layerCount,
+        'faceCount': ktx2.faceCount,
+        'supercompressionScheme': ktx2.supercompressionScheme.name,
+        'levels': levels,
+        'dfd': dfd,
+        'kv': kv,
+    }
+
+
+def _json(value: Any) -> bytes:
+    return json.dumps(value, indent=1).encode('utf-8')
+
+
+def _load_header(path: pathlib.Path) -> Ktx2Header:
+    with path.open('rb') as f:
+        return read_header(f)
+
+
+def _load_metadata(path: pathlib.Path) -> Ktx2:
+    with path.open('rb') as f:
+        return parse_metadata(f)
+
+
+def _load_level(path: pathlib.Path, header: Ktx2Header, level: int) -> bytes:
+    from .supercompression import decompress_level
+    index = header.levelIndices[level]
+    with path.open('rb') as f:
+        data = read_at(f, index.byteOffset, index.byteLength)
+    return decompress_level(header.supercompressionScheme, data, index)
+
+
+def _read_range(path: pathlib.Path, offset: int, length: int) -> bytes:
+    with path.open('rb') as f:
+        return read_at(f, offset, length)
+
+
+def _make_preview(header: Ktx2Header, data: bytes, width: int, height: int, size: int) -> bytes:
+    from .decode import decode_image, to_rgba8
+    from .png import encode_png
+    from .thumbnail import downsample
+    rgba = to_rgba8(decode_image(header.vkFormat, data, width, height), header.vkFormat)
+    if size > 0:
+        rgba = downsample(rgba, size)
+    return encode_png(rgba)
+
+
+def _list(root: pathlib.Path) -> bytes:
+    from .validate import iter_paths
+    files = [{'path': path.relative_to(root).as_posix(), 'size': path.stat().st_size}
+             for path in iter_paths([root])]
+    return _json({'files': files})
+
+
+class Ktx2Server:
+    '''
+    blocking reads, decompression and decoding run in the executor.
+    the cache is only touched from the event loop.
+    concurrent requests for the same uncached value share one load.
+    '''
+
+    def __init__(self, root: pathlib.Path, cache_bytes: int = CACHE_BYTES, executor=None) -> None:
+        self.root = root.resolve()
+        self.cache = HotCache(cache_bytes)
+        self._executor = executor
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _cached(self, key: Hashable, size: Callable[[Any], int], load: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(load())
+            self._loading[key] = task
+
+            def done(t: asyncio.Future) -> None:
+                del self._loading[key]
+                if not t.cancelled() and t.exception() is None:
+                    self.cache.put(key, t.result(), size(t.result()))
+            task.add_done_callback(done)
+        # a client that goes away does not cancel the load for the others
+        return await asyncio.shield(task)
+
+    def _resolve(self, relpath: str) -> Tuple[pathlib.Path, os.stat_result]:
+        path = (self.root / relpath).resolve()
+        if path.suffix.lower() != '.ktx2' or not path.is_relative_to(self.root):
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        try:
+            st = path.stat()
+        except OSError:
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        if not stat.S_ISREG(st.st_mode):
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        return path, st
+
+    async def _header(self, path: pathlib.Path, st: os.stat_result) -> Ktx2Header:
+        return await self._cached(('header', str(path), st.st_mtime_ns, st.st_size),
+                                  lambda header: 1024 + 24 * len(header.levelIndices),
+                                  lambda: self._run(_load_header, path))
+
+    async def _subresource(self, path: pathlib.Path, st: os.stat_result, header: Ktx2Header,
+                           level: int, offset: int, length: int) -> Body:
+        '''
+        bytes [offset, offset + length) of the uncompressed level.
+        '''
+        index = header.levelIndices[level]
+        match header.supercompressionScheme:
+            case SupercompressionScheme.NONE:
+                return FileRange(path, index.byteOffset + offset, length)
+            case SupercompressionScheme.Zstandard | SupercompressionScheme.ZLIB:
+                data = await self._cached(('level', str(path), st.st_mtime_ns, st.st_size, level),
+                                          len, lambda: self._run(_load_level, path, header, level))
+                return memoryview(data)[offset:offset + length]
+            case _:
+                raise NotImplementedError(f'{header.supercompressionScheme}')
+
+    def _select(self, header: Ktx2Header, query: Dict[str, str]) -> Tuple[int, int, int, int, int]:
+        '''
+        level, offset and length of the requested part of a level, and its width and height.
+        '''
+        level = _int(query, 'level')
+        if not 0 <= level < len(header.levelIndices):
+            raise HttpError(HTTPStatus.NOT_FOUND, f'no level {level}')
+        info = get_format_info(header.vkFormat)
+        width, height, depth = get_level_extent(header.pixelWidth, header.pixelHeight, header.pixelDepth, level)
+        # the level index is not trusted for the response length
+        level_size = get_image_size(info, width, height, depth) * max(1, header.layerCount) * header.faceCount
+        index = header.levelIndices[level]
+        stored = (index.byteLength if header.supercompressionScheme == SupercompressionScheme.NONE
+                  else index.uncompressedByteLength)
+        if stored != level_size:
+            raise KtxError(f'level {level} is {stored} bytes, not {level_size}')
+        if not any(key in query for key in ('layer', 'face', 'depth')):
+            return level, 0, level_size, width, height
+        layer, face = _int(query, 'layer'), _int(query, 'face')
+        if 'depth' in query:
+            offset = get_image_offset(header, level, layer, face, _int(query, 'depth'))
+            return level, offset, get_image_size(info, width, height), width, height
+        offset = get_image_offset(header, level, layer, face, 0)
+        return level, offset, get_image_size(info, width, height, depth), width, height
+
+    async def _level(self, path: pathlib.Path, st: os.stat_result, query: Dict[str, str]) -> Tuple[Body, str]:
+        header = await self._header(path, st)
+        if query.get('raw') in ('1', 'true'):
+            level = _int(query, 'level')
+            if not 0 <= level < len(header.levelIndices):
+                raise HttpError(HTTPStatus.NOT_FOUND, f'no level {level}')
+            index = header.levelIndices[level]
+            return FileRange(path, index.byteOffset, index.byteLength), 'application/octet-stream'
+        level, offset, length, _, _ = self._select(header, query)
+        return await self._subresource(path, st, header, level, offset, length), 'application/octet-stream'
+
+    async def _preview(self, path: pathlib.Path, st: os.stat_result, query: Dict[str, str]) -> Tuple[Body, str]:
+        header = await self._header(path, st)
+        query = dict(query, layer=query.get('layer', '0'), face=query.get('face', '0'),
+                     depth=query.get('depth', '0'))
+        level, offset, length, width, height = self._select(header, query)
+        size = _int(query, 'size')
+
+        async def load() -> bytes:
+            data = await self._subresource(path, st, header, level, offset, length)
+            if isinstance(data, FileRange):
+                data = await self._run(_read_range, *data)
+            return await self._run(_make_preview, header, bytes(data), width, height, size)
+        png = await self._cached(('preview', str(path), st.st_mtime_ns, st.st_size, level, offset, size), len, load)
+        return png, 'image/png'
+
+    async def _file(self, kind: str, relpath: str, request: Request) -> Response:
+        path, st = self._resolve(relpath)
+        etag = f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match and (if_none_match.strip() == '*'
+                              or etag in (tag.strip() for tag in if_none_match.split(','))):
+            return Response(HTTPStatus.NOT_MODIFIED, [('ETag', etag)])
+
+        match kind:
+            case 'info':
+                ktx2 = await self._cached(('metadata', str(path), st.st_mtime_ns, st.st_size),
+                                          lambda ktx2: 1024 + ktx2.dfdByteLength + ktx2.kvdByteLength,
+                                          lambda: self._run(_load_metadata, path))
+                body, content_type = _json(_info(relpath, st, ktx2)), 'application/json'
+            case 'level':
+                body, content_type = await self._level(path, st, request.query)
+            case 'preview':
+                body, content_type = await self._preview(path, st, request.query)
+            case _:
+                raise HttpError(HTTPStatus.NOT_FOUND)
+        # checked before the headers are sent. a read past the end fails in the middle of the body
+        if isinstance(body, FileRange) and body.offset + body.length > st.st_size:
+            raise KtxError(f'[{body.offset}, {body.offset + body.length}) exceeds the file size {st.st_size}')
+
+        headers = [('Content-Type', content_type), ('ETag', etag), ('Accept-Ranges', 'bytes')]
+        length = _body_length(body)
+        range_header = request.headers.get('range')
+        if range_header and request.headers.get('if-range', etag) == etag:
+            try:
+                selected = parse_range(range_header, length)
+            except HttpError as e:
+                return _error(e.status, headers=[('Content-Range', f'bytes */{length}'), ('ETag', etag)])
+            if selected:
+                start, stop = selected
+                headers.append(('Content-Range', f'bytes {start}-{stop - 1}/{length}'))
+                return Response(HTTPStatus.PARTIAL_CONTENT, headers, _slice(body, start, stop))
+        return Response(HTTPStatus.OK, headers, body)
+
+    async def respond(self, request: Request) -> Response:
+        if request.method not in ('GET', 'HEAD'):
+            return _error(HTTPStatus.METHOD_NOT_ALLOWED, headers=[('Allow', 'GET, HEAD')])
+        try:
+            if request.path == '/':
+                return Response(HTTPStatus.OK, [('Content-Type', 'application/json')],
+                                await self._run(_list, self.root))
+            kind, _, relpath = request.path.lstrip('/').partition('/')
+            if not relpath:
+                raise HttpError(HTTPStatus.NOT_FOUND)
+            return await self._file(kind, relpath, request)
+        except HttpError as e:
+            return _error(e.status, str(e))
+        except ValueError as e:
+            return _error(HTTPStatus.BAD_REQUEST, str(e))
+        except NotImplementedError as e:
+            return _error(HTTPStatus.NOT_IMPLEMENTED, f'{e} is not supported')
+        except (KtxError, OSError) as e:
+            return _error(HTTPStatus.INTERNAL_SERVER_ERROR, f'{type(e).__name__}: {e}')
+        except Exception as e:
+            # a bug must not drop the connection without a response
+            logger.exception(request.path)
+            return _error(HTTPStatus.INTERNAL_SERVER_ERROR, f'{type(e).__name__}: {e}')
+
+    async def _send(self, writer: asyncio.StreamWriter, response: Response, head: bool, close: bool) -> None:
+        status = HTTPStatus(response.status)
+        length = _body_length(response.body)
+        lines = [f'HTTP/1.1 {status.value} {status.phrase}', 'Server: pyktx2']
+        lines += [f'{name}: {value}' for name, value in response.headers]
+        if status != HTTPStatus.NOT_MODIFIED:
+            lines.append(f'Content-Length: {length}')
+        if close:
+            lines.append('Connection: close')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if head or not length:
+            await writer.drain()
+            return
+        body = response.body
+        if not isinstance(body, FileRange):
+            writer.write(body)
+            await writer.drain()
+            return
+        for pos in range(0, body.length, CHUNK_SIZE):
+            writer.write(await self._run(_read_range, body.path, body.offset + pos,
+                                         min(CHUNK_SIZE, body.length - pos)))
+            await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        asyncio.start_server callback. serves the requests of a keep-alive connection in order.
+        '''
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    await self._send(writer, _error(e.status, str(e)), False, True)
+                    break
+                if request is None:
+                    break
+                keep_alive = _keep_alive(request)
+                response = await self.respond(request)
+                await self._send(writer, response, request.method == 'HEAD', not keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (KtxError, OSError):
+            # the file changed while its body was sent. the client sees a short body
+            pass
+        except asyncio.CancelledError:
+            # the server is shutting down. python < 3.12 logs a cancelled handler as an error
+            writer.close()
+            return
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='serve the ktx2 files of a directory over http')
+    parser.add_argument('root', type=pathlib.Path)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache-mb', type=int, default=CACHE_BYTES >> 20,
+                        help='hot cache budget of headers, decompressed levels and previews')
+    args = parser.parse_args(argv)
+    if not args.root.is_dir():
+        parser.error(f'{args.root} is not a directory')
+
+    async def serve():
+        server = await Ktx2Server(args.root, args.cache_mb << 20).start(args.host, args.port)
+        for sock in server.sockets:
+            host, port = sock.getsockname()[:2]
+            print(f'serving {args.root} on http://{host}:{port}/')
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+'''
+Zstandard and ZLIB level (de)compression. zstandard is an optional dependency.
+'''
+import sys
+import zlib
+from typing import Optional, Iterable, Iterator
+from .parser import SupercompressionScheme, KtxError, LevelIndex
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise KtxError(
+            'Zstandard supercompression requires zstandard. pip install pyktx2[zstd]') from e
+    return zstandard
+
+
+def decompress_level(scheme: SupercompressionScheme, data: bytes, level: LevelIndex) -> bytes:
+    '''
+    a corrupted level raises KtxError.
+
+    uncompressedByteLength is not trusted to size a buffer. the output grows with the data
+    actually decompressed and has to end at exactly uncompressedByteLength.
+    '''
+    expected = level.uncompressedByteLength
+    match scheme:
+        case SupercompressionScheme.NONE:
+            return data
+        case SupercompressionScheme.Zstandard:
+            zstandard = _zstandard()
+            try:
+                if zstandard.frame_content_size(data) == expected:
+                    # the frame header agrees. one buffer of that size
+                    out = zstandard.ZstdDecompressor().decompress(data)
+                else:
+                    out = _join_bounded(zstandard.ZstdDecompressor().read_to_iter(
+                        data, write_size=1 << 20), expected)
+            except zstandard.ZstdError as e:
+                raise KtxError(f'corrupted Zstandard level: {e}') from e
+        case SupercompressionScheme.ZLIB:
+            d = zlib.decompressobj()
+            try:
+                # one byte more than expected tells a too long level
+                out = d.decompress(data, min(expected + 1, sys.maxsize))
+            except zlib.error as e:
+                raise KtxError(f'corrupted ZLIB level: {e}') from e
+            if len(out) == expected and not d.eof:
+                raise KtxError('truncated ZLIB level')
+        case _:
+            raise KtxError(f'{scheme} is not supported')
+    if len(out) != expected:
+        raise KtxError(f'level decompresses to {len(out)} bytes, not uncompressedByteLength {expected}')
+    return out
+
+
+def _join_bounded(chunks: Iterable[bytes], limit: int) -> bytes:
+    out = []
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > limit:
+            raise KtxError(f'level decompresses to more than uncompressedByteLength {limit}')
+        out.append(chunk)
+    return b''.join(out)
+
+
+def compress_level(scheme: SupercompressionScheme, data: bytes, compression_level: Optional[int] = None) -> bytes:
+    match scheme:
+        case SupercompressionScheme.NONE:
+            return data
+        case SupercompressionScheme.Zstandard:
+            return _zstandard().ZstdCompressor(
+                level=3 if compression_level is None else compression_level).compress(data)
+        case SupercompressionScheme.ZLIB:
+            return zlib.compress(data, -1 if compression_level is None else compression_level)
+        case _:
+            raise KtxError(f'{scheme} is not supported')
+
+
+class _ChunkReader:
+    '''
+    read() over an iterable of chunks.
+    '''
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def iter_decompress_level(scheme: SupercompressionScheme, chunks: Iterable[bytes],
+                          output_size: int = 1 << 20) -> Iterator[bytes]:
+    '''
+    decompress a level from its compressed chunks.
+    each output is at most output_size bytes, so memory stays bounded on a huge level.
+    a corrupted level raises KtxError.
+    '''
+    match scheme:
+        case SupercompressionScheme.NONE:
+            yield from chunks
+        case SupercompressionScheme.Zstandard:
+            zstandard = _zstandard()
+            try:
+                yield from zstandard.ZstdDecompressor().read_to_iter(
+                    _ChunkReader(chunks), read_size=output_size, write_size=output_size)
+            except zstandard.ZstdError as e:
+                raise KtxError(f'corrupted Zstandard level: {e}') from e
+        case SupercompressionScheme.ZLIB:
+            d = zlib.decompressobj()
+            try:
+                for chunk in chunks:
+                    data = chunk
+                    while True:
+                        out = d.decompress(data, output_size)
+                        if out:
+                            yield out
+                        data = d.unconsumed_tail
+                        if not data and len(out) < output_size:
+                            break
+                out = d.flush()
+            except zlib.error as e:
+                raise KtxError(f'corrupted ZLIB level: {e}') from e
+            if out:
+                yield out
+        case _:
+            raise KtxError(f'{scheme} is not supported')
@@ -0,0 +1,99 @@
+'''
+thumbnails from the smallest mip level that covers the requested size.
+
+thumbnails are stored as png in an on disk cache keyed by path, mtime and size,
+so an unchanged file is never opened twice.
+'''
+import hashlib
+import os
+import pathlib
+import threading
+from typing import Optional
+import numpy as np
+from .parser import Ktx2Header, read_header
+from .formats import get_level_extent
+from .decode import decode_region, to_rgba8
+from .png import encode_png
+
+THUMBNAIL_SIZE = 128
+
+
+def choose_level(header: Ktx2Header, size: int) -> int:
+    '''
+    the smallest level whose larger side is at least size.
+    the base level is used only when no smaller level is large enough.
+    '''
+    for level in reversed(range(len(header.levelIndices))):
+        width, height, _ = get_level_extent(header.pixelWidth, header.pixelHeight,
+                                            header.pixelDepth, level)
+        if max(width, height) >= size:
+            return level
+    return 0
+
+
+def downsample(rgba: np.ndarray, size: int) -> np.ndarray:
+    '''
+    box filter by an integer factor so that the larger side fits size.
+    '''
+    height, width = rgba.shape[:2]
+    factor = -(-max(width, height) // size)
+    if factor <= 1:
+        return rgba
+    fy = min(factor, height)
+    fx = min(factor, width)
+    h = height // fy
+    w = width // fx
+    blocks = rgba[:h * fy, :w * fx].astype(np.uint32).reshape(h, fy, w, fx, 4)
+    return ((blocks.sum(axis=(1, 3)) + fx * fy // 2) // (fx * fy)).astype(np.uint8)
+
+
+def make_thumbnail(path: pathlib.Path, size: int = THUMBNAIL_SIZE) -> np.ndarray:
+    '''
+    RGBA8 thumbnail of the first layer/face/depth slice. only one level is read.
+    '''
+    with path.open('rb') as f:
+        header = read_header(f)
+        level = choose_level(header, size)
+        width, height, _ = get_level_extent(header.pixelWidth, header.pixelHeight,
+                                            header.pixelDepth, level)
+        image = decode_region(f, 0, 0, width, height, level, header=header)
+    return downsample(to_rgba8(image, header.vkFormat), size)
+
+
+def get_cache_dir() -> pathlib.Path:
+    base = os.environ.get('XDG_CACHE_HOME')
+    return (pathlib.Path(base) if base else pathlib.Path.home() / '.cache') / 'pyktx2' / 'thumbnails'
+
+
+class ThumbnailCache:
+    def __init__(self, directory: Optional[pathlib.Path] = None, size: int = THUMBNAIL_SIZE) -> None:
+        self.directory = directory or get_cache_dir()
+        self.size = size
+
+    def _entry(self, path: pathlib.Path) -> pathlib.Path:
+        st = path.stat()
+        key = f'{path.resolve()}\0{st.st_mtime_ns}\0{st.st_size}\0{self.size}'
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.directory / digest[:2] / f'{digest}.png'
+
+    def get(self, path: pathlib.Path) -> Optional[bytes]:
+        try:
+            return self._entry(path).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, path: pathlib.Path, png: bytes) -> None:
+        entry = self._entry(path)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # write then rename, so that a concurrent reader never sees a partial file
+        tmp = entry.with_suffix(
+            f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(png)
+        os.replace(tmp, entry)
+
+    def get_or_create(self, path: pathlib.Path) -> bytes:
+        png = self.get(path)
+        if png is None:
+            png = encode_png(make_thumbnail(path, self.size))
+            self.put(path, png)
+        return png
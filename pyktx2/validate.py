@@ -0,0 +1,458 @@
+'''
+structural validation of ktx2 files.
+
+only the header, the level index, the dfd and the kvd are read.
+level data is sampled with a few positioned reads, images are never decoded.
+every problem is reported, not only the first one.
+
+    ktx2_validate a.ktx2 textures/ --jobs 8
+'''
+import argparse
+import concurrent.futures
+import math
+import os
+import pathlib
+import struct
+import sys
+from typing import BinaryIO, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from .parser import (VkFormat, SupercompressionScheme, ColorModel, TransferFunction, Const, KtxError,
+                     HEADER_SIZE, LEVEL_INDEX_SIZE)
+from .formats import FormatInfo, get_format_info, get_level_extent, get_image_size
+from .decode import read_at
+
+ERROR = 'error'
+WARNING = 'warning'
+
+# keys defined by the ktx2 specification
+KNOWN_KEYS = frozenset([
+    'KTXcubemapIncomplete',
+    'KTXorientation',
+    'KTXglFormat',
+    'KTXdxgiFormat__',
+    'KTXmetalPixelFormat',
+    'KTXswizzle',
+    'KTXwriter',
+    'KTXwriterScParams',
+    'KTXastcDecodeMode',
+    'KTXanimData',
+])
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# a level is sampled with this many bytes at its start
+SAMPLE_SIZE = 4
+
+
+class Problem(NamedTuple):
+    severity: str
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.severity}: {self.message}'
+
+
+def _expected_color_model(vkFormat: VkFormat) -> Optional[ColorModel]:
+    name = vkFormat.name[len('VK_FORMAT_'):]
+    for prefix, model in (('BC1_', ColorModel.KHR_DF_MODEL_BC1A),
+                          ('BC2_', ColorModel.KHR_DF_MODEL_BC2),
+                          ('BC3_', ColorModel.KHR_DF_MODEL_BC3),
+                          ('BC4_', ColorModel.KHR_DF_MODEL_BC4),
+                          ('BC5_', ColorModel.KHR_DF_MODEL_BC5),
+                          ('BC6H_', ColorModel.KHR_DF_MODEL_BC6H),
+                          ('BC7_', ColorModel.KHR_DF_MODEL_BC7),
+                          ('ETC2_', ColorModel.KHR_DF_MODEL_ETC2),
+                          ('EAC_', ColorModel.KHR_DF_MODEL_ETC2),
+                          ('ASTC_', ColorModel.KHR_DF_MODEL_ASTC),
+                          ('PVRTC1_', ColorModel.KHR_DF_MODEL_PVRTC),
+                          ('PVRTC2_', ColorModel.KHR_DF_MODEL_PVRTC2)):
+        if name.startswith(prefix):
+            return model
+    if '_BLOCK' in name or 'PLANE' in name or name == 'UNDEFINED':
+        return None
+    return ColorModel.KHR_DF_MODEL_RGBSDA
+
+
+def _format_info(vkFormat: VkFormat) -> Optional[FormatInfo]:
+    try:
+        return get_format_info(vkFormat)
+    except NotImplementedError:
+        return None
+
+
+class _Validator:
+    def __init__(self, f: BinaryIO, file_size: int) -> None:
+        self.f = f
+        self.file_size = file_size
+        self.problems: List[Problem] = []
+
+    def error(self, message: str) -> None:
+        self.problems.append(Problem(ERROR, message))
+
+    def warning(self, message: str) -> None:
+        self.problems.append(Problem(WARNING, message))
+
+    def check_range(self, name: str, offset: int, length: int) -> bool:
+        if offset + length > self.file_size:
+            self.error(f'{name} [{offset}, {offset + length}) exceeds the file size {self.file_size}')
+            return False
+        return True
+
+    def run(self) -> List[Problem]:
+        if self.file_size < HEADER_SIZE:
+            self.error(f'file size {self.file_size} is smaller than the header')
+            return self.problems
+        header = read_at(self.f, 0, HEADER_SIZE)
+        if header[:12] != Const.IDENTIFIER:
+            self.error('invalid identifier')
+            return self.problems
+        (vkFormat, typeSize, pixelWidth, pixelHeight, pixelDepth, layerCount, faceCount, levelCount, scheme,
+         dfdByteOffset, dfdByteLength, kvdByteOffset, kvdByteLength,
+         sgdByteOffset, sgdByteLength) = struct.unpack_from('<9I4I2Q', header, 12)
+
+        # the level index, the dfd and the kvd in a single read
+        index_end = HEADER_SIZE + LEVEL_INDEX_SIZE * max(1, levelCount)
+        if not self.check_range('level index', HEADER_SIZE, index_end - HEADER_SIZE):
+            return self.problems
+        metadata_end = min(self.file_size, max(index_end, dfdByteOffset + dfdByteLength,
+                                               kvdByteOffset + kvdByteLength))
+        data = header + read_at(self.f, HEADER_SIZE, metadata_end - HEADER_SIZE)
+        levels = [struct.unpack_from('<3Q', data, HEADER_SIZE + LEVEL_INDEX_SIZE * i)
+                  for i in range(max(1, levelCount))]
+
+        try:
+            format = VkFormat(vkFormat)
+        except ValueError:
+            self.error(f'unknown vkFormat {vkFormat}')
+            format = None
+        try:
+            supercompression = SupercompressionScheme(scheme)
+        except ValueError:
+            if 0x10000 <= scheme <= 0x1FFFF:
+                self.warning(f'vendor supercompressionScheme {scheme:#x} is not checked')
+            else:
+                self.error(f'unknown supercompressionScheme {scheme}')
+            supercompression = None
+        info = _format_info(format) if format else None
+
+        self.check_header(format, info, typeSize, pixelWidth, pixelHeight, pixelDepth,
+                          layerCount, faceCount, levelCount, supercompression)
+        self.check_sections(index_end, supercompression, dfdByteOffset, dfdByteLength,
+                            kvdByteOffset, kvdByteLength, sgdByteOffset, sgdByteLength)
+        try:
+            if dfdByteLength and dfdByteOffset + dfdByteLength <= len(data):
+                self.check_dfd(data[dfdByteOffset:dfdByteOffset + dfdByteLength],
+                               format, info, supercompression)
+            if kvdByteLength and kvdByteOffset + kvdByteLength <= len(data):
+                self.check_kvd(data[kvdByteOffset:kvdByteOffset + kvdByteLength])
+        except struct.error as e:
+            self.error(f'malformed dfd or kvd: {e}')
+        metadata_end = max(index_end, dfdByteOffset + dfdByteLength,
+                           kvdByteOffset + kvdByteLength, sgdByteOffset + sgdByteLength)
+        self.check_levels(levels, metadata_end, format, info, supercompression,
+                          pixelWidth, pixelHeight, pixelDepth, layerCount, faceCount)
+        return self.problems
+
+    def check_header(self, format: Optional[VkFormat], info: Optional[FormatInfo], typeSize: int,
+                     pixelWidth: int, pixelHeight: int, pixelDepth: int,
+                     layerCount: int, faceCount: int, levelCount: int,
+                     supercompression: Optional[SupercompressionScheme]) -> None:
+        if info:
+            expected = int(info.dtype[2:]) if info.dtype else 1
+            if typeSize != expected:
+                self.error(f'typeSize {typeSize} must be {expected} for {format.name}')  # type: ignore
+        if pixelWidth == 0:
+            self.error('pixelWidth must not be 0')
+        if pixelDepth > 0 and pixelHeight == 0:
+            self.error('pixelHeight must not be 0 when pixelDepth is not 0')
+        if info and info.is_compressed and pixelHeight == 0:
+            self.error(f'pixelHeight must not be 0 for {format.name}')  # type: ignore
+        match faceCount:
+            case 1:
+                pass
+            case 6:
+                if pixelWidth != pixelHeight:
+                    self.error(f'cubemap faces must be square: {pixelWidth}x{pixelHeight}')
+                if pixelDepth != 0:
+                    self.error('cubemap pixelDepth must be 0')
+            case _:
+                self.error(f'faceCount {faceCount} must be 1 or 6')
+        max_levels = max(pixelWidth, pixelHeight, pixelDepth).bit_length()
+        if levelCount > max_levels:
+            self.error(f'levelCount {levelCount} exceeds {max_levels} for {pixelWidth}x{pixelHeight}x{pixelDepth}')
+        if levelCount == 0 and info and info.is_compressed:
+            self.error(f'levelCount must not be 0 for {format.name}')  # type: ignore
+        if supercompression == SupercompressionScheme.BasisLZ and format != VkFormat.VK_FORMAT_UNDEFINED:
+            self.error(f'BasisLZ requires VK_FORMAT_UNDEFINED, not {format.name if format else format}')
+
+    def check_sections(self, index_end: int, supercompression: Optional[SupercompressionScheme],
+                       dfdByteOffset: int, dfdByteLength: int,
+                       kvdByteOffset: int, kvdByteLength: int,
+                       sgdByteOffset: int, sgdByteLength: int) -> None:
+        if dfdByteLength == 0:
+            self.error('dfdByteLength must not be 0')
+        if dfdByteOffset != index_end:
+            self.error(f'dfdByteOffset {dfdByteOffset} must follow the level index at {index_end}')
+        if dfdByteOffset % 4:
+            self.error(f'dfdByteOffset {dfdByteOffset} is not 4 byte aligned')
+        self.check_range('dfd', dfdByteOffset, dfdByteLength)
+
+        if kvdByteLength == 0:
+            if kvdByteOffset != 0:
+                self.error(f'kvdByteOffset {kvdByteOffset} must be 0 when kvdByteLength is 0')
+        else:
+            if kvdByteOffset != dfdByteOffset + dfdByteLength:
+                self.error(f'kvdByteOffset {kvdByteOffset} must follow the dfd at {dfdByteOffset + dfdByteLength}')
+            if kvdByteOffset % 4:
+                self.error(f'kvdByteOffset {kvdByteOffset} is not 4 byte aligned')
+            self.check_range('kvd', kvdByteOffset, kvdByteLength)
+
+        if sgdByteLength == 0:
+            if sgdByteOffset != 0:
+                self.error(f'sgdByteOffset {sgdByteOffset} must be 0 when sgdByteLength is 0')
+            if supercompression == SupercompressionScheme.BasisLZ:
+                self.error('BasisLZ requires supercompression global data')
+        else:
+            if sgdByteOffset % 8:
+                self.error(f'sgdByteOffset {sgdByteOffset} is not 8 byte aligned')
+            if sgdByteOffset < max(dfdByteOffset + dfdByteLength, kvdByteOffset + kvdByteLength):
+                self.error(f'sgdByteOffset {sgdByteOffset} overlaps the dfd or the kvd')
+            if supercompression in (SupercompressionScheme.NONE, SupercompressionScheme.Zstandard,
+                                    SupercompressionScheme.ZLIB):
+                self.error(f'{supercompression.name} must not have supercompression global data')  # type: ignore
+            self.check_range('sgd', sgdByteOffset, sgdByteLength)
+
+    def check_dfd(self, dfd: bytes, format: Optional[VkFormat], info: Optional[FormatInfo],
+                  supercompression: Optional[SupercompressionScheme]) -> None:
+        if len(dfd) < 4:
+            self.error(f'dfdByteLength {len(dfd)} is smaller than dfdTotalSize')
+            return
+        dfdTotalSize = struct.unpack_from('<I', dfd)[0]
+        if dfdTotalSize != len(dfd):
+            self.error(f'dfdTotalSize {dfdTotalSize} does not match dfdByteLength {len(dfd)}')
+        pos = 4
+        first = True
+        while pos < len(dfd):
+            if pos + 8 > len(dfd):
+                self.error(f'truncated descriptor block at dfd offset {pos}')
+                return
+            vendorId_descriptorType, versionNumber, descriptorBlockSize = struct.unpack_from(
+                '<IHH', dfd, pos)
+            if descriptorBlockSize < 8 or pos + descriptorBlockSize > len(dfd):
+                self.error(f'descriptorBlockSize {descriptorBlockSize} at dfd offset {pos} is out of the dfd')
+                return
+            if first:
+                if vendorId_descriptorType != 0:
+                    self.error('the first descriptor block is not the khronos basic descriptor block')
+                else:
+                    self.check_basic_dfd(dfd[pos:pos + descriptorBlockSize], versionNumber,
+                                         format, info, supercompression)
+            first = False
+            pos += descriptorBlockSize
+
+    def check_basic_dfd(self, block: bytes, versionNumber: int, format: Optional[VkFormat],
+                        info: Optional[FormatInfo], supercompression: Optional[SupercompressionScheme]) -> None:
+        if versionNumber != 2:
+            self.error(f'basic descriptor versionNumber {versionNumber} must be 2 (KDF 1.3)')
+        if len(block) < 24 or (len(block) - 24) % 16:
+            self.error(f'basic descriptorBlockSize {len(block)} is not 24 + 16 * samples')
+            return
+        colorModel, _, transferFunction, _ = block[8:12]
+        texelBlockDimension = tuple(d + 1 for d in block[12:16])
+        bytesPlane = block[16:24]
+        if not format or format == VkFormat.VK_FORMAT_UNDEFINED:
+            return
+
+        expected_model = _expected_color_model(format)
+        if expected_model and colorModel != expected_model.value:
+            self.error(f'dfd colorModel {colorModel} must be {expected_model.name} for {format.name}')
+        is_srgb = transferFunction == TransferFunction.KHR_DF_TRANSFER_SRGB.value
+        if ('_SRGB' in format.name) != is_srgb:
+            self.error(f'dfd transferFunction {transferFunction} does not match {format.name}')
+        if info:
+            expected_dimension = (info.blockWidth, info.blockHeight, info.blockDepth, 1)
+            if texelBlockDimension[:3] != expected_dimension[:3]:
+                self.error(f'dfd texelBlockDimension {texelBlockDimension[:3]} must be '
+                           f'{expected_dimension[:3]} for {format.name}')
+            expected_bytes = info.blockBytes if supercompression == SupercompressionScheme.NONE else 0
+            if bytesPlane[0] != expected_bytes:
+                self.error(f'dfd bytesPlane0 {bytesPlane[0]} must be {expected_bytes}')
+        if any(bytesPlane[1:]):
+            self.error('dfd bytesPlane1-7 must be 0 for a non planar format')
+
+    def check_kvd(self, kvd: bytes) -> None:
+        pos = 0
+        previous: Optional[bytes] = None
+        while pos < len(kvd):
+            if pos + 4 > len(kvd):
+                self.error(f'truncated keyAndValueByteLength at kvd offset {pos}')
+                return
+            length = struct.unpack_from('<I', kvd, pos)[0]
+            start = pos + 4
+            end = start + length
+            if end > len(kvd):
+                self.error(f'key/value at kvd offset {pos} exceeds the kvd')
+                return
+            entry = kvd[start:end]
+            nul = entry.find(0)
+            if nul <= 0:
+                self.error(f'key/value at kvd offset {pos} has no NUL terminated key')
+            else:
+                key = entry[:nul]
+                try:
+                    name = key.decode('utf-8')
+                except UnicodeDecodeError:
+                    self.error(f'key at kvd offset {pos} is not utf-8')
+                    name = ''
+                if previous is not None:
+                    if key == previous:
+                        self.error(f'duplicated key {name}')
+                    elif key < previous:
+                        self.error(f'key {name} is not sorted')
+                previous = key
+                if name.lower().startswith('ktx') and name not in KNOWN_KEYS:
+                    self.warning(f'unknown reserved key {name}')
+                if name in ('KTXorientation', 'KTXwriter', 'KTXwriterScParams', 'KTXswizzle',
+                            'KTXastcDecodeMode') and not entry.endswith(b'\0'):
+                    self.error(f'{name} value must be NUL terminated')
+            padding = -end % 4
+            if end + padding > len(kvd):
+                self.error(f'key/value at kvd offset {pos} is not padded to 4 bytes')
+            elif any(kvd[end:end + padding]):
+                self.error(f'padding after key/value at kvd offset {pos} is not 0')
+            pos = end + padding
+
+    def check_levels(self, levels: List[Tuple[int, int, int]], metadata_end: int,
+                     format: Optional[VkFormat], info: Optional[FormatInfo],
+                     supercompression: Optional[SupercompressionScheme],
+                     pixelWidth: int, pixelHeight: int, pixelDepth: int,
+                     layerCount: int, faceCount: int) -> None:
+        alignment = 1
+        if supercompression == SupercompressionScheme.NONE and info:
+            alignment = math.lcm(info.blockBytes, 4)
+
+        for i, (byteOffset, byteLength, uncompressedByteLength) in enumerate(levels):
+            name = f'level {i}'
+            if byteOffset < metadata_end:
+                self.error(f'{name} byteOffset {byteOffset} overlaps the metadata ending at {metadata_end}')
+            if byteOffset % alignment:
+                self.error(f'{name} byteOffset {byteOffset} is not {alignment} byte aligned')
+            self.check_range(name, byteOffset, byteLength)
+
+            expected = None
+            if info and pixelWidth:
+                width, height, depth = get_level_extent(pixelWidth, pixelHeight, pixelDepth, i)
+                expected = get_image_size(info, width, height, depth) * max(1, layerCount) * faceCount
+            match supercompression:
+                case SupercompressionScheme.NONE:
+                    if byteLength != uncompressedByteLength:
+                        self.error(f'{name} byteLength {byteLength} must equal '
+                                   f'uncompressedByteLength {uncompressedByteLength}')
+                    if expected is not None and byteLength != expected:
+                        self.error(f'{name} byteLength {byteLength} must be {expected}')
+                case SupercompressionScheme.Zstandard | SupercompressionScheme.ZLIB:
+                    if expected is not None and uncompressedByteLength != expected:
+                        self.error(f'{name} uncompressedByteLength {uncompressedByteLength} must be {expected}')
+                    self.check_level_stream(name, supercompression, byteOffset, byteLength)
+                case SupercompressionScheme.BasisLZ:
+                    if uncompressedByteLength != 0:
+                        self.error(f'{name} uncompressedByteLength must be 0 for BasisLZ')
+
+        # the smallest level comes first. levels must not overlap
+        for i in range(len(levels) - 1):
+            if levels[i][0] <= levels[i + 1][0]:
+                self.error(f'level {i + 1} must be stored before level {i}')
+        ordered = sorted(levels)
+        for (offset, length, _), (next_offset, _, _) in zip(ordered, ordered[1:]):
+            if offset + length > next_offset:
+                self.error(f'level data [{offset}, {offset + length}) overlaps the level at {next_offset}')
+        if ordered:
+            last_offset, last_length, _ = ordered[-1]
+            if last_offset + last_length < self.file_size:
+                self.warning(f'{self.file_size - last_offset - last_length} bytes after the last level')
+
+    def check_level_stream(self, name: str, supercompression: SupercompressionScheme,
+                           byteOffset: int, byteLength: int) -> None:
+        if byteLength < SAMPLE_SIZE or byteOffset + byteLength > self.file_size:
+            return
+        head = read_at(self.f, byteOffset, SAMPLE_SIZE)
+        if supercompression == SupercompressionScheme.Zstandard:
+            if head != ZSTD_MAGIC:
+                self.error(f'{name} does not start with a zstandard frame')
+        elif (head[0] & 0x0F) != 8 or ((head[0] << 8) | head[1]) % 31:
+            self.error(f'{name} does not start with a zlib header')
+
+
+def _get_file_size(f: BinaryIO) -> int:
+    try:
+        return os.fstat(f.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return f.seek(0, os.SEEK_END)
+
+
+def validate_file(f: BinaryIO) -> List[Problem]:
+    try:
+        return _Validator(f, _get_file_size(f)).run()
+    except KtxError as e:
+        return [Problem(ERROR, str(e))]
+
+
+def validate_path(path: pathlib.Path) -> List[Problem]:
+    with path.open('rb') as f:
+        return validate_file(f)
+
+
+def _validate(path: pathlib.Path) -> Tuple[pathlib.Path, List[Problem]]:
+    try:
+        return path, validate_path(path)
+    except OSError as e:
+        return path, [Problem(ERROR, str(e))]
+
+
+def iter_paths(paths: Iterable[pathlib.Path]) -> Iterator[pathlib.Path]:
+    '''
+    directories are searched recursively for *.ktx2.
+    '''
+    for path in paths:
+        if path.is_dir():
+            yield from sorted(path.rglob('*.ktx2'))
+        else:
+            yield path
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='validate ktx2 files')
+    parser.add_argument('paths', nargs='+', type=pathlib.Path, help='files or directories')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--warnings-as-errors', action='store_true')
+    parser.add_argument('--quiet', action='store_true', help='print only files with problems')
+    args = parser.parse_args(argv)
+
+    paths = list(iter_paths(args.paths))
+    if args.jobs > 1 and len(paths) > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(args.jobs)
+        results = executor.map(_validate, paths, chunksize=max(1, min(256, len(paths) // (args.jobs * 4))))
+    else:
+        executor = None
+        results = map(_validate, paths)
+
+    failed = 0
+    try:
+        for path, problems in results:
+            fatal = [p for p in problems
+                     if p.severity == ERROR or args.warnings_as_errors]
+            if fatal:
+                failed += 1
+            if problems:
+                for problem in problems:
+                    print(f'{path}: {problem}')
+            elif not args.quiet:
+                print(f'{path}: ok')
+    finally:
+        if executor:
+            executor.shutdown()
+
+    print(f'{len(paths)} files, {failed} failed', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
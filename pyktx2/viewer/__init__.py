@@ -1,5 +1,15 @@
+'''
+Qt is imported by run() or by the first access to ImageViewer.
+'''
 import pathlib
-from .image_viewer import ImageViewer
+from typing import Any
+
+
+def __getattr__(name: str) -> Any:
+    if name == 'ImageViewer':
+        from .image_viewer import ImageViewer
+        return ImageViewer
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def run():
@@ -7,12 +17,14 @@ def run():
     from argparse import ArgumentParser, RawTextHelpFormatter
     import sys
     from PySide6.QtWidgets import (QApplication)
+    from .image_viewer import ImageViewer
     import logging
     logging.basicConfig(level=logging.DEBUG)
 
     arg_parser = ArgumentParser(description="Image Viewer",
                                 formatter_class=RawTextHelpFormatter)
-    arg_parser.add_argument('file', type=str, nargs='?', help='Image file')
+    arg_parser.add_argument('file', type=str, nargs='?',
+                            help='Image file or a directory to browse')
     args = arg_parser.parse_args()
 
     app = QApplication(sys.argv)
@@ -20,7 +32,10 @@ def run():
 
     if args.file:
         path = pathlib.Path(args.file)
-        image_viewer.load_file(path)
+        if path.is_dir():
+            image_viewer.open_directory(path)
+        else:
+            image_viewer.load_file(path)
 
     image_viewer.show()
     sys.exit(app.exec())
@@ -0,0 +1,148 @@
+'''
+grid of thumbnails for the ktx2 files in a directory.
+
+thumbnails are requested only for the items the view paints and are produced
+on a dedicated QThreadPool through the on disk ThumbnailCache.
+'''
+import os
+import pathlib
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from PySide6 import QtWidgets, QtGui, QtCore
+from pyktx2.thumbnail import ThumbnailCache, THUMBNAIL_SIZE
+import logging
+logger = logging.getLogger()
+
+# decoded thumbnails kept in memory
+PIXMAP_COUNT = 4096
+
+
+class ThumbnailSignals(QtCore.QObject):
+    # generation, row, png bytes
+    done = QtCore.Signal(int, int, bytes)
+    failed = QtCore.Signal(int, int, str)
+
+
+class ThumbnailTask(QtCore.QRunnable):
+    def __init__(self, cache: ThumbnailCache, path: pathlib.Path, generation: int, row: int,
+                 signals: ThumbnailSignals) -> None:
+        super().__init__()
+        self.cache = cache
+        self.path = path
+        self.generation = generation
+        self.row = row
+        self.signals = signals
+
+    def run(self) -> None:
+        try:
+            png = self.cache.get_or_create(self.path)
+            self.signals.done.emit(self.generation, self.row, png)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, self.row, f'{self.path}: {e}')
+
+
+def list_ktx2(directory: pathlib.Path) -> List[pathlib.Path]:
+    with os.scandir(directory) as it:
+        return sorted(pathlib.Path(e.path) for e in it
+                      if e.is_file() and e.name.lower().endswith('.ktx2'))
+
+
+class ThumbnailModel(QtCore.QAbstractListModel):
+    def __init__(self, cache: ThumbnailCache, parent=None) -> None:
+        super().__init__(parent)
+        self.cache = cache
+        self.paths: List[pathlib.Path] = []
+        self._generation = 0
+        self._pixmaps: OrderedDict[int, QtGui.QPixmap] = OrderedDict()
+        self._requested: Dict[int, bool] = {}
+        self._pool = QtCore.QThreadPool(self)
+        self._signals = ThumbnailSignals()
+        self._signals.done.connect(self._on_done)  # type: ignore
+        self._signals.failed.connect(self._on_failed)  # type: ignore
+        self._placeholder = QtGui.QPixmap(cache.size, cache.size)
+        self._placeholder.fill(QtCore.Qt.transparent)
+
+    def set_directory(self, directory: pathlib.Path) -> None:
+        self.beginResetModel()
+        self._pool.clear()
+        self._generation += 1
+        self.paths = list_ktx2(directory)
+        self._pixmaps.clear()
+        self._requested.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        match role:
+            case QtCore.Qt.DisplayRole:
+                return self.paths[row].name
+            case QtCore.Qt.ToolTipRole:
+                return str(self.paths[row])
+            case QtCore.Qt.DecorationRole:
+                pixmap = self._pixmaps.get(row)
+                if pixmap is not None:
+                    self._pixmaps.move_to_end(row)
+                    return pixmap
+                self._request(row)
+                return self._placeholder
+        return None
+
+    def _request(self, row: int) -> None:
+        if row in self._requested:
+            return
+        self._requested[row] = True
+        self._pool.start(ThumbnailTask(self.cache, self.paths[row],
+                                       self._generation, row, self._signals))
+
+    @ QtCore.Slot(int, int, bytes)  # type: ignore
+    def _on_done(self, generation: int, row: int, png: bytes):
+        if generation != self._generation:
+            return
+        self._requested.pop(row, None)
+        self._pixmaps[row] = QtGui.QPixmap.fromImage(
+            QtGui.QImage.fromData(png, 'PNG'))
+        while len(self._pixmaps) > PIXMAP_COUNT:
+            self._pixmaps.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+    @ QtCore.Slot(int, int, str)  # type: ignore
+    def _on_failed(self, generation: int, row: int, message: str):
+        if generation != self._generation:
+            return
+        # keep it in _requested, so that a broken file is not retried
+        logger.error(message)
+
+
+class ThumbnailBrowser(QtWidgets.QListView):
+    '''
+    opened emits the path of an activated thumbnail.
+    '''
+    opened = QtCore.Signal(object)
+
+    def __init__(self, parent=None, cache: Optional[ThumbnailCache] = None) -> None:
+        super().__init__(parent)
+        self.thumbnails = ThumbnailModel(cache or ThumbnailCache(), self)
+        self.setModel(self.thumbnails)
+        self.setViewMode(QtWidgets.QListView.IconMode)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QtWidgets.QListView.Batched)
+        self.setIconSize(QtCore.QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.setGridSize(QtCore.QSize(THUMBNAIL_SIZE + 24, THUMBNAIL_SIZE + 32))
+        self.activated.connect(self._on_activated)  # type: ignore
+
+    def set_directory(self, directory: pathlib.Path) -> None:
+        self.thumbnails.set_directory(directory)
+
+    @ QtCore.Slot(QtCore.QModelIndex)  # type: ignore
+    def _on_activated(self, index: QtCore.QModelIndex):
+        self.opened.emit(self.thumbnails.paths[index.row()])
@@ -0,0 +1,296 @@
+'''
+zoomable and pannable view of one layer/face/depth slice.
+
+the mip level matching the zoom is split into tiles. only the visible tiles
+are decoded, in the background, and kept in a cache bounded by bytes.
+a supercompressed level is decompressed once for all of its tiles.
+a missing tile is drawn from a coarser level until it arrives.
+'''
+import math
+import pathlib
+from collections import OrderedDict
+from typing import Optional, Dict, Set, Tuple
+from PySide6 import QtWidgets, QtGui, QtCore
+import pyktx2.parser
+from pyktx2.formats import get_level_extent
+from .loader import TileTask, LevelCache
+import logging
+logger = logging.getLogger()
+
+TILE_SIZE = 256
+CACHE_BYTES = 256 * 1024 * 1024
+LEVEL_CACHE_BYTES = 256 * 1024 * 1024
+
+# generation, level, tile x, tile y
+TileKey = Tuple[int, int, int, int]
+
+
+class TileCache:
+    '''
+    LRU of QImage bounded by the total of sizeInBytes().
+    '''
+
+    def __init__(self, budget: int) -> None:
+        self.budget = budget
+        self.size = 0
+        self._tiles: OrderedDict[TileKey, QtGui.QImage] = OrderedDict()
+
+    def get(self, key: TileKey) -> Optional[QtGui.QImage]:
+        image = self._tiles.get(key)
+        if image is not None:
+            self._tiles.move_to_end(key)
+        return image
+
+    def put(self, key: TileKey, image: QtGui.QImage) -> None:
+        old = self._tiles.pop(key, None)
+        if old is not None:
+            self.size -= old.sizeInBytes()
+        self._tiles[key] = image
+        self.size += image.sizeInBytes()
+        while self.size > self.budget and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self.size -= evicted.sizeInBytes()
+
+    def clear(self) -> None:
+        self._tiles.clear()
+        self.size = 0
+
+
+class TiledCanvas(QtWidgets.QWidget):
+    def __init__(self, parent=None, cache_bytes: int = CACHE_BYTES,
+                 level_cache_bytes: int = LEVEL_CACHE_BYTES):
+        super().__init__(parent)
+        self.setBackgroundRole(QtGui.QPalette.Base)
+        self.setAutoFillBackground(True)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Ignored,
+                           QtWidgets.QSizePolicy.Ignored)
+        self.setMouseTracking(False)
+        self._cache = TileCache(cache_bytes)
+        self._levels = LevelCache(level_cache_bytes)
+        self._pending: Dict[TileKey, TileTask] = {}
+        # not requested again until the generation changes
+        self._failed: Set[TileKey] = set()
+        self._generation = 0
+        self._path: Optional[pathlib.Path] = None
+        self._header: Optional[pyktx2.parser.Ktx2Header] = None
+        self._subresource = (0, 0, 0)
+        # screen pixels per base level texel
+        self._zoom = 1.0
+        # base level texel at the top left corner of the widget
+        self._origin = QtCore.QPointF(0, 0)
+        self._drag: Optional[QtCore.QPointF] = None
+
+    def clear(self) -> None:
+        self._next_generation()
+        self._cache.clear()
+        self._levels.clear()
+        self._path = None
+        self._header = None
+        self.update()
+
+    def set_source(self, path: pathlib.Path, header: pyktx2.parser.Ktx2Header,
+                   layer: int = 0, face: int = 0, depth: int = 0) -> None:
+        if path != self._path or header != self._header:
+            self.clear()
+            self._path = path
+            self._header = header
+            self._subresource = (layer, face, depth)
+            self.fit()
+            return
+        if (layer, face, depth) != self._subresource:
+            self._next_generation()
+            self._subresource = (layer, face, depth)
+            self.update()
+
+    def fit(self) -> None:
+        if not self._header:
+            return
+        width, height = self._header.pixelWidth, max(
+            1, self._header.pixelHeight)
+        self._zoom = min(self.width() / width, self.height() / height) or 1.0
+        self._origin = QtCore.QPointF(
+            (width - self.width() / self._zoom) / 2,
+            (height - self.height() / self._zoom) / 2)
+        self.update()
+
+    def show_level(self, level: int) -> None:
+        '''
+        zoom so that level is displayed 1:1, keeping the center.
+        '''
+        self._zoom_at(1 / (1 << level), QtCore.QPointF(self.width() / 2, self.height() / 2))
+
+    def level_for_zoom(self) -> int:
+        assert self._header
+        level = int(math.floor(math.log2(1 / self._zoom))
+                    ) if self._zoom < 1 else 0
+        return max(0, min(level, len(self._header.levelIndices) - 1))
+
+    def _cancel_pending(self) -> None:
+        pool = QtCore.QThreadPool.globalInstance()
+        for key, task in list(self._pending.items()):
+            if pool.tryTake(task):
+                del self._pending[key]
+                # finished is never emitted for a task that did not run
+                task.signals.deleteLater()
+
+    def _next_generation(self) -> None:
+        self._cancel_pending()
+        self._generation += 1
+        self._failed.clear()
+
+    def _level_tiles(self, level: int) -> Tuple[int, int, int, int]:
+        '''
+        level width, height and number of tiles.
+        '''
+        assert self._header
+        width, height, _ = get_level_extent(self._header.pixelWidth, self._header.pixelHeight,
+                                            self._header.pixelDepth, level)
+        return (width, height,
+                (width + TILE_SIZE - 1) // TILE_SIZE,
+                (height + TILE_SIZE - 1) // TILE_SIZE)
+
+    def _tile_rect(self, level: int, tx: int, ty: int) -> QtCore.QRectF:
+        '''
+        the tile in base level texels.
+        '''
+        assert self._header
+        width, height, _, _ = self._level_tiles(level)
+        sx = self._header.pixelWidth / width
+        sy = max(1, self._header.pixelHeight) / height
+        x = tx * TILE_SIZE
+        y = ty * TILE_SIZE
+        w = min(TILE_SIZE, width - x)
+        h = min(TILE_SIZE, height - y)
+        return QtCore.QRectF(x * sx, y * sy, w * sx, h * sy)
+
+    def _visible_tiles(self, level: int):
+        assert self._header
+        width, height, tiles_x, tiles_y = self._level_tiles(level)
+        sx = self._header.pixelWidth / width
+        sy = max(1, self._header.pixelHeight) / height
+        left = self._origin.x()
+        top = self._origin.y()
+        right = left + self.width() / self._zoom
+        bottom = top + self.height() / self._zoom
+        tx0 = max(0, int(left / sx) // TILE_SIZE)
+        ty0 = max(0, int(top / sy) // TILE_SIZE)
+        tx1 = min(tiles_x, int(math.ceil(right / sx)) // TILE_SIZE + 1)
+        ty1 = min(tiles_y, int(math.ceil(bottom / sy)) // TILE_SIZE + 1)
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                yield tx, ty
+
+    def _request(self, level: int, tx: int, ty: int) -> None:
+        assert self._path and self._header
+        key = (self._generation, level, tx, ty)
+        if key in self._pending or key in self._failed or self._cache.get(key) is not None:
+            return
+        width, height, _, _ = self._level_tiles(level)
+        x = tx * TILE_SIZE
+        y = ty * TILE_SIZE
+        task = TileTask(self._path, self._header, key, level, self._subresource,
+                        (x, y, min(TILE_SIZE, width - x), min(TILE_SIZE, height - y)), self._levels)
+        task.signals.tile.connect(self._on_tile)  # type: ignore
+        task.signals.failed.connect(self._on_failed)  # type: ignore
+        task.signals.finished.connect(self._on_finished)  # type: ignore
+        self._pending[key] = task
+        # coarser levels first
+        QtCore.QThreadPool.globalInstance().start(task, level)
+
+    @ QtCore.Slot(object, object)  # type: ignore
+    def _on_tile(self, key: TileKey, image: QtGui.QImage):
+        if key[0] != self._generation:
+            return
+        self._cache.put(key, image)
+        self.update()
+
+    @ QtCore.Slot(object, str)  # type: ignore
+    def _on_failed(self, key: TileKey, message: str):
+        if key[0] == self._generation:
+            self._failed.add(key)
+            logger.error(message)
+
+    @ QtCore.Slot(object)  # type: ignore
+    def _on_finished(self, key: TileKey):
+        task = self._pending.pop(key, None)
+        if task:
+            task.signals.deleteLater()
+
+    def _find_fallback(self, level: int, rect: QtCore.QRectF):
+        '''
+        a cached tile of a coarser level that covers rect.
+        '''
+        assert self._header
+        for coarse in range(level + 1, len(self._header.levelIndices)):
+            width, height, _, _ = self._level_tiles(coarse)
+            sx = self._header.pixelWidth / width
+            sy = max(1, self._header.pixelHeight) / height
+            tx = int(rect.center().x() / sx) // TILE_SIZE
+            ty = int(rect.center().y() / sy) // TILE_SIZE
+            image = self._cache.get((self._generation, coarse, tx, ty))
+            if image is not None:
+                return self._tile_rect(coarse, tx, ty), image
+        return None
+
+    def paintEvent(self, event) -> None:
+        if not self._header:
+            return
+        level = self.level_for_zoom()
+        smallest = len(self._header.levelIndices) - 1
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform, self._zoom < 1)
+        painter.scale(self._zoom, self._zoom)
+        painter.translate(-self._origin)
+
+        # the smallest level is a placeholder for everything
+        for tx, ty in self._visible_tiles(smallest):
+            self._request(smallest, tx, ty)
+        for tx, ty in self._visible_tiles(level):
+            rect = self._tile_rect(level, tx, ty)
+            image = self._cache.get((self._generation, level, tx, ty))
+            if image is None:
+                self._request(level, tx, ty)
+                fallback = self._find_fallback(level, rect)
+                if fallback:
+                    source_rect, source = fallback
+                    # crop the coarse tile to this tile
+                    scale_x = source.width() / source_rect.width()
+                    scale_y = source.height() / source_rect.height()
+                    crop = QtCore.QRectF((rect.x() - source_rect.x()) * scale_x,
+                                         (rect.y() - source_rect.y()) * scale_y,
+                                         rect.width() * scale_x, rect.height() * scale_y)
+                    painter.drawImage(rect, source, crop)
+                continue
+            painter.drawImage(rect, image)
+        painter.end()
+
+    def _zoom_at(self, zoom: float, anchor: QtCore.QPointF) -> None:
+        '''
+        keep the texel under anchor (widget coordinates) in place.
+        '''
+        zoom = max(1 / 65536, min(zoom, 64.0))
+        texel = self._origin + anchor / self._zoom
+        self._zoom = zoom
+        self._origin = texel - anchor / self._zoom
+        self.update()
+
+    def wheelEvent(self, event: QtGui.QWheelEvent) -> None:
+        steps = event.angleDelta().y() / 120
+        self._zoom_at(self._zoom * math.pow(1.25, steps), event.position())
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:
+        if event.button() == QtCore.Qt.LeftButton:
+            self._drag = event.position()
+
+    def mouseMoveEvent(self, event: QtGui.QMouseEvent) -> None:
+        if self._drag is not None:
+            delta = event.position() - self._drag
+            self._drag = event.position()
+            self._origin -= delta / self._zoom
+            self.update()
+
+    def mouseReleaseEvent(self, event: QtGui.QMouseEvent) -> None:
+        self._drag = None
+
+    def mouseDoubleClickEvent(self, event: QtGui.QMouseEvent) -> None:
+        self.fit()
@@ -1,119 +1,154 @@
 import pathlib
-from typing import NamedTuple, Tuple, Dict, List, Any
+from typing import Tuple, Dict, List, Any, Optional, Callable
 from PySide6 import QtWidgets, QtGui, QtCore
 import pyktx2.parser
+from pyktx2.formats import get_level_extent
+from .loader import LoadTask
+from .canvas import TiledCanvas
+from .browser import ThumbnailBrowser
 import logging
 logger = logging.getLogger()
 
+# rows added by one fetchMore
+FETCH_SIZE = 256
+
+
+class Node:
+    '''
+    children are created by make_child on first access.
+    '''
+
+    def __init__(self, data: Tuple[str, Any], parent: Optional['Node'] = None, row: int = 0,
+                 child_count: int = 0, make_child: Optional[Callable[['Node', int], 'Node']] = None):
+        self.data = data
+        self.parent = parent
+        self.row = row
+        self.child_count = child_count
+        self.make_child = make_child
+        self.fetched = min(child_count, FETCH_SIZE)
+        self._children: Dict[int, Node] = {}
+
+    def child(self, row: int) -> 'Node':
+        node = self._children.get(row)
+        if not node:
+            assert self.make_child
+            node = self.make_child(self, row)
+            self._children[row] = node
+        return node
+
+    def get_path(self) -> List['Node']:
+        '''
+        ancestors from the root. O(depth)
+        '''
+        path = []
+        node = self.parent
+        while node:
+            path.append(node)
+            node = node.parent
+        path.reverse()
+        return path
 
-class Node(NamedTuple):
-    unique_key: int
-    data: Tuple[str, Any]
-    children: Tuple['Node', ...]
 
+def leaf(key: str, value: Any) -> Callable[[Node, int], Node]:
+    return lambda parent, row: Node((key, value), parent, row)
 
-NODE_ID = 1
 
+def branch(key: str, value: Any, children: List[Callable[[Node, int], Node]]) -> Callable[[Node, int], Node]:
+    return lambda parent, row: Node((key, value), parent, row, len(children),
+                                    lambda node, i: children[i](node, i))
 
-def get_id():
-    global NODE_ID
-    id = NODE_ID
-    NODE_ID += 1
-    return id
+
+def sequence(key: str, value: Any, count: int, make_child: Callable[[Node, int], Node]) -> Callable[[Node, int], Node]:
+    return lambda parent, row: Node((key, value), parent, row, count, make_child)
 
 
 class Ktx2Model(QtCore.QAbstractItemModel):
     def __init__(self, path: pathlib.Path, ktx2: pyktx2.parser.Ktx2, parent=None):
         super().__init__(parent)
         self.ktx2 = ktx2
-
-        def level_index_node(i, level_index: pyktx2.parser.LevelIndex) -> Node:
-            return Node(get_id(), ('level', i), (
-                Node(get_id(), ('byteOffset', level_index.byteOffset), ()),
-                Node(get_id(), ('byteLength', level_index.byteLength), ()),
-                Node(get_id(), ('uncompressedByteLength',
-                                level_index.uncompressedByteLength), ()),
-            ))
-
-        def dfd_node(dfd: pyktx2.parser.DFDBasicFlags, samples):
-            return Node(get_id(), ('dfd', ''), tuple((
-                Node(get_id(), ('colorModel', dfd.colorModel.name), ()),
-                Node(get_id(), ('colorPrimaries', dfd.colorPrimaries.name), ()),
-                Node(get_id(), ('transferFunction', dfd.transferFunction.name), ()),
-            )))
-
-        def depth_image_node(level: int, layer: int, face: int, depth: int) -> Node:
-            return Node(get_id(), ('depth', depth), tuple(
-
-            ))
-
-        def face_image_node(level: int, layer: int, face: int) -> Node:
-            depth_count = ktx2.pixelDepth
-            if depth_count == 0:
-                depth_count = 1
-            return Node(get_id(), ('face', face), tuple(
-                depth_image_node(level, layer, face, depth) for depth in range(depth_count)
-            ))
-
-        def layer_image_node(level: int, layer: int) -> Node:
-            face_count = ktx2.faceCount
-            return Node(get_id(), ('layer', layer), tuple(
-                face_image_node(level, layer, face) for face in range(face_count)
-            ))
-
-        def level_image_node(level: int):
-            layer_count = ktx2.layerCount
-            if layer_count == 0:
-                layer_count = 1
-            return Node(get_id(), ('level', level), tuple(
-                layer_image_node(level, layer) for layer in range(layer_count)
-            ))
-
-        self. root = Node(get_id(), ('__root__', ''), (
-            Node(get_id(), ('vkFormat', ktx2.vkFormat.name), ()),
-            Node(get_id(), ('typeSize', ktx2.typeSize), ()),
-            Node(get_id(), ('pixelWidth', ktx2.pixelWidth), ()),
-            Node(get_id(), ('pixelHeight', ktx2.pixelHeight), ()),
-            Node(get_id(), ('pixelDepth', ktx2.pixelDepth), ()),
-            Node(get_id(), ('layerCount', ktx2.layerCount), ()),
-            Node(get_id(), ('faceCount', ktx2.faceCount), ()),
-            Node(get_id(), ('levelCount', ktx2.levelCount), ()),
-            Node(get_id(), ('supercompressionScheme',
-                 ktx2.supercompressionScheme.name), ()),
-
-            Node(get_id(), ('dfdByteOffset', ktx2.dfdByteOffset), ()),
-            Node(get_id(), ('dfdByteLength', ktx2.dfdByteLength), ()),
-            Node(get_id(), ('kvdByteOffset', ktx2.kvdByteOffset), ()),
-            Node(get_id(), ('kvdByteLength', ktx2.kvdByteLength), ()),
-            Node(get_id(), ('sgdByteOffset', ktx2.sgdByteOffset), ()),
-            Node(get_id(), ('sgdByteLength', ktx2.sgdByteLength), ()),
-
-            Node(get_id(), ('levelIndices', len(ktx2.levelIndices)), tuple(
-                level_index_node(i, level) for i, level in enumerate(ktx2.levelIndices)
-            )),
+        # rows are being inserted by fetchMore
+        self._fetching = False
+
+        layer_count = max(1, ktx2.layerCount)
+        face_count = ktx2.faceCount
+        # values are read when their rows are created
+        kv_keys = list(ktx2.kv)
+        samples = ktx2.dfd.samples
+
+        def level_index_node(parent: Node, i: int) -> Node:
+            level_index = ktx2.levelIndices[i]
+            return branch('level', i, [
+                leaf('byteOffset', level_index.byteOffset),
+                leaf('byteLength', level_index.byteLength),
+                leaf('uncompressedByteLength',
+                     level_index.uncompressedByteLength),
+            ])(parent, i)
+
+        def sample_node(parent: Node, i: int) -> Node:
+            sample = samples[i]
+            return branch('sample', i, [leaf(name, sample[name].tolist())
+                                        for name in sample.dtype.names])(parent, i)
+
+        def dfd_node(dfd: Optional[pyktx2.parser.DFDBasicFlags], samples):
+            if dfd is None:
+                return leaf('dfd', 'no basic descriptor block')
+            return branch('dfd', '', [
+                leaf('colorModel', dfd.colorModel.name),
+                leaf('colorPrimaries', dfd.colorPrimaries.name),
+                leaf('transferFunction', dfd.transferFunction.name),
+                sequence('samples', len(samples), len(samples), sample_node),
+            ])
+
+        def depth_image_node(parent: Node, depth: int) -> Node:
+            return Node(('depth', depth), parent, depth)
+
+        def face_image_node(parent: Node, face: int) -> Node:
+            level = parent.parent.data[1]  # type: ignore
+            depth_count = get_level_extent(
+                ktx2.pixelWidth, ktx2.pixelHeight, ktx2.pixelDepth, level)[2]
+            return Node(('face', face), parent, face, depth_count, depth_image_node)
+
+        def layer_image_node(parent: Node, layer: int) -> Node:
+            return Node(('layer', layer), parent, layer, face_count, face_image_node)
+
+        def level_image_node(parent: Node, level: int) -> Node:
+            return Node(('level', level), parent, level, layer_count, layer_image_node)
+
+        self.root = branch('__root__', '', [
+            leaf('vkFormat', ktx2.vkFormat.name),
+            leaf('typeSize', ktx2.typeSize),
+            leaf('pixelWidth', ktx2.pixelWidth),
+            leaf('pixelHeight', ktx2.pixelHeight),
+            leaf('pixelDepth', ktx2.pixelDepth),
+            leaf('layerCount', ktx2.layerCount),
+            leaf('faceCount', ktx2.faceCount),
+            leaf('levelCount', ktx2.levelCount),
+            leaf('supercompressionScheme', ktx2.supercompressionScheme.name),
+
+            leaf('dfdByteOffset', ktx2.dfdByteOffset),
+            leaf('dfdByteLength', ktx2.dfdByteLength),
+            leaf('kvdByteOffset', ktx2.kvdByteOffset),
+            leaf('kvdByteLength', ktx2.kvdByteLength),
+            leaf('sgdByteOffset', ktx2.sgdByteOffset),
+            leaf('sgdByteLength', ktx2.sgdByteLength),
+
+            sequence('levelIndices', len(ktx2.levelIndices),
+                     len(ktx2.levelIndices), level_index_node),
 
             dfd_node(*ktx2.dfd),
 
-            Node(get_id(), ('kv', len(ktx2.kv)), tuple(
-                Node(get_id(), (k, v), ()) for k, v in ktx2.kv.items()
-            )),
-            Node(get_id(), ('supercompressionGlobalData',
-                            len(ktx2.supercompressionGlobalData)), ()),
-            Node(get_id(), ('levelImages', len(ktx2.levelImages)), tuple(
-                level_image_node(level) for level in range(max(1, ktx2.levelCount))
-            )),
-        ))
-
-        self.map: Dict[Node, Tuple[int, Node]] = {
-        }
-        row = [1]
-
-        def build_map(node: Node):
-            for child in node.children:
-                self.map[child] = (row[0], node)
-                row[0] += 1
-                build_map(child)
-        build_map(self.root)
+            sequence('kv', len(kv_keys), len(kv_keys),
+                     lambda parent, i: Node((kv_keys[i], ktx2.kv[kv_keys[i]]), parent, i)),
+            leaf('supercompressionGlobalData',
+                 len(ktx2.supercompressionGlobalData)),
+            sequence('levelImages', len(ktx2.levelIndices),
+                     len(ktx2.levelIndices), level_image_node),
+        ])(None, 0)
+
+    def _node(self, index: QtCore.QModelIndex) -> Node:
+        if not index.isValid():
+            return self.root
+        return index.internalPointer()  # type: ignore
 
     def columnCount(self, parent: QtCore.QModelIndex) -> int:
         return 2
@@ -131,44 +166,56 @@ class Ktx2Model(QtCore.QAbstractItemModel):
                 return ('name', 'value')[section]
 
     def index(self, row: int, column: int, parent: QtCore.QModelIndex) -> QtCore.QModelIndex:
+        parentItem = self._node(parent)
+        if not 0 <= row < parentItem.fetched:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, parentItem.child(row))
 
-        if not parent.isValid():
-            parentItem = self.root
-        else:
-            parentItem: Node = parent.internalPointer()  # type: ignore
-        childItem = parentItem.children[row]
-        return self.createIndex(row, column, childItem)
-
-    def parent(self, index: QtCore.QModelIndex) -> QtCore.QModelIndex:
+    def parent(self, index: QtCore.QModelIndex) -> QtCore.QModelIndex:  # type: ignore
         if not index.isValid():
             return QtCore.QModelIndex()
         childItem: Node = index.internalPointer()  # type: ignore
-        if childItem == self.root:
+        parentItem = childItem.parent
+        if not parentItem or parentItem == self.root:
             return QtCore.QModelIndex()
-        row, parentItem = self.map[childItem]
-        return self.createIndex(row, 0, parentItem)
+        return self.createIndex(parentItem.row, 0, parentItem)
 
     def rowCount(self, parent: QtCore.QModelIndex) -> int:
-        if not parent.isValid():
-            parentItem = self.root
-        else:
-            parentItem: Node = parent.internalPointer()  # type: ignore
-        return len(parentItem.children)
-
-    def _find(self, path: List[Node], node: Node, target: Node):
-        path.append(node)
-        for child in node.children:
-            if child == target:
-                return True
-            if self._find(path, child, target):
-                return True
-        path.remove(node)
-        return False
+        if parent.column() > 0:
+            return 0
+        return self._node(parent).fetched
+
+    def hasChildren(self, parent: QtCore.QModelIndex) -> bool:
+        if parent.column() > 0:
+            return False
+        return self._node(parent).child_count > 0
+
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        if parent.column() > 0:
+            return False
+        node = self._node(parent)
+        return not self._fetching and node.fetched < node.child_count
+
+    def fetchMore(self, parent: QtCore.QModelIndex) -> None:
+        # a view may call fetchMore again from beginInsertRows. rowCount must keep
+        # the old count until endInsertRows, so the nested call is ignored
+        if parent.column() > 0 or self._fetching:
+            return
+        node = self._node(parent)
+        first = node.fetched
+        count = min(FETCH_SIZE, node.child_count - first)
+        if count <= 0:
+            return
+        self._fetching = True
+        try:
+            self.beginInsertRows(parent, first, first + count - 1)
+            node.fetched = first + count
+            self.endInsertRows()
+        finally:
+            self._fetching = False
 
     def get_path(self, target: Node) -> List[Node]:
-        path = []
-        self._find(path, self.root, target)
-        return path
+        return target.get_path()
 
 
 class QTextEditLogger(logging.Handler):
@@ -186,13 +233,9 @@ class ImageViewer(QtWidgets.QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
         self._first_file_dialog = True
-        self._image_label = QtWidgets.QLabel()
-        self._image_label.setBackgroundRole(QtGui.QPalette.Base)
-        self._image_label.setSizePolicy(QtWidgets.QSizePolicy.Ignored,
-                                        QtWidgets.QSizePolicy.Ignored)
-        self._image_label.setScaledContents(True)
+        self.canvas = TiledCanvas()
 
-        self.setCentralWidget(self._image_label)
+        self.setCentralWidget(self.canvas)
 
         self._create_actions()
 
@@ -214,6 +257,20 @@ class ImageViewer(QtWidgets.QMainWindow):
             '%(asctime)s - %(levelname)s - %(message)s'))
         logging.getLogger().addHandler(self.logger)
 
+        # directory browser
+        self.dock_right = QtWidgets.QDockWidget("browser", self)
+        self.addDockWidget(QtGui.Qt.RightDockWidgetArea, self.dock_right)
+        self.browser = ThumbnailBrowser()
+        self.browser.opened.connect(self.load_file)  # type: ignore
+        self.dock_right.setWidget(self.browser)
+        self.dock_right.hide()
+
+        # background loading
+        self._generation = 0
+        self._task: Optional[LoadTask] = None
+        # keep cancelled tasks alive until they finish
+        self._running: Dict[int, LoadTask] = {}
+
     @ QtCore.Slot()  # type: ignore
     def _on_select(self, selected: QtCore.QItemSelection, deselected):
         for index in selected.indexes():
@@ -225,41 +282,73 @@ class ImageViewer(QtWidgets.QMainWindow):
         path = [item.data[0] for item in node_path]
         match path:
             case ['__root__', 'levelImages', 'level', 'layer', 'face']:
-                layer_count = max(1, self.ktx2.layerCount)
-                face_count = max(1, self.ktx2.faceCount)
-                depth_count = max(1, self.ktx2.pixelDepth)
-
                 level = node_path[-3].data[1]
                 layer = node_path[-2].data[1]
                 face = node_path[-1].data[1]
                 depth = node.data[1]
-                image_index = level * \
-                    (layer_count * face_count * depth_count) + layer * \
-                    (face_count * depth_count) + face * (depth_count) + depth
-                self._set_image(
-                    self.ktx2.levelImages[image_index], self.ktx2.vkFormat)
+                self.canvas.set_source(
+                    self._path, self.ktx2, layer, face, depth)
+                self.canvas.show_level(level)
             case _:
                 pass
 
     def load_file(self, path: pathlib.Path):
-        import pyktx2.parser
-        try:
-            self.ktx2 = pyktx2.parser.parse_path(path)
-
-            self.model = Ktx2Model(path, self.ktx2)
-            self.tree.setModel(self.model)
-            self.tree.selectionModel().selectionChanged.connect(  # type: ignore
-                self._on_select)
-
-            message = f'Opened "{path}", {self.ktx2.pixelWidth}x{self.ktx2.pixelHeight}, format: {self.ktx2.vkFormat})'
-            self.statusBar().showMessage(message)
-        except Exception as e:
-            logger.error(e)
+        if self._task:
+            self._task.cancel.set()
+        self._generation += 1
+        self.canvas.clear()
+
+        self._path = path
+        task = LoadTask(path, self._generation)
+        task.signals.metadata.connect(self._on_metadata)  # type: ignore
+        task.signals.failed.connect(self._on_failed)  # type: ignore
+        task.signals.finished.connect(self._on_finished)  # type: ignore
+        self._task = task
+        self._running[task.generation] = task
+        QtCore.QThreadPool.globalInstance().start(task)
+        self.statusBar().showMessage(f'Loading "{path}"')
+
+    @ QtCore.Slot(int, object)  # type: ignore
+    def _on_metadata(self, generation: int, ktx2: pyktx2.parser.Ktx2):
+        if generation != self._generation:
+            return
+        self.ktx2 = ktx2
+        self.model = Ktx2Model(self._path, self.ktx2)
+        self.tree.setModel(self.model)
+        self.tree.selectionModel().selectionChanged.connect(  # type: ignore
+            self._on_select)
+        self.canvas.set_source(self._path, self.ktx2)
+
+        message = f'Opened "{self._path}", {self.ktx2.pixelWidth}x{self.ktx2.pixelHeight}, format: {self.ktx2.vkFormat})'
+        self.statusBar().showMessage(message)
+
+    @ QtCore.Slot(int, str)  # type: ignore
+    def _on_failed(self, generation: int, message: str):
+        if generation != self._generation:
+            return
+        logger.error(message)
+
+    @ QtCore.Slot(int)  # type: ignore
+    def _on_finished(self, generation: int):
+        task = self._running.pop(generation, None)
+        if task:
+            task.signals.deleteLater()
+        if generation == self._generation:
+            self._task = None
+
+    def open_directory(self, directory: pathlib.Path):
+        self.browser.set_directory(directory)
+        self.dock_right.show()
+        self.statusBar().showMessage(
+            f'"{directory}", {self.browser.thumbnails.rowCount()} files')
 
-    def _set_image(self, data: pyktx2.parser.Image, format: pyktx2.parser.VkFormat):
-        image = QtGui.QImage(data.data, data.width,
-                             data.height, QtGui.QImage.Format_RGBA16FPx4)
-        self._image_label.setPixmap(QtGui.QPixmap.fromImage(image))
+    @ QtCore.Slot()  # type: ignore
+    def _open_directory(self):
+        directory = QtWidgets.QFileDialog.getExistingDirectory(
+            self, "Open Directory")
+        if not directory:
+            return
+        self.open_directory(pathlib.Path(directory))
 
     @ QtCore.Slot()  # type: ignore
     def _open(self):
@@ -280,6 +369,10 @@ class ImageViewer(QtWidgets.QMainWindow):
         self._open_act.triggered.connect(self._open)  # type: ignore
         self._open_act.setShortcut(QtGui.QKeySequence.Open)
 
+        self._open_directory_act = file_menu.addAction("Open &Directory...")
+        self._open_directory_act.triggered.connect(  # type: ignore
+            self._open_directory)
+
         file_menu.addSeparator()
 
         self._exit_act = file_menu.addAction("E&xit")
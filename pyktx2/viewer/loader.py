@@ -0,0 +1,157 @@
+'''
+parse and decode a ktx2 file on a QThreadPool.
+
+LoadTask publishes the metadata. TileTask decodes one region of a level.
+a supercompressed level is decompressed once and shared by its tiles through LevelCache.
+'''
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Tuple, Any, Callable, Dict, Optional
+import numpy as np
+from PySide6 import QtCore, QtGui
+import pyktx2.parser
+from pyktx2.parser import VkFormat
+from pyktx2.decode import decode_region, read_level, to_rgba8
+
+
+def to_qimage(image: np.ndarray, vkFormat: VkFormat) -> QtGui.QImage:
+    '''
+    the returned QImage owns a copy of the pixels.
+    '''
+    height, width = image.shape[:2]
+    if vkFormat == VkFormat.VK_FORMAT_R16G16B16A16_SFLOAT:
+        pixels = np.ascontiguousarray(image)
+        format = QtGui.QImage.Format_RGBA16FPx4
+    else:
+        pixels = np.ascontiguousarray(to_rgba8(image, vkFormat))
+        format = QtGui.QImage.Format_RGBA8888
+    return QtGui.QImage(pixels.data, width, height, pixels.strides[0], format).copy()
+
+
+class LoaderSignals(QtCore.QObject):
+    # generation, Ktx2 without levelImages
+    metadata = QtCore.Signal(int, object)
+    failed = QtCore.Signal(int, str)
+    finished = QtCore.Signal(int)
+
+
+class LoadTask(QtCore.QRunnable):
+    '''
+    create on the GUI thread, so that signals are delivered to it.
+    '''
+
+    def __init__(self, path: pathlib.Path, generation: int) -> None:
+        super().__init__()
+        # the viewer keeps a reference while the task runs
+        self.setAutoDelete(False)
+        self.path = path
+        self.generation = generation
+        self.cancel = threading.Event()
+        self.signals = LoaderSignals()
+
+    def run(self) -> None:
+        try:
+            with self.path.open('rb') as f:
+                ktx2 = pyktx2.parser.parse_metadata(f)
+            if not self.cancel.is_set():
+                self.signals.metadata.emit(self.generation, ktx2)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, f'{self.path}: {e}')
+        finally:
+            self.signals.finished.emit(self.generation)
+
+
+class LevelCache:
+    '''
+    decompressed levels shared by the tile tasks, bounded by bytes.
+    the first task that asks for a level decompresses it. the others wait for it.
+    '''
+
+    def __init__(self, budget: int) -> None:
+        self.budget = budget
+        self.size = 0
+        self._lock = threading.Lock()
+        self._levels: OrderedDict[Any, bytes] = OrderedDict()
+        self._loading: Dict[Any, threading.Lock] = {}
+
+    def _get(self, key: Any) -> Optional[bytes]:
+        data = self._levels.get(key)
+        if data is not None:
+            self._levels.move_to_end(key)
+        return data
+
+    def get(self, key: Any, load: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            data = self._get(key)
+            if data is not None:
+                return data
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            with self._lock:
+                data = self._get(key)
+                if data is not None:
+                    return data
+            try:
+                data = load()
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+            with self._lock:
+                self._levels[key] = data
+                self.size += len(data)
+                while self.size > self.budget and len(self._levels) > 1:
+                    _, evicted = self._levels.popitem(last=False)
+                    self.size -= len(evicted)
+            return data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._levels.clear()
+            self.size = 0
+
+
+class TileSignals(QtCore.QObject):
+    # key, QImage
+    tile = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, str)
+    finished = QtCore.Signal(object)
+
+
+class TileTask(QtCore.QRunnable):
+    '''
+    decode rect (x, y, w, h) of a level of one layer/face/depth slice.
+    '''
+
+    def __init__(self, path: pathlib.Path, header: pyktx2.parser.Ktx2Header,
+                 key: Any, level: int, subresource: Tuple[int, int, int],
+                 rect: Tuple[int, int, int, int], levels: LevelCache) -> None:
+        super().__init__()
+        # the canvas keeps a reference while the task runs
+        self.setAutoDelete(False)
+        self.path = path
+        self.header = header
+        self.key = key
+        self.level = level
+        self.subresource = subresource
+        self.rect = rect
+        self.levels = levels
+        self.signals = TileSignals()
+
+    def run(self) -> None:
+        try:
+            layer, face, depth = self.subresource
+            with self.path.open('rb') as f:
+                level_data = None
+                if self.header.supercompressionScheme != pyktx2.parser.SupercompressionScheme.NONE:
+                    # generation, level
+                    level_data = self.levels.get(self.key[:2], lambda: read_level(f, self.header, self.level))
+                image = decode_region(f, *self.rect, level=self.level,
+                                      layer=layer, face=face, depth=depth, header=self.header,
+                                      level_data=level_data)
+            self.signals.tile.emit(
+                self.key, to_qimage(image, self.header.vkFormat))
+        except Exception as e:
+            self.signals.failed.emit(self.key, f'{self.path}: {e}')
+        finally:
+            self.signals.finished.emit(self.key)
@@ -0,0 +1,257 @@
+'''
+ktx2 serializer
+
+* https://github.khronos.org/KTX-Specification/
+'''
+import math
+import struct
+from typing import List, Dict, Optional, Tuple
+from .parser import (VkFormat, SupercompressionScheme, ColorModel, ColorPrimaries, TransferFunction,
+                     Const, Ktx2Header, LevelIndex, HEADER_SIZE, LEVEL_INDEX_SIZE)
+
+# offset of bytesPlane0 in a dfd that starts with the basic descriptor block
+DFD_BYTES_PLANE0_OFFSET = 20
+
+
+def pack_header(header: Ktx2Header) -> bytes:
+    data = struct.pack('<12s9I4I2Q',
+                       Const.IDENTIFIER,
+                       header.vkFormat.value,
+                       header.typeSize,
+                       header.pixelWidth,
+                       header.pixelHeight,
+                       header.pixelDepth,
+                       header.layerCount,
+                       header.faceCount,
+                       header.levelCount,
+                       header.supercompressionScheme.value,
+                       header.dfdByteOffset,
+                       header.dfdByteLength,
+                       header.kvdByteOffset,
+                       header.kvdByteLength,
+                       header.sgdByteOffset,
+                       header.sgdByteLength)
+    assert len(data) == HEADER_SIZE
+    return data + b''.join(struct.pack('<3Q', *level) for level in header.levelIndices)
+
+
+def pack_sample(bitOffset: int, bitLength: int, channelType: int,
+                samplePosition: Tuple[int, int, int, int] = (0, 0, 0, 0),
+                sampleLower: int = 0, sampleUpper: int = 0xFFFFFFFF) -> bytes:
+    '''
+    bitLength is the actual number of bits (stored as bitLength - 1).
+    channelType holds the channel id in the lower 4 bits and the qualifiers in the upper 4 bits.
+    '''
+    return struct.pack('<HBB4BII', bitOffset, bitLength - 1, channelType,
+                       *samplePosition, sampleLower, sampleUpper)
+
+
+def pack_basic_dfd(colorModel: ColorModel,
+                   colorPrimaries: ColorPrimaries,
+                   transferFunction: TransferFunction,
+                   flags: int,
+                   texelBlockDimension: Tuple[int, int, int, int],
+                   bytesPlane0: int,
+                   samples: List[bytes]) -> bytes:
+    '''
+    dfdTotalSize followed by a single basic descriptor block.
+    texelBlockDimension is the actual block size (stored as dimension - 1).
+    '''
+    descriptorBlockSize = 24 + 16 * len(samples)
+    block = struct.pack('<IHH4B4B8B',
+                        0,  # vendorId = KHR, descriptorType = basic
+                        2,  # versionNumber = KDF 1.3
+                        descriptorBlockSize,
+                        colorModel.value, colorPrimaries.value, transferFunction.value, flags,
+                        *(max(0, d - 1) for d in texelBlockDimension),
+                        bytesPlane0, 0, 0, 0, 0, 0, 0, 0)
+    block += b''.join(samples)
+    return struct.pack('<I', 4 + len(block)) + block
+
+
+def pack_kvd(kv: Dict[str, bytes]) -> bytes:
+    '''
+    entries are sorted by key and each one is padded to 4 bytes.
+    '''
+    data = b''
+    for key in sorted(kv.keys(), key=lambda k: k.encode('utf-8')):
+        keyAndValue = key.encode('utf-8') + b'\0' + kv[key]
+        data += struct.pack('<I', len(keyAndValue)) + keyAndValue
+        data += b'\0' * get_padding(len(data), 4)
+    return data
+
+
+def get_padding(pos: int, alignment: int) -> int:
+    mod = pos % alignment
+    if mod == 0:
+        return 0
+    return alignment - mod
+
+
+def get_level_alignment(supercompressionScheme: SupercompressionScheme, dfd: bytes) -> int:
+    '''
+    mip levels of a non supercompressed texture are aligned to lcm(texel block size, 4).
+    '''
+    if supercompressionScheme != SupercompressionScheme.NONE:
+        return 1
+    bytesPlane0 = dfd[DFD_BYTES_PLANE0_OFFSET]
+    return math.lcm(max(1, bytesPlane0), 4)
+
+
+def serialize(vkFormat: VkFormat,
+              typeSize: int,
+              pixelWidth: int,
+              pixelHeight: int,
+              pixelDepth: int,
+              layerCount: int,
+              faceCount: int,
+              dfd: bytes,
+              kv: Dict[str, bytes],
+              levels: List[bytes],
+              supercompressionScheme: SupercompressionScheme = SupercompressionScheme.NONE,
+              uncompressedByteLengths: Optional[List[int]] = None,
+              supercompressionGlobalData: bytes = b'') -> bytes:
+    '''
+    levels[0] is the base level.
+    uncompressedByteLengths is required when supercompressionScheme is not NONE.
+    '''
+    levelCount = len(levels)
+    if uncompressedByteLengths is None:
+        assert supercompressionScheme == SupercompressionScheme.NONE
+        uncompressedByteLengths = [len(level) for level in levels]
+
+    pos = HEADER_SIZE + LEVEL_INDEX_SIZE * levelCount
+    dfdByteOffset = pos
+    pos += len(dfd)
+    kvd = pack_kvd(kv)
+    kvdByteOffset = pos if kvd else 0
+    pos += len(kvd)
+    sgdByteOffset = 0
+    sgd_padding = 0
+    if supercompressionGlobalData:
+        sgd_padding = get_padding(pos, 8)
+        pos += sgd_padding
+        sgdByteOffset = pos
+        pos += len(supercompressionGlobalData)
+
+    # the smallest level comes first
+    alignment = get_level_alignment(supercompressionScheme, dfd)
+    body = b''
+    levelIndices: List[LevelIndex] = [LevelIndex(0, 0, 0)] * levelCount
+    for i in reversed(range(levelCount)):
+        padding = get_padding(pos, alignment)
+        body += b'\0' * padding
+        pos += padding
+        levelIndices[i] = LevelIndex(
+            pos, len(levels[i]), uncompressedByteLengths[i])
+        body += levels[i]
+        pos += len(levels[i])
+
+    header = Ktx2Header(vkFormat,
+                        typeSize,
+                        pixelWidth,
+                        pixelHeight,
+                        pixelDepth,
+                        layerCount,
+                        faceCount,
+                        levelCount,
+                        supercompressionScheme,
+                        dfdByteOffset,
+                        len(dfd),
+                        kvdByteOffset,
+                        len(kvd),
+                        sgdByteOffset,
+                        len(supercompressionGlobalData),
+                        levelIndices)
+
+    return (pack_header(header) + dfd + kvd + b'\0' * sgd_padding
+            + supercompressionGlobalData + body)
+
+
+# channel ids of KHR_DF_MODEL_RGBSDA
+CHANNEL_IDS = {'R': 0, 'G': 1, 'B': 2, 'A': 15}
+QUALIFIER_SIGNED = 0x40
+QUALIFIER_FLOAT = 0x80
+
+# color model and samples (channel id, bit length) of block compressed formats
+_BLOCK_MODELS = {
+    'BC1_RGB': (ColorModel.KHR_DF_MODEL_BC1A, [(0, 64)]),
+    'BC1_RGBA': (ColorModel.KHR_DF_MODEL_BC1A, [(1, 64)]),
+    'BC2': (ColorModel.KHR_DF_MODEL_BC2, [(15, 64), (0, 64)]),
+    'BC3': (ColorModel.KHR_DF_MODEL_BC3, [(15, 64), (0, 64)]),
+    'BC4': (ColorModel.KHR_DF_MODEL_BC4, [(0, 64)]),
+    'BC5': (ColorModel.KHR_DF_MODEL_BC5, [(0, 64), (1, 64)]),
+    'BC6H': (ColorModel.KHR_DF_MODEL_BC6H, [(0, 128)]),
+    'BC7': (ColorModel.KHR_DF_MODEL_BC7, [(0, 128)]),
+}
+
+
+def _sample_range(kind: str, bits: int, signed: bool) -> Tuple[int, int]:
+    if kind == 'SFLOAT':
+        # -1.0f, 1.0f
+        return (0xBF800000 if signed else 0), 0x3F800000
+    if kind in ('UINT', 'SINT', 'USCALED', 'SSCALED'):
+        return (0xFFFFFFFF if signed else 0), 1
+    if signed:
+        upper = (1 << (min(bits, 32) - 1)) - 1
+        return (-upper) & 0xFFFFFFFF, upper
+    return 0, (1 << min(bits, 32)) - 1
+
+
+def make_dfd(vkFormat: VkFormat) -> bytes:
+    '''
+    basic dfd of an uncompressed or a BC format.
+    '''
+    from .formats import get_format_info
+    info = get_format_info(vkFormat)
+    name = vkFormat.name[len('VK_FORMAT_'):]
+    transfer = (TransferFunction.KHR_DF_TRANSFER_SRGB if '_SRGB' in name
+                else TransferFunction.KHR_DF_TRANSFER_LINEAR)
+    kind = name.split('_')[-1] if not info.is_compressed else name.split('_')[-2]
+    signed = kind in ('SNORM', 'SSCALED', 'SINT', 'SFLOAT')
+
+    samples: List[bytes] = []
+    if not info.is_compressed:
+        if not info.channels:
+            raise NotImplementedError(f'{vkFormat}')
+        colorModel = ColorModel.KHR_DF_MODEL_RGBSDA
+        bits = info.blockBytes * 8 // len(info.channels)
+        lower, upper = _sample_range(kind, bits, signed)
+        for i, channel in enumerate(info.channels):
+            channelType = CHANNEL_IDS[channel]
+            if signed:
+                channelType |= QUALIFIER_SIGNED
+            if kind == 'SFLOAT':
+                channelType |= QUALIFIER_FLOAT
+            if kind == 'SRGB' and channel == 'A':
+                # alpha is linear in an sRGB format
+                channelType |= 0x10
+            samples.append(pack_sample(i * bits, bits, channelType,
+                                       sampleLower=lower, sampleUpper=upper))
+    else:
+        model = next((v for k, v in _BLOCK_MODELS.items()
+                      if name.startswith(k + '_')), None)
+        if not model:
+            raise NotImplementedError(f'{vkFormat}')
+        colorModel, channels = model
+        offset = 0
+        for channel, bits in channels:
+            channelType = channel
+            if signed:
+                channelType |= QUALIFIER_SIGNED
+            if name.startswith('BC6H'):
+                channelType |= QUALIFIER_FLOAT
+            lower, upper = _sample_range(
+                'SFLOAT' if name.startswith('BC6H') else kind, 32, signed)
+            samples.append(pack_sample(offset, bits, channelType,
+                                       sampleLower=lower, sampleUpper=upper))
+            offset += bits
+
+    return pack_basic_dfd(colorModel,
+                          ColorPrimaries.KHR_DF_PRIMARIES_BT709,
+                          transfer,
+                          0,
+                          (info.blockWidth, info.blockHeight,
+                           info.blockDepth, 1),
+                          info.blockBytes,
+                          samples)
@@ -0,0 +1,150 @@
+import unittest
+import numpy as np
+import pyktx2.bcn
+import pyktx2.bcn_encode
+import pyktx2.encode_pool
+import pyktx2.parser
+import pyktx2.formats
+from pyktx2.parser import VkFormat
+
+BC7_WEIGHTS = [0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64]
+
+
+def decode_bc7_mode6(block: bytes) -> np.ndarray:
+    '''
+    reference decoder of a single mode 6 block -> (16, 4)
+    '''
+    bits = int.from_bytes(block, 'little')
+    pos = 0
+
+    def get(n: int) -> int:
+        nonlocal pos
+        value = (bits >> pos) & ((1 << n) - 1)
+        pos += n
+        return value
+    assert get(7) == 1 << 6
+    endpoints = [(get(7), get(7)) for _ in range(4)]
+    p0, p1 = get(1), get(1)
+    indices = [get(3)] + [get(4) for _ in range(15)]
+    return np.array([[((64 - BC7_WEIGHTS[i]) * (e0 * 2 + p0) + BC7_WEIGHTS[i] * (e1 * 2 + p1) + 32) >> 6
+                      for e0, e1 in endpoints] for i in indices])
+
+
+def make_image(width: int, height: int) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    rgba = np.stack([x * 255 // max(1, width - 1), y * 255 // max(1, height - 1),
+                     (x + y) % 256, 255 - x % 256], axis=-1)
+    noise = np.random.default_rng(1).integers(-6, 7, rgba.shape)
+    return np.clip(rgba + noise, 0, 255).astype(np.uint8)
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    return 10 * np.log10(255 ** 2 / np.mean(np.square(a.astype(np.float64) - b)))
+
+
+class TestBcnEncode(unittest.TestCase):
+
+    def setUp(self):
+        self.texels, _, _ = pyktx2.bcn_encode.image_to_blocks(make_image(64, 64))
+
+    def test_bc1(self):
+        vkFormat = VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK
+        quality = []
+        for preset in ('fast', 'normal', 'high'):
+            blocks = pyktx2.bcn_encode.encode_blocks(vkFormat, self.texels, preset)
+            self.assertEqual(blocks.shape, (len(self.texels), 8))
+            decoded = pyktx2.bcn.decode_blocks(vkFormat, blocks).reshape(-1, 16, 4)
+            quality.append(psnr(self.texels[:, :, :3], decoded[:, :, :3]))
+        self.assertGreater(quality[0], 30)
+        self.assertGreaterEqual(quality[1], quality[0])
+        self.assertGreaterEqual(quality[2], quality[1])
+
+    def test_solid(self):
+        texels = np.zeros((3, 16, 4), np.uint8)
+        texels[0] = (255, 0, 0, 255)
+        texels[1] = (8, 16, 24, 255)
+        texels[2] = (0, 0, 0, 255)
+        for vkFormat in (VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK, VkFormat.VK_FORMAT_BC3_UNORM_BLOCK):
+            decoded = pyktx2.bcn.decode_blocks(
+                vkFormat, pyktx2.bcn_encode.encode_blocks(vkFormat, texels)).reshape(-1, 16, 4)
+            self.assertTrue(np.array_equal(decoded[0], texels[0]))
+            self.assertTrue(np.array_equal(decoded[2], texels[2]))
+            self.assertLessEqual(np.abs(decoded[1].astype(int) - texels[1]).max(), 4)
+
+    def test_bc1_punchthrough(self):
+        texels = self.texels.copy()
+        texels[::3, ::2, 3] = 0
+        texels[:, :, 3] = np.where(texels[:, :, 3] >= 128, 255, 0)
+        vkFormat = VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK
+        decoded = pyktx2.bcn.decode_blocks(
+            vkFormat, pyktx2.bcn_encode.encode_blocks(vkFormat, texels)).reshape(-1, 16, 4)
+        self.assertTrue(np.array_equal(decoded[:, :, 3], texels[:, :, 3]))
+        opaque = texels[:, :, 3] == 255
+        self.assertGreater(psnr(texels[opaque][:, :3], decoded[opaque][:, :3]), 30)
+
+    def test_bc3(self):
+        vkFormat = VkFormat.VK_FORMAT_BC3_UNORM_BLOCK
+        decoded = pyktx2.bcn.decode_blocks(
+            vkFormat, pyktx2.bcn_encode.encode_blocks(vkFormat, self.texels)).reshape(-1, 16, 4)
+        self.assertGreater(psnr(self.texels[:, :, :3], decoded[:, :, :3]), 30)
+        self.assertGreater(psnr(self.texels[:, :, 3], decoded[:, :, 3]), 40)
+
+    def test_bc7(self):
+        vkFormat = VkFormat.VK_FORMAT_BC7_UNORM_BLOCK
+        texels = self.texels[:64]
+        quality = []
+        for preset in ('fast', 'high'):
+            blocks = pyktx2.bcn_encode.encode_blocks(vkFormat, texels, preset)
+            self.assertEqual(blocks.shape, (len(texels), 16))
+            decoded = np.stack([decode_bc7_mode6(block.tobytes()) for block in blocks])
+            quality.append(psnr(texels, decoded))
+        self.assertGreater(quality[0], 30)
+        self.assertGreaterEqual(quality[1], quality[0])
+
+    def test_mipmaps(self):
+        levels = pyktx2.bcn_encode.make_mipmaps(make_image(13, 6), srgb=True)
+        self.assertEqual([level.shape[:2] for level in levels], [(6, 13), (3, 6), (1, 3), (1, 1)])
+        flat = np.full((4, 4, 4), 200, np.uint8)
+        self.assertEqual(pyktx2.bcn_encode.make_mipmaps(flat, srgb=True)[-1].tolist(), [[[200] * 4]])
+
+    def test_ktx2(self):
+        rgba = make_image(40, 24)
+        for vkFormat in (VkFormat.VK_FORMAT_BC1_RGB_SRGB_BLOCK, VkFormat.VK_FORMAT_BC7_UNORM_BLOCK):
+            data = pyktx2.bcn_encode.encode_ktx2(vkFormat, rgba, preset='fast')
+            ktx2 = pyktx2.parser.parse_bytes(data)
+            self.assertEqual(ktx2.vkFormat, vkFormat)
+            self.assertEqual((ktx2.pixelWidth, ktx2.pixelHeight), (40, 24))
+            self.assertEqual(len(ktx2.levelImages), 6)
+            self.assertEqual(len(ktx2.levelImages[0].data), 10 * 6 * pyktx2.formats.get_format_info(vkFormat).blockBytes)
+            self.assertIsNotNone(ktx2.dfd.basic)
+
+    def test_dtype(self):
+        vkFormat = VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK
+        rgba = make_image(8, 8).astype(np.float32) / 255
+        with self.assertRaises(ValueError):
+            pyktx2.bcn_encode.encode_image(vkFormat, rgba)
+        with self.assertRaises(ValueError):
+            pyktx2.bcn_encode.encode_ktx2(vkFormat, rgba)
+        with pyktx2.encode_pool.EncodeExecutor(1) as executor:
+            with self.assertRaises(ValueError):
+                executor.submit(vkFormat, rgba.astype(np.uint16))
+
+    def test_pool(self):
+        vkFormat = VkFormat.VK_FORMAT_BC3_UNORM_BLOCK
+        rgba = make_image(70, 36)
+        expected = pyktx2.bcn_encode.encode_image(vkFormat, rgba)
+        small = pyktx2.encode_pool.SMALL_IMAGE_BLOCKS
+        with pyktx2.encode_pool.EncodeExecutor(2) as executor:
+            self.assertEqual(executor.submit(vkFormat, rgba).result(), expected)
+            try:
+                # block rows fanned out over the workers through shared memory
+                pyktx2.encode_pool.SMALL_IMAGE_BLOCKS = 0
+                self.assertEqual(executor.submit(vkFormat, rgba).result(), expected)
+            finally:
+                pyktx2.encode_pool.SMALL_IMAGE_BLOCKS = small
+            data = pyktx2.bcn_encode.encode_ktx2(vkFormat, rgba, executor=executor)
+        self.assertEqual(data, pyktx2.bcn_encode.encode_ktx2(vkFormat, rgba))
+
+
+if __name__ == '__main__':
+    unittest.main()
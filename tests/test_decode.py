@@ -0,0 +1,108 @@
+import io
+import struct
+import unittest
+import numpy as np
+import pyktx2.writer
+import pyktx2.repack
+import pyktx2.decode
+import pyktx2.parser
+from pyktx2.instrumentation import ParseStats
+from pyktx2.parser import VkFormat, SupercompressionScheme, ColorModel, ColorPrimaries, TransferFunction
+
+
+def make_file(vkFormat: VkFormat, colorModel: ColorModel, block: int, bytesPlane0: int,
+              levels, layerCount: int) -> bytes:
+    dfd = pyktx2.writer.pack_basic_dfd(
+        colorModel,
+        ColorPrimaries.KHR_DF_PRIMARIES_BT709,
+        TransferFunction.KHR_DF_TRANSFER_LINEAR,
+        0, (block, block, 1, 1), bytesPlane0, [])
+    width = levels[0].shape[1] * block
+    height = levels[0].shape[0] // max(1, layerCount) * block
+    return pyktx2.writer.serialize(vkFormat, 1, width, height, 0, layerCount, 1, dfd, {},
+                                   [level.tobytes() for level in levels])
+
+
+class TestDecode(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        # level 0: 2 layers of 16x8 blocks, level 1: 2 layers of 8x4 blocks
+        self.bc1_levels = [rng.integers(0, 256, (2 * 8, 16, 8), dtype=np.uint8),
+                           rng.integers(0, 256, (2 * 4, 8, 8), dtype=np.uint8)]
+        self.bc1 = make_file(VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK,
+                             ColorModel.KHR_DF_MODEL_BC1A, 4, 8, self.bc1_levels, 2)
+
+    def test_bc1_region(self):
+        full = pyktx2.decode.decode_image(VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK,
+                                          self.bc1_levels[0][8:].tobytes(), 64, 32)
+        region = pyktx2.decode.decode_region(
+            io.BytesIO(self.bc1), 5, 3, 30, 17, layer=1)
+        self.assertEqual(region.shape, (17, 30, 4))
+        self.assertTrue(np.array_equal(region, full[3:20, 5:35]))
+
+    def test_supercompressed_region(self):
+        zstd = io.BytesIO()
+        pyktx2.repack.repack_file(io.BytesIO(self.bc1), zstd,
+                                  SupercompressionScheme.Zstandard)
+        expected = pyktx2.decode.decode_region(
+            io.BytesIO(self.bc1), 1, 2, 20, 10, level=1, layer=1)
+        region = pyktx2.decode.decode_region(
+            zstd, 1, 2, 20, 10, level=1, layer=1)
+        self.assertTrue(np.array_equal(region, expected))
+        # decompressed once, decoded many times
+        header = pyktx2.parser.read_header(zstd)
+        level_data = pyktx2.decode.read_level(zstd, header, 1)
+        region = pyktx2.decode.decode_region(
+            io.BytesIO(), 1, 2, 20, 10, level=1, layer=1, header=header, level_data=level_data)
+        self.assertTrue(np.array_equal(region, expected))
+
+    def test_corrupted_level(self):
+        for scheme in (SupercompressionScheme.Zstandard, SupercompressionScheme.ZLIB):
+            packed = io.BytesIO()
+            pyktx2.repack.repack_file(io.BytesIO(self.bc1), packed, scheme)
+            data = bytearray(packed.getvalue())
+            # uncompressedByteLength of level 0
+            for uncompressedByteLength in (1 << 40, 1 << 63, 8):
+                struct.pack_into('<Q', data, pyktx2.parser.HEADER_SIZE + 16, uncompressedByteLength)
+                with self.assertRaises(pyktx2.parser.KtxError):
+                    pyktx2.parser.parse_bytes(bytes(data))
+                with self.assertRaises(pyktx2.parser.KtxError):
+                    pyktx2.decode.decode_region(io.BytesIO(data), 0, 0, 4, 4)
+
+    def test_uncompressed_region(self):
+        rng = np.random.default_rng(3)
+        level = rng.integers(0, 256, (24, 40, 4), dtype=np.uint8)
+        data = make_file(VkFormat.VK_FORMAT_R8G8B8A8_UNORM,
+                         ColorModel.KHR_DF_MODEL_RGBSDA, 1, 4, [level], 0)
+        region = pyktx2.decode.decode_region(io.BytesIO(data), 7, 9, 13, 11)
+        self.assertTrue(np.array_equal(region, level[9:20, 7:20]))
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            pyktx2.decode.decode_region(io.BytesIO(self.bc1), 60, 0, 8, 8)
+
+    def test_stats(self):
+        stages = []
+        stats = ParseStats(lambda name, seconds: stages.append(name))
+        pyktx2.decode.decode_region(io.BytesIO(self.bc1), 0, 0, 8, 4, stats=stats)
+        self.assertEqual(stages, ['header', 'read', 'decode'])
+        # one row of 2 blocks
+        self.assertEqual(stats.bytes_read, 80 + 24 * 2 + 16)
+        self.assertEqual(stats.images, 1)
+
+    def test_parse_stats(self):
+        zstd = io.BytesIO()
+        pyktx2.repack.repack_file(io.BytesIO(self.bc1), zstd,
+                                  SupercompressionScheme.Zstandard)
+        stats = ParseStats()
+        ktx2 = pyktx2.parser.parse_bytes(zstd.getvalue(), stats=stats)
+        self.assertEqual(len(ktx2.levelImages), 4)
+        self.assertEqual(ktx2.levelImages[1].data, self.bc1_levels[0][8:].tobytes())
+        self.assertEqual(stats.calls['decompress'], 2)
+        self.assertEqual(stats.images, 4)
+        self.assertEqual(set(stats.seconds), {'header', 'dfd', 'kvd', 'sgd', 'decompress', 'levels'})
+
+
+if __name__ == '__main__':
+    unittest.main()
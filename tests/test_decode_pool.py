@@ -0,0 +1,61 @@
+import struct
+import unittest
+import numpy as np
+import pyktx2.bcn
+import pyktx2.decode_pool
+from pyktx2.parser import VkFormat
+
+
+def bc1_block(c0: int, c1: int, indices: int) -> bytes:
+    return struct.pack('<HHI', c0, c1, indices)
+
+
+class TestDecodePool(unittest.TestCase):
+
+    def test_bc1(self):
+        # red, blue, 4 color mode. texel i uses index i % 4
+        block = bc1_block(0xF800, 0x001F, 0b11100100111001001110010011100100)
+        texels = pyktx2.bcn.decode_blocks(VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK,
+                                          np.frombuffer(block, np.uint8).reshape(1, 8))
+        self.assertEqual(texels.shape, (1, 4, 4, 4))
+        row = texels[0, 0]
+        self.assertEqual(row[0].tolist(), [255, 0, 0, 255])
+        self.assertEqual(row[1].tolist(), [0, 0, 255, 255])
+        self.assertEqual(row[2].tolist(), [170, 0, 85, 255])
+        self.assertEqual(row[3].tolist(), [85, 0, 170, 255])
+
+    def test_bc1_punchthrough(self):
+        block = bc1_block(0x001F, 0xF800, 0xFFFFFFFF)
+        texels = pyktx2.bcn.decode_blocks(VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK,
+                                          np.frombuffer(block, np.uint8).reshape(1, 8))
+        self.assertEqual(texels[0, 0, 0].tolist(), [0, 0, 0, 0])
+
+    def test_bc4(self):
+        # 8 value mode. index 0 -> 255, index 1 -> 0
+        block = bytes((255, 0)) + (0b001000).to_bytes(6, 'little')
+        texels = pyktx2.bcn.decode_blocks(VkFormat.VK_FORMAT_BC4_UNORM_BLOCK,
+                                          np.frombuffer(block, np.uint8).reshape(1, 8))
+        self.assertEqual(texels[0, 0, 0].tolist(), [255, 0, 0, 255])
+        self.assertEqual(texels[0, 0, 1].tolist(), [0, 0, 0, 255])
+
+    def test_pool(self):
+        width, height = 36, 70
+        rng = np.random.default_rng(1)
+        blocks_wide, blocks_high = 9, 18
+        data = rng.integers(0, 256, blocks_wide * blocks_high * 16,
+                            dtype=np.uint8).tobytes()
+        expected = pyktx2.bcn.blocks_to_image(
+            pyktx2.bcn.decode_blocks(VkFormat.VK_FORMAT_BC3_UNORM_BLOCK,
+                                     np.frombuffer(data, np.uint8).reshape(-1, 16)),
+            blocks_wide, blocks_high)[:height, :width]
+        with pyktx2.decode_pool.DecodeExecutor(2) as executor:
+            for _ in range(2):
+                future = executor.submit(
+                    VkFormat.VK_FORMAT_BC3_UNORM_BLOCK, data, width, height)
+                with future.result() as image:
+                    self.assertEqual(image.array.shape, (height, width, 4))
+                    self.assertTrue(np.array_equal(image.array, expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
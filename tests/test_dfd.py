@@ -0,0 +1,56 @@
+import struct
+import unittest
+import pyktx2.writer
+import pyktx2.dfd
+from pyktx2.parser import VkFormat, ColorModel, KtxError
+
+
+def vendor_block(vendorId: int, descriptorType: int, payload: bytes) -> bytes:
+    return struct.pack('<IHH', vendorId | descriptorType << 17, 1, 8 + len(payload)) + payload
+
+
+class TestDfd(unittest.TestCase):
+
+    def test_samples(self):
+        dfd = pyktx2.dfd.parse_dfd(pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_R16G16B16A16_SFLOAT))
+        basic, samples = dfd
+        self.assertEqual(basic.colorModel, ColorModel.KHR_DF_MODEL_RGBSDA)
+        self.assertEqual(samples['bitOffset'].tolist(), [0, 16, 32, 48])
+        self.assertEqual(dfd.bit_lengths.tolist(), [16] * 4)
+        self.assertEqual(dfd.channel_ids.tolist(), [0, 1, 2, 15])
+        self.assertTrue(all(dfd.qualifiers & pyktx2.dfd.KHR_DF_SAMPLE_DATATYPE_FLOAT))
+        self.assertEqual(samples['sampleUpper'].tolist(), [0x3F800000] * 4)
+        # indexes like the former tuple
+        self.assertEqual(len(dfd), 2)
+        self.assertIs(dfd[0], basic)
+        self.assertIs(dfd[1], samples)
+        self.assertIs(dfd[-1], samples)
+
+    def test_blocks(self):
+        basic = pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK)
+        extra = vendor_block(0x1234, 3, b'abcd')
+        # dfdTotalSize covers both blocks. trailing bytes are ignored
+        data = struct.pack('<I', len(basic) + len(extra)) + basic[4:] + extra + b'\0' * 4
+        dfd = pyktx2.dfd.parse_dfd(data)
+        self.assertEqual(dfd.totalSize, len(basic) + len(extra))
+        self.assertEqual([(b.vendorId, b.descriptorType) for b in dfd.blocks], [(0, 0), (0x1234, 3)])
+        self.assertEqual(dfd.blocks[1].data[8:], b'abcd')
+        self.assertEqual(dfd.basic.colorModel, ColorModel.KHR_DF_MODEL_BC1A)
+
+        # no basic descriptor block
+        dfd = pyktx2.dfd.parse_dfd(struct.pack('<I', 4 + len(extra)) + extra)
+        self.assertIsNone(dfd.basic)
+        self.assertEqual(len(dfd.samples), 0)
+
+        with self.assertRaises(KtxError):
+            pyktx2.dfd.parse_dfd(struct.pack('<I', 100) + extra)
+
+    def test_intern(self):
+        data = pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_R8G8B8A8_UNORM)
+        a = pyktx2.dfd.parse_dfd(data)
+        self.assertIs(pyktx2.dfd.parse_dfd(bytearray(data)), a)
+        self.assertFalse(a.samples.flags.writeable)
+
+
+if __name__ == '__main__':
+    unittest.main()
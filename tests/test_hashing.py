@@ -0,0 +1,91 @@
+import io
+import os
+import pathlib
+import tempfile
+import unittest
+import pyktx2.writer
+import pyktx2.hashing
+from pyktx2.parser import VkFormat
+
+FORMAT = VkFormat.VK_FORMAT_R8G8B8A8_UNORM
+
+
+def make_rgba8(level0: bytes, kv=None) -> bytes:
+    # 8x8 of 2 layers, 4x4, 2x2, 1x1
+    levels = [level0] + [bytes([i]) * (4 * (8 >> i) ** 2 * 2) for i in range(1, 4)]
+    return pyktx2.writer.serialize(FORMAT, 1, 8, 8, 0, 2, 1, pyktx2.writer.make_dfd(FORMAT),
+                                   kv or {}, levels)
+
+
+class TestHashing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, data: bytes) -> pathlib.Path:
+        path = self.dir / name
+        path.write_bytes(data)
+        return path
+
+    def test_levels(self):
+        data = make_rgba8(bytes(256) + bytes([1]) * 256)
+        h = pyktx2.hashing.hash_path(self.write('a.ktx2', data))
+        self.assertEqual(len(h.levels), 4)
+        self.assertEqual(len(h.levels[0].subresources), 2)
+        self.assertNotEqual(h.levels[0].subresources[0], h.levels[0].subresources[1])
+        self.assertEqual(len(set(h.levels[1].subresources)), 1)
+        # positioned reads give the same digests as mmap
+        self.assertEqual(pyktx2.hashing.hash_file(io.BytesIO(data)).digest, h.digest)
+
+    def test_duplicates(self):
+        a = self.write('a.ktx2', make_rgba8(bytes(512)))
+        # the kvd does not count
+        b = self.write('b.ktx2', make_rgba8(bytes(512), {'KTXwriter': b'other\0'}))
+        # only level 0 differs
+        c = self.write('c.ktx2', make_rgba8(bytes([2]) * 512))
+        hashes = [pyktx2.hashing.hash_path(p) for p in (a, b, c)]
+
+        duplicates = pyktx2.hashing.find_duplicates(hashes)
+        self.assertEqual([[h.path for h in group] for group in duplicates], [[str(a), str(b)]])
+
+        chains = pyktx2.hashing.find_shared_chains(hashes)
+        self.assertEqual(len(chains), 1)
+        self.assertEqual(chains[0].files, [(str(a), 1), (str(c), 1)])
+        self.assertEqual(pyktx2.hashing.find_shared_chains(hashes, min_bytes=1024), [])
+
+    def test_cache(self):
+        a = self.write('a.ktx2', make_rgba8(bytes(512)))
+        cache = pyktx2.hashing.HashCache(self.dir / 'hashes.json')
+        first = list(pyktx2.hashing.hash_paths([a], cache, 1))
+        cache.save()
+
+        cache = pyktx2.hashing.HashCache(self.dir / 'hashes.json')
+        hit = cache.get(a)
+        self.assertEqual(hit, first[0][1])
+
+        # a modified file misses the cache
+        self.write('a.ktx2', make_rgba8(bytes([1]) * 512))
+        os.utime(a, ns=(0, 0))
+        self.assertIsNone(cache.get(a))
+
+        # nothing changed, nothing written
+        mtime = (self.dir / 'hashes.json').stat().st_mtime_ns
+        self.assertFalse(cache.dirty)
+        cache.save()
+        self.assertEqual((self.dir / 'hashes.json').stat().st_mtime_ns, mtime)
+
+        # a removed file misses the cache and its entry is dropped
+        a.unlink()
+        self.assertIsNone(cache.get(a))
+        self.assertTrue(cache.dirty)
+        cache.save()
+        self.assertEqual(pyktx2.hashing.HashCache(self.dir / 'hashes.json').entries, {})
+        self.assertEqual([p.name for p in self.dir.iterdir()], ['hashes.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import io
+import unittest
+import numpy as np
+import pyktx2.writer
+import pyktx2.imagestats
+from pyktx2.parser import VkFormat, SupercompressionScheme
+from pyktx2.supercompression import compress_level
+
+RGBA16F = VkFormat.VK_FORMAT_R16G16B16A16_SFLOAT
+
+
+def make_rgba16f(levels, layers=0, scheme=SupercompressionScheme.NONE) -> io.BytesIO:
+    height, width = levels[0].shape[-3:-1]
+    data = [level.astype('<f2').tobytes() for level in levels]
+    uncompressed = [len(d) for d in data]
+    if scheme != SupercompressionScheme.NONE:
+        data = [compress_level(scheme, d) for d in data]
+    return io.BytesIO(pyktx2.writer.serialize(RGBA16F, 2, width, height, 0, layers, 1,
+                                              pyktx2.writer.make_dfd(RGBA16F), {}, data,
+                                              scheme, uncompressed))
+
+
+class TestImageStats(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.level0 = rng.uniform(0.5, 4.0, (16, 16, 4)).astype(np.float16)
+        self.level0[0, 0, 0] = np.nan
+        self.level0[1, 0, 1] = np.inf
+        self.level0[2, 0, 2] = -np.inf
+        self.level1 = np.zeros((8, 8, 4), np.float16)
+
+    def check_level0(self, stats: pyktx2.imagestats.ImageStats):
+        expected = self.level0.astype(np.float32).reshape(-1, 4)
+        self.assertEqual((stats.width, stats.height, stats.depth), (16, 16, 1))
+        self.assertEqual([c.channel for c in stats.channels], list('RGBA'))
+        for i, c in enumerate(stats.channels):
+            finite = expected[:, i][np.isfinite(expected[:, i])]
+            self.assertEqual(c.min, finite.min())
+            self.assertEqual(c.max, finite.max())
+            self.assertAlmostEqual(c.mean, finite.mean(dtype=np.float64), places=5)
+        self.assertEqual([(c.nanCount, c.infCount) for c in stats.channels],
+                         [(1, 0), (0, 1), (0, 1), (0, 0)])
+        # texels with a non finite rgb have no luminance
+        self.assertEqual(stats.histogram.sum() + stats.nonPositiveCount, 256 - 3)
+        self.assertEqual(stats.nonPositiveCount, 0)
+
+    def test_stats(self):
+        f = make_rgba16f([self.level0, self.level1])
+        stats = pyktx2.imagestats.compute_stats(f)
+        self.assertEqual([(s.level, s.layer, s.face) for s in stats], [(0, 0, 0), (1, 0, 0)])
+        self.check_level0(stats[0])
+        self.assertEqual(stats[1].nonPositiveCount, 64)
+        self.assertEqual(stats[1].histogram.sum(), 0)
+        self.assertEqual(stats[1].channels[0].max, 0)
+
+    def test_chunks(self):
+        # chunks that do not divide the image
+        f = make_rgba16f([self.level0, self.level1])
+        for chunk_texels in (1, 7, 100):
+            f.seek(0)
+            stats = pyktx2.imagestats.compute_stats(f, levels=[0], chunk_texels=chunk_texels)
+            self.assertEqual(len(stats), 1)
+            self.check_level0(stats[0])
+
+    def test_layers(self):
+        level0 = np.stack([self.level0, np.ones_like(self.level0)])
+        level1 = np.stack([self.level1, self.level1])
+        f = make_rgba16f([level0, level1], layers=2)
+        stats = pyktx2.imagestats.compute_stats(f, chunk_texels=50)
+        self.assertEqual([(s.level, s.layer) for s in stats], [(0, 0), (0, 1), (1, 0), (1, 1)])
+        self.check_level0(stats[0])
+        self.assertEqual([c.mean for c in stats[1].channels], [1, 1, 1, 1])
+        # log2(1) = 0 is in the middle bin
+        self.assertEqual(stats[1].histogram[pyktx2.imagestats.HISTOGRAM_BINS // 2], 256)
+
+    def test_supercompression(self):
+        for scheme in (SupercompressionScheme.ZLIB, SupercompressionScheme.Zstandard):
+            try:
+                f = make_rgba16f([self.level0, self.level1], scheme=scheme)
+            except ImportError:
+                continue
+            stats = pyktx2.imagestats.compute_stats(f, chunk_texels=3)
+            self.check_level0(stats[0])
+
+    def test_packed_float(self):
+        # 1.0 and 2.0 as 11/11/10 bit floats, 0.5 in shared exponent
+        r11 = (15 << 6)
+        g11 = (16 << 6)
+        b10 = (14 << 5)
+        b10g11r11 = np.array([r11 | g11 << 11 | b10 << 22], '<u4')
+        self.assertEqual(pyktx2.imagestats._decode_b10g11r11(b10g11r11).tolist(), [[1.0, 2.0, 0.5]])
+        # 256 * 2 ** (15 - 15 - 9) = 0.5
+        e5b9g9r9 = np.array([256 | 256 << 9 | 256 << 18 | 15 << 27], '<u4')
+        self.assertEqual(pyktx2.imagestats._decode_e5b9g9r9(e5b9g9r9).tolist(), [[0.5, 0.5, 0.5]])
+
+        vkFormat = VkFormat.VK_FORMAT_B10G11R11_UFLOAT_PACK32
+        # make_dfd does not support packed formats. the statistics only use the texel size
+        dfd = pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_R32_UINT)
+        data = pyktx2.writer.serialize(vkFormat, 4, 2, 2, 0, 0, 1, dfd,
+                                       {}, [b10g11r11.tobytes() * 4])
+        stats = pyktx2.imagestats.compute_stats(io.BytesIO(data))
+        self.assertEqual([c.mean for c in stats[0].channels], [1.0, 2.0, 0.5])
+
+    def test_compressed(self):
+        vkFormat = VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK
+        data = pyktx2.writer.serialize(vkFormat, 1, 4, 4, 0, 0, 1, pyktx2.writer.make_dfd(vkFormat),
+                                       {}, [bytes(8)])
+        with self.assertRaises(NotImplementedError):
+            pyktx2.imagestats.compute_stats(io.BytesIO(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
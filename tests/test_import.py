@@ -0,0 +1,36 @@
+import pickle
+import subprocess
+import sys
+import unittest
+from pyktx2.vkformat import VkFormat
+from pyktx2.formats import get_format_info
+
+
+class TestImport(unittest.TestCase):
+
+    def test_lazy(self):
+        code = ('import sys, pyktx2, pyktx2.parser, pyktx2.viewer;'
+                'print(sorted(m for m in ("numpy", "PySide6", "zstandard") if m in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_vkformat(self):
+        a = VkFormat.VK_FORMAT_R8G8B8A8_UNORM
+        self.assertIs(VkFormat(37), a)
+        self.assertIs(VkFormat['VK_FORMAT_R8G8B8A8_UNORM'], a)
+        self.assertIs(pickle.loads(pickle.dumps(a)), a)
+        self.assertEqual((a.name, a.value), ('VK_FORMAT_R8G8B8A8_UNORM', 37))
+        self.assertNotEqual(a, 37)
+        # an alias resolves to the canonical member
+        self.assertEqual(VkFormat.VK_FORMAT_G8B8G8R8_422_UNORM_KHR.name, 'VK_FORMAT_G8B8G8R8_422_UNORM')
+        self.assertEqual(len(list(VkFormat)), len(VkFormat))
+        with self.assertRaises(ValueError):
+            VkFormat(123456)
+        with self.assertRaises(AttributeError):
+            VkFormat.VK_FORMAT_NONE
+        # the format table takes the raw value as well
+        self.assertIs(get_format_info(37), get_format_info(a))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,17 @@
+import os
 import unittest
 import pathlib
 import pyktx2.parser
 
 
-def get_path(key: str) -> pathlib.Path:
-    import os
-    value = os.environ.get(key)
-    if not value:
-        import sys
-        sys.exit()
-    return pathlib.Path(value)
-
-
-GLTF_SAMPLE_ENVIRONMENTS = get_path('GLTF_SAMPLE_ENVIRONMENTS')
+GLTF_SAMPLE_ENVIRONMENTS = os.environ.get('GLTF_SAMPLE_ENVIRONMENTS')
 
 
+@unittest.skipUnless(GLTF_SAMPLE_ENVIRONMENTS, 'GLTF_SAMPLE_ENVIRONMENTS is not set')
 class TestKtx2(unittest.TestCase):
 
     def test_ktx2(self):
-        path = GLTF_SAMPLE_ENVIRONMENTS / 'chromatic/charlie/sheen.ktx2'
+        path = pathlib.Path(GLTF_SAMPLE_ENVIRONMENTS) / 'chromatic/charlie/sheen.ktx2'  # type: ignore
         self.assertTrue(path.exists())
         ktx2 = pyktx2.parser.parse_path(path)
         self.assertTrue(ktx2)
@@ -0,0 +1,66 @@
+import struct
+import unittest
+import pyktx2.parser
+import pyktx2.writer
+from pyktx2.kvd import KeyValueData, GlFormat, AnimData
+from pyktx2.parser import VkFormat, KtxError
+
+
+class TestKvd(unittest.TestCase):
+
+    def test_typed(self):
+        kvd = pyktx2.writer.pack_kvd({
+            'KTXorientation': b'rd\0',
+            'KTXswizzle': b'rg01\0',
+            'KTXwriter': b'pyktx2\0',
+            'KTXglFormat': struct.pack('<3I', 0x8058, 0, 0),
+            'KTXdxgiFormat__': struct.pack('<I', 28),
+            'KTXmetalPixelFormat': struct.pack('<I', 70),
+            'KTXanimData': struct.pack('<3I', 1, 30, 0),
+            'custom': b'\xff' * 1000,
+        })
+        kv = KeyValueData(kvd)
+        self.assertEqual(len(kv), 8)
+        self.assertEqual(kv.orientation, 'rd')
+        self.assertEqual(kv.swizzle, 'rg01')
+        self.assertEqual(kv.writer, 'pyktx2')
+        self.assertIsNone(kv.writer_sc_params)
+        self.assertEqual(kv.gl_format, GlFormat(0x8058, 0, 0))
+        self.assertEqual(kv.dxgi_format, 28)
+        self.assertEqual(kv.metal_pixel_format, 70)
+        self.assertEqual(kv.anim_data, AnimData(1, 30, 0))
+        self.assertEqual(kv['custom'], b'\xff' * 1000)
+        self.assertEqual(len(kv.view('custom')), 1000)
+        # the same index over a memoryview
+        self.assertEqual(dict(KeyValueData(memoryview(kvd))), dict(kv))
+
+    def test_invalid(self):
+        kv = KeyValueData(pyktx2.writer.pack_kvd({'KTXswizzle': b'rgbx\0', 'KTXwriter': b'abc'}))
+        with self.assertRaises(KtxError):
+            kv.swizzle
+        with self.assertRaises(KtxError):
+            kv.writer
+        with self.assertRaises(KtxError):
+            KeyValueData(struct.pack('<I', 100) + b'key\0')
+        with self.assertRaises(KtxError):
+            # the key is not utf-8
+            KeyValueData(struct.pack('<I', 4) + b'\xff\xfe\0v')
+
+    def test_parse(self):
+        data = pyktx2.writer.serialize(VkFormat.VK_FORMAT_R8G8B8A8_UNORM, 1, 1, 1, 0, 0, 1,
+                                       pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_R8G8B8A8_UNORM),
+                                       {'KTXorientation': b'rd\0', 'a': b'1'}, [bytes(4)])
+        ktx2 = pyktx2.parser.parse_bytes(data)
+        self.assertEqual(list(ktx2.kv), ['KTXorientation', 'a'])
+        self.assertEqual(ktx2.kv.orientation, 'rd')  # type: ignore
+        self.assertEqual(ktx2.kv['a'], b'1')
+
+        # the kvd is not copied. a value is read from the buffer when it is accessed
+        buffer = bytearray(data)
+        kv = pyktx2.parser.parse_bytes(buffer).kv
+        buffer[buffer.index(b'a\x001') + 2] = ord('2')
+        self.assertEqual(kv['a'], b'2')
+
+
+if __name__ == '__main__':
+    unittest.main()
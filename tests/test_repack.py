@@ -0,0 +1,72 @@
+import io
+import os
+import unittest
+import pyktx2.parser
+import pyktx2.writer
+import pyktx2.repack
+from pyktx2.parser import VkFormat, SupercompressionScheme, ColorModel, ColorPrimaries, TransferFunction
+
+
+def make_rgba8(width: int, height: int, levelCount: int, layerCount: int = 0) -> bytes:
+    dfd = pyktx2.writer.pack_basic_dfd(
+        ColorModel.KHR_DF_MODEL_RGBSDA,
+        ColorPrimaries.KHR_DF_PRIMARIES_BT709,
+        TransferFunction.KHR_DF_TRANSFER_LINEAR,
+        0, (1, 1, 1, 1), 4,
+        [pyktx2.writer.pack_sample(i * 8, 8, i, sampleUpper=255) for i in range(4)])
+    levels = []
+    for i in range(levelCount):
+        w = max(1, width >> i)
+        h = max(1, height >> i)
+        levels.append(os.urandom(w * h * 4 // 2) * 2 * max(1, layerCount))
+    return pyktx2.writer.serialize(VkFormat.VK_FORMAT_R8G8B8A8_UNORM, 1,
+                                   width, height, 0, layerCount, 1, dfd,
+                                   {'KTXwriter': b'pyktx2\0'}, levels)
+
+
+def repack_bytes(data: bytes, scheme: SupercompressionScheme) -> bytes:
+    dst = io.BytesIO()
+    pyktx2.repack.repack_file(io.BytesIO(data), dst, scheme)
+    return dst.getvalue()
+
+
+class TestRepack(unittest.TestCase):
+
+    def test_round_trip(self):
+        src = make_rgba8(64, 32, 7, 3)
+        zstd = repack_bytes(src, SupercompressionScheme.Zstandard)
+        header = pyktx2.parser.parse_header(zstd)
+        self.assertEqual(
+            header.supercompressionScheme, SupercompressionScheme.Zstandard)
+        self.assertLess(len(zstd), len(src))
+        self.assertEqual(header.levelIndices[0].uncompressedByteLength,
+                         64 * 32 * 4 * 3)
+        zlib = repack_bytes(zstd, SupercompressionScheme.ZLIB)
+        self.assertEqual(src, repack_bytes(zlib, SupercompressionScheme.NONE))
+
+    def test_deterministic(self):
+        src = make_rgba8(16, 16, 5)
+        self.assertEqual(repack_bytes(src, SupercompressionScheme.Zstandard),
+                         repack_bytes(src, SupercompressionScheme.Zstandard))
+
+    def test_level_order(self):
+        src = make_rgba8(16, 16, 5)
+        header = pyktx2.parser.parse_header(
+            repack_bytes(src, SupercompressionScheme.ZLIB))
+        offsets = [level.byteOffset for level in header.levelIndices]
+        self.assertEqual(offsets, sorted(offsets, reverse=True))
+
+    def test_bytes_plane0(self):
+        # 16x2 is 4x1 blocks. 8 bytes of a BC1 block are restored when decompressed
+        vkFormat = VkFormat.VK_FORMAT_BC1_RGB_UNORM_BLOCK
+        src = pyktx2.writer.serialize(vkFormat, 1, 16, 2, 0, 0, 1, pyktx2.writer.make_dfd(vkFormat),
+                                      {}, [os.urandom(4 * 8)])
+        zstd = repack_bytes(src, SupercompressionScheme.Zstandard)
+        self.assertEqual(pyktx2.parser.parse_bytes(zstd).dfd.basic.bytesPlane0, 0)
+        none = repack_bytes(zstd, SupercompressionScheme.NONE)
+        self.assertEqual(pyktx2.parser.parse_bytes(none).dfd.basic.bytesPlane0, 8)
+        self.assertEqual(none, src)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import pathlib
+import struct
+import tempfile
+import unittest
+import zlib
+from typing import Dict, Optional, Tuple
+import pyktx2.writer
+import pyktx2.parser
+import pyktx2.server
+from pyktx2.parser import VkFormat, SupercompressionScheme
+
+FORMAT = VkFormat.VK_FORMAT_R8G8B8A8_UNORM
+
+
+def make_levels():
+    # 8x8 of 2 layers, 4x4, 2x2, 1x1
+    return [bytes(range(256)) * 2] + [bytes([i]) * (4 * (8 >> i) ** 2 * 2) for i in range(1, 4)]
+
+
+def make_rgba8(scheme=SupercompressionScheme.NONE) -> bytes:
+    levels = make_levels()
+    uncompressed = [len(level) for level in levels]
+    if scheme == SupercompressionScheme.ZLIB:
+        levels = [zlib.compress(level) for level in levels]
+    return pyktx2.writer.serialize(FORMAT, 1, 8, 8, 0, 2, 1, pyktx2.writer.make_dfd(FORMAT),
+                                   {'KTXwriter': b'test\0'}, levels, scheme, uncompressed)
+
+
+class Client:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, target: str, headers: Optional[Dict[str, str]] = None,
+                      method: str = 'GET') -> Tuple[int, Dict[str, str], bytes]:
+        lines = [f'{method} {target} HTTP/1.1', 'Host: localhost']
+        lines += [f'{k}: {v}' for k, v in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split(' ')[1])
+        response_headers = {}
+        for line in head[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                response_headers[name.lower()] = value.strip()
+        length = int(response_headers.get('content-length', '0'))
+        body = b'' if method == 'HEAD' else await self.reader.readexactly(length)
+        return status, response_headers, body
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        (self.root / 'a.ktx2').write_bytes(make_rgba8())
+        (self.root / 'sub').mkdir()
+        (self.root / 'sub' / 'z.ktx2').write_bytes(make_rgba8(SupercompressionScheme.ZLIB))
+        (self.root / 'other.txt').write_bytes(b'x')
+        self.server = pyktx2.server.Ktx2Server(self.root, cache_bytes=1 << 20)
+        self.listener = await self.server.start('127.0.0.1', 0)
+        self.port = self.listener.sockets[0].getsockname()[1]
+        self.client = await self.connect()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.tmp.cleanup()
+
+    async def connect(self) -> Client:
+        return Client(*await asyncio.open_connection('127.0.0.1', self.port))
+
+    async def test_list_and_info(self):
+        status, headers, body = await self.client.request('/')
+        self.assertEqual(status, 200)
+        self.assertEqual([f['path'] for f in json.loads(body)['files']], ['a.ktx2', 'sub/z.ktx2'])
+
+        status, headers, body = await self.client.request('/info/sub/z.ktx2')
+        self.assertEqual(status, 200)
+        info = json.loads(body)
+        self.assertEqual(info['vkFormat'], 'VK_FORMAT_R8G8B8A8_UNORM')
+        self.assertEqual(info['supercompressionScheme'], 'ZLIB')
+        self.assertEqual([level['width'] for level in info['levels']], [8, 4, 2, 1])
+        self.assertEqual(info['kv'], {'KTXwriter': 'test'})
+        self.assertEqual(info['dfd']['colorModel'], 'KHR_DF_MODEL_RGBSDA')
+
+    async def test_level(self):
+        levels = make_levels()
+        for name in ('a.ktx2', 'sub/z.ktx2'):
+            status, _, body = await self.client.request(f'/level/{name}?level=1')
+            self.assertEqual(status, 200)
+            self.assertEqual(body, levels[1])
+            # layer 1 of level 0
+            status, _, body = await self.client.request(f'/level/{name}?level=0&layer=1&face=0')
+            self.assertEqual(body, levels[0][256:])
+        status, _, body = await self.client.request('/level/sub/z.ktx2?level=0&raw=1')
+        self.assertEqual(zlib.decompress(body), levels[0])
+
+        for target in ('/level/a.ktx2?level=9', '/level/missing.ktx2', '/level/../a.ktx2',
+                       '/level/other.txt', '/nothing/a.ktx2'):
+            status, _, _ = await self.client.request(target)
+            self.assertEqual(status, 404, target)
+        status, _, _ = await self.client.request('/level/a.ktx2?level=0&layer=5')
+        self.assertEqual(status, 400)
+        status, headers, _ = await self.client.request('/level/a.ktx2', method='POST')
+        self.assertEqual(status, 405)
+
+    async def test_range(self):
+        level0 = make_levels()[0]
+        for name in ('a.ktx2', 'sub/z.ktx2'):
+            target = f'/level/{name}?level=0'
+            status, headers, body = await self.client.request(target, {'Range': 'bytes=10-19'})
+            self.assertEqual(status, 206)
+            self.assertEqual(headers['content-range'], 'bytes 10-19/512')
+            self.assertEqual(body, level0[10:20])
+            status, _, body = await self.client.request(target, {'Range': 'bytes=-8'})
+            self.assertEqual(body, level0[-8:])
+            status, _, body = await self.client.request(target, {'Range': 'bytes=500-'})
+            self.assertEqual(body, level0[500:])
+            status, headers, _ = await self.client.request(target, {'Range': 'bytes=512-'})
+            self.assertEqual(status, 416)
+            self.assertEqual(headers['content-range'], 'bytes */512')
+            # multiple ranges and a stale If-Range send the whole body
+            status, _, body = await self.client.request(target, {'Range': 'bytes=0-1,4-5'})
+            self.assertEqual((status, body), (200, level0))
+            status, _, body = await self.client.request(target, {'Range': 'bytes=0-1', 'If-Range': '"old"'})
+            self.assertEqual((status, body), (200, level0))
+
+    async def test_etag(self):
+        status, headers, _ = await self.client.request('/info/a.ktx2')
+        etag = headers['etag']
+        status, headers, body = await self.client.request('/level/a.ktx2?level=0', {'If-None-Match': etag})
+        self.assertEqual((status, body), (304, b''))
+        self.assertEqual(headers['etag'], etag)
+        status, headers, body = await self.client.request('/level/a.ktx2?level=0', method='HEAD')
+        self.assertEqual((status, headers['content-length'], body), (200, '512', b''))
+
+        (self.root / 'a.ktx2').write_bytes(make_rgba8() + b'\0' * 4)
+        status, headers, _ = await self.client.request('/level/a.ktx2?level=0', {'If-None-Match': etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers['etag'], etag)
+
+    async def test_preview(self):
+        status, headers, body = await self.client.request('/preview/sub/z.ktx2?level=0&layer=1')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-type'], 'image/png')
+        self.assertTrue(body.startswith(b'\x89PNG'))
+        hits = self.server.cache.hits
+        status, _, cached = await self.client.request('/preview/sub/z.ktx2?level=0&layer=1')
+        self.assertEqual(cached, body)
+        self.assertGreater(self.server.cache.hits, hits)
+
+    async def test_corrupted(self):
+        data = bytearray(make_rgba8(SupercompressionScheme.ZLIB))
+        level = pyktx2.parser.parse_header(bytes(data)).levelIndices[0]
+        data[level.byteOffset:level.byteOffset + level.byteLength] = b'\xff' * level.byteLength
+        (self.root / 'bad.ktx2').write_bytes(bytes(data))
+        for target in ('/level/bad.ktx2?level=0', '/preview/bad.ktx2'):
+            status, _, body = await self.client.request(target)
+            self.assertEqual(status, 500, target)
+            self.assertIn(b'KtxError', body)
+        # the connection is still usable
+        status, _, body = await self.client.request('/level/a.ktx2?level=1')
+        self.assertEqual((status, body), (200, make_levels()[1]))
+
+    async def test_corrupted_level_index(self):
+        level0 = make_levels()[0]
+
+        def patch(name: str, field: int, value: int):
+            # byteOffset, byteLength, uncompressedByteLength of level 0
+            data = bytearray(make_rgba8())
+            struct.pack_into('<Q', data, pyktx2.parser.HEADER_SIZE + 8 * field, value)
+            (self.root / name).write_bytes(bytes(data))
+
+        # uncompressedByteLength is not used for an uncompressed level
+        patch('length.ktx2', 2, 1 << 40)
+        status, headers, body = await self.client.request('/level/length.ktx2?level=0')
+        self.assertEqual((status, headers['content-length'], body), (200, '512', level0))
+        status, _, body = await self.client.request('/level/length.ktx2?level=0', {'Range': 'bytes=0-15'})
+        self.assertEqual((status, body), (206, level0[:16]))
+
+        patch('offset.ktx2', 0, 1 << 40)
+        patch('size.ktx2', 1, 1 << 40)
+        for target in ('/level/offset.ktx2?level=0', '/level/offset.ktx2?level=0&raw=1',
+                       '/level/size.ktx2?level=0', '/level/size.ktx2?level=0&raw=1',
+                       '/preview/offset.ktx2', '/preview/size.ktx2'):
+            status, _, body = await self.client.request(target)
+            self.assertEqual(status, 500, target)
+            self.assertIn(b'KtxError', body)
+        status, _, body = await self.client.request('/level/a.ktx2?level=1')
+        self.assertEqual((status, body), (200, make_levels()[1]))
+
+    async def test_concurrent(self):
+        levels = make_levels()
+        clients = [await self.connect() for _ in range(8)]
+        try:
+            results = await asyncio.gather(*[
+                client.request(f'/level/sub/z.ktx2?level={i % 4}') for i, client in enumerate(clients)])
+        finally:
+            for client in clients:
+                await client.close()
+        self.assertEqual([body for _, _, body in results], [levels[i % 4] for i in range(8)])
+        # one decompression per level
+        self.assertEqual(len([key for key in self.server.cache._items if key[0] == 'level']), 4)
+
+    async def test_connection_close(self):
+        client = await self.connect()
+        status, headers, _ = await client.request('/info/a.ktx2', {'Connection': 'close'})
+        self.assertEqual(headers['connection'], 'close')
+        self.assertEqual(await client.reader.read(), b'')
+        await client.close()
+
+
+class TestHotCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = pyktx2.server.HotCache(100)
+        cache.put('a', b'a', 40)
+        cache.put('b', b'b', 40)
+        self.assertEqual(cache.get('a'), b'a')
+        cache.put('c', b'c', 40)
+        # b is the least recently used
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((len(cache), cache.size), (2, 80))
+        cache.put('d', b'd', 200)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_parse_range(self):
+        self.assertEqual(pyktx2.server.parse_range('bytes=0-9', 5), (0, 5))
+        self.assertEqual(pyktx2.server.parse_range('bytes=-10', 5), (0, 5))
+        self.assertIsNone(pyktx2.server.parse_range('bytes=5-1', 10))
+        self.assertIsNone(pyktx2.server.parse_range('items=0-1', 10))
+        with self.assertRaises(pyktx2.server.HttpError):
+            pyktx2.server.parse_range('bytes=10-', 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
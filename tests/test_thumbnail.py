@@ -0,0 +1,73 @@
+import pathlib
+import struct
+import tempfile
+import unittest
+import zlib
+import numpy as np
+import pyktx2.parser
+import pyktx2.writer
+import pyktx2.thumbnail
+from pyktx2.parser import VkFormat, ColorModel, ColorPrimaries, TransferFunction
+
+
+def make_rgba8(path: pathlib.Path, size: int, levelCount: int):
+    dfd = pyktx2.writer.pack_basic_dfd(
+        ColorModel.KHR_DF_MODEL_RGBSDA,
+        ColorPrimaries.KHR_DF_PRIMARIES_BT709,
+        TransferFunction.KHR_DF_TRANSFER_SRGB,
+        0, (1, 1, 1, 1), 4, [])
+    levels = [np.full((max(1, size >> i), max(1, size >> i), 4), i, np.uint8).tobytes()
+              for i in range(levelCount)]
+    path.write_bytes(pyktx2.writer.serialize(VkFormat.VK_FORMAT_R8G8B8A8_SRGB, 1,
+                                             size, size, 0, 0, 1, dfd, {}, levels))
+
+
+class TestThumbnail(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_choose_level(self):
+        path = self.dir / 'a.ktx2'
+        make_rgba8(path, 1024, 11)
+        with path.open('rb') as f:
+            header = pyktx2.parser.read_header(f)
+        self.assertEqual(pyktx2.thumbnail.choose_level(header, 128), 3)
+        self.assertEqual(pyktx2.thumbnail.choose_level(header, 100), 3)
+        self.assertEqual(pyktx2.thumbnail.choose_level(header, 4096), 0)
+
+    def test_downsample(self):
+        rgba = np.zeros((300, 64, 4), np.uint8)
+        small = pyktx2.thumbnail.downsample(rgba, 128)
+        self.assertLessEqual(max(small.shape[:2]), 128)
+        self.assertEqual(pyktx2.thumbnail.downsample(
+            rgba[:10, :10], 128).shape, (10, 10, 4))
+
+    def test_cache(self):
+        path = self.dir / 'a.ktx2'
+        make_rgba8(path, 512, 10)
+        cache = pyktx2.thumbnail.ThumbnailCache(self.dir / 'cache')
+        self.assertIsNone(cache.get(path))
+        png = cache.get_or_create(path)
+        self.assertEqual(cache.get(path), png)
+
+        # 128x128 from level 2
+        self.assertEqual(png[:8], b'\x89PNG\r\n\x1a\n')
+        width, height = struct.unpack('>II', png[16:24])
+        self.assertEqual((width, height), (128, 128))
+        idat = png.index(b'IDAT')
+        length = struct.unpack('>I', png[idat - 4:idat])[0]
+        raw = zlib.decompress(png[idat + 4:idat + 4 + length])
+        self.assertEqual(raw[1:5], bytes((2, 2, 2, 2)))
+
+        # a modified file misses the cache
+        make_rgba8(path, 256, 9)
+        self.assertIsNone(cache.get(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import io
+import struct
+import unittest
+import pyktx2.parser
+import pyktx2.writer
+import pyktx2.repack
+import pyktx2.validate
+from pyktx2.parser import VkFormat, SupercompressionScheme, KtxError, HEADER_SIZE
+
+
+def make_bc1(levelCount: int = 3, kv=None) -> bytes:
+    # 64x64, 32x32, 16x16, ... of 8 byte blocks
+    levels = [bytes(8 * max(1, (16 >> i) ** 2)) for i in range(levelCount)]
+    return pyktx2.writer.serialize(VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK, 1, 64, 64, 0, 0, 1,
+                                   pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_BC1_RGBA_UNORM_BLOCK),
+                                   kv or {}, levels)
+
+
+def validate(data: bytes):
+    return [p.message for p in pyktx2.validate.validate_file(io.BytesIO(data))]
+
+
+class TestValidate(unittest.TestCase):
+
+    def test_valid(self):
+        self.assertEqual(validate(make_bc1(kv={'KTXwriter': b'test\0'})), [])
+        zstd = io.BytesIO()
+        pyktx2.repack.repack_file(io.BytesIO(make_bc1()), zstd, SupercompressionScheme.Zstandard)
+        self.assertEqual(validate(zstd.getvalue()), [])
+
+    def test_header(self):
+        data = bytearray(make_bc1())
+        # typeSize, faceCount
+        struct.pack_into('<I', data, 16, 4)
+        struct.pack_into('<I', data, 36, 2)
+        problems = validate(bytes(data))
+        self.assertIn('typeSize', problems[0])
+        self.assertIn('faceCount', problems[1])
+        # level sizes are checked against the faceCount as well
+        self.assertIn('byteLength', problems[2])
+
+    def test_level_order(self):
+        data = bytearray(make_bc1(2))
+        level0 = struct.unpack_from('<3Q', data, HEADER_SIZE)
+        level1 = struct.unpack_from('<3Q', data, HEADER_SIZE + 24)
+        # level 1 points into level 0
+        struct.pack_into('<3Q', data, HEADER_SIZE + 24, level0[0] + 8, *level1[1:])
+        problems = validate(bytes(data))
+        self.assertTrue(any('must be stored before' in p for p in problems))
+        self.assertTrue(any('overlaps the level' in p for p in problems))
+
+    def test_kvd(self):
+        data = bytearray(make_bc1(1, {'a': b'1\0', 'b': b'2\0'}))
+        kvdByteOffset = struct.unpack_from('<I', data, 56)[0]
+        # swap the first letters of the keys
+        data[kvdByteOffset + 4] = ord('c')
+        problems = validate(bytes(data))
+        self.assertEqual(problems, ['key b is not sorted'])
+
+    def test_dfd(self):
+        data = bytearray(make_bc1(1))
+        dfdByteOffset = struct.unpack_from('<I', data, 48)[0]
+        # bytesPlane0
+        data[dfdByteOffset + pyktx2.writer.DFD_BYTES_PLANE0_OFFSET] = 16
+        self.assertEqual(validate(bytes(data)), ['dfd bytesPlane0 16 must be 8'])
+
+        data = bytearray(make_bc1(1))
+        # dfdByteLength too short for dfdTotalSize
+        struct.pack_into('<I', data, 52, 2)
+        self.assertIn('dfdByteLength 2 is smaller than dfdTotalSize', validate(bytes(data)))
+
+    def test_truncated(self):
+        data = make_bc1()
+        problems = validate(data[:-4])
+        self.assertTrue(any('exceeds the file size' in p for p in problems))
+        self.assertEqual(validate(data[:40]), ['file size 40 is smaller than the header'])
+
+    def test_parse_errors(self):
+        # the parser raises KtxError for the same malformed input
+        data = make_bc1()
+        with self.assertRaisesRegex(KtxError, 'truncated at 60'):
+            pyktx2.parser.parse_bytes(data[:60])
+        with self.assertRaisesRegex(KtxError, 'truncated at 100'):
+            pyktx2.parser.read_header(io.BytesIO(data[:100]))
+        patched = bytearray(data)
+        struct.pack_into('<I', patched, 12, 99999)
+        with self.assertRaisesRegex(KtxError, 'unknown vkFormat 99999'):
+            pyktx2.parser.parse_bytes(bytes(patched))
+        patched = bytearray(data)
+        struct.pack_into('<I', patched, 44, 7)
+        with self.assertRaisesRegex(KtxError, 'unknown supercompressionScheme'):
+            pyktx2.parser.parse_bytes(bytes(patched))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import importlib.util
+import os
+import pathlib
+import tempfile
+import unittest
+import numpy as np
+import pyktx2.parser
+import pyktx2.writer
+from pyktx2.parser import VkFormat
+
+HAS_QT = importlib.util.find_spec('PySide6') is not None
+
+
+def make_layers(path: pathlib.Path, layerCount: int):
+    vkFormat = VkFormat.VK_FORMAT_R8G8B8A8_UNORM
+    levels = [np.zeros((layerCount, 4 >> i, 4 >> i, 4), np.uint8).tobytes() for i in range(3)]
+    path.write_bytes(pyktx2.writer.serialize(vkFormat, 1, 4, 4, 0, layerCount, 1,
+                                             pyktx2.writer.make_dfd(vkFormat), {'KTXwriter': b'test\0'}, levels))
+
+
+@unittest.skipUnless(HAS_QT, 'PySide6 is not installed')
+class TestKtx2Model(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PySide6 import QtWidgets
+        cls.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    def test_fetch_more(self):
+        from PySide6 import QtCore, QtTest, QtWidgets
+        from pyktx2.viewer.image_viewer import Ktx2Model, Node
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'layers.ktx2'
+            make_layers(path, 600)
+            model = Ktx2Model(path, pyktx2.parser.parse_path(path))
+        QtTest.QAbstractItemModelTester(model, QtTest.QAbstractItemModelTester.FailureReportingMode.Fatal)
+        view = QtWidgets.QTreeView()
+        view.setModel(model)
+        view.show()
+
+        root = QtCore.QModelIndex()
+        images = model.index(model.rowCount(root) - 1, 0, root)
+        level = model.index(0, 0, images)
+        view.expand(images)
+        view.expand(level)
+        node: Node = level.internalPointer()  # type: ignore
+        while model.canFetchMore(level):
+            model.fetchMore(level)
+            view.scrollToBottom()
+            self.app.processEvents()
+            self.assertLessEqual(node.fetched, node.child_count)
+        self.assertEqual(model.rowCount(level), 600)
+        view.close()
+
+    def test_fetch_more_reentrant(self):
+        from PySide6 import QtCore, QtTest
+        from pyktx2.viewer.image_viewer import Ktx2Model, Node
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'layers.ktx2'
+            make_layers(path, 600)
+            model = Ktx2Model(path, pyktx2.parser.parse_path(path))
+        root = QtCore.QModelIndex()
+        images = model.index(model.rowCount(root) - 1, 0, root)
+        level = model.index(0, 0, images)
+        node: Node = level.internalPointer()  # type: ignore
+        QtTest.QAbstractItemModelTester(model, QtTest.QAbstractItemModelTester.FailureReportingMode.Fatal)
+
+        # a view that fetches again while rows are being inserted
+        reentered = []
+
+        def on_insert(parent, first, last):
+            if not reentered:
+                reentered.append((first, last))
+                model.fetchMore(level)
+        model.rowsAboutToBeInserted.connect(on_insert)  # type: ignore
+        while model.canFetchMore(level):
+            model.fetchMore(level)
+        self.assertTrue(reentered)
+        self.assertEqual(node.fetched, node.child_count)
+        self.assertEqual(model.rowCount(level), 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import pyktx2.dfd
+import pyktx2.parser
+import pyktx2.writer
+from pyktx2.parser import VkFormat, ColorModel, TransferFunction
+
+
+class TestWriter(unittest.TestCase):
+
+    def test_make_dfd(self):
+        basic, samples = pyktx2.parser.parse_dfd(
+            pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_R8G8B8A8_SRGB))
+        self.assertEqual(basic.colorModel, ColorModel.KHR_DF_MODEL_RGBSDA)
+        self.assertEqual(basic.transferFunction, TransferFunction.KHR_DF_TRANSFER_SRGB)
+        self.assertEqual(basic.bytesPlane0, 4)
+        self.assertEqual(len(samples), 4)
+
+        basic, samples = pyktx2.parser.parse_dfd(
+            pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_BC3_UNORM_BLOCK))
+        self.assertEqual(basic.colorModel, ColorModel.KHR_DF_MODEL_BC3)
+        self.assertEqual(basic.bytesPlane0, 16)
+        self.assertEqual(len(samples), 2)
+
+        # SRGB is not a signed kind
+        dfd = pyktx2.parser.parse_dfd(pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_R8G8B8A8_SRGB))
+        self.assertFalse(any(dfd.qualifiers & pyktx2.dfd.KHR_DF_SAMPLE_DATATYPE_SIGNED))
+        dfd = pyktx2.parser.parse_dfd(pyktx2.writer.make_dfd(VkFormat.VK_FORMAT_R8G8B8A8_SNORM))
+        self.assertTrue(all(dfd.qualifiers & pyktx2.dfd.KHR_DF_SAMPLE_DATATYPE_SIGNED))
+
+
+if __name__ == '__main__':
+    unittest.main()